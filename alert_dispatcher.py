@@ -0,0 +1,193 @@
+import time
+import queue
+import threading
+
+import database
+
+EMBEDS_PER_MESSAGE = 10 # Discord's limit per webhook message
+CHARS_PER_MESSAGE = 6000 # Discord's limit on the text of all embeds in one message
+SEND_TIMEOUT = (5.0, 10.0) # (connect, read) seconds per webhook call
+MAX_ATTEMPTS = 5 # Tries per message this run; undelivered alerts stay in the DB for the next start
+RETRY_BASE = 1.0 # Backoff after a failed send (s), doubled per attempt
+RETRY_MAX = 60.0
+
+
+def embed_chars(embed):
+    """Characters Discord counts toward the per-message limit for one embed."""
+    chars = len(str(embed.get('title') or '')) + len(str(embed.get('description') or ''))
+    chars += len(str((embed.get('footer') or {}).get('text') or ''))
+    chars += len(str((embed.get('author') or {}).get('name') or ''))
+    for field in embed.get('fields') or ():
+        chars += len(str(field.get('name') or '')) + len(str(field.get('value') or ''))
+    return chars
+
+
+class DiscordDispatcher:
+    """
+    Sends Discord webhook alerts from its own thread so whale processing never
+    waits on Discord.
+    - Alerts queued during a burst are packed into one message (up to 10 embeds
+      and 6000 characters); a rejected multi-embed message is split and retried.
+    - X-RateLimit-Remaining / Reset-After are honoured before the next send; a 429
+      waits for its retry_after; network errors and 5xx retry with backoff.
+    - Every alert is written to the pending_alerts table first and deleted once
+      delivered, so alerts still undelivered at exit are re-sent on the next start.
+    webhook: callable returning the current URL (it can change at runtime).
+    """
+    def __init__(self, http, webhook, username="Whale Tracker", persist=True):
+        self.http = http
+        self.webhook = webhook
+        self.username = username
+        self.persist = persist
+        self.queue = queue.Queue()
+        self.counts = {'queued': 0, 'sent': 0, 'messages': 0, 'retries': 0, 'rate_limited': 0, 'failed': 0}
+        self._ready_at = 0.0 # Bucket exhausted: no send before this (monotonic)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._held = None # Alert that did not fit the last message; starts the next one
+
+    def start(self):
+        """Start the sender thread; re-queues alerts left undelivered by a previous run."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            if self.persist:
+                pending = database.get_pending_alerts()
+                for row_id, embed, _ in pending:
+                    self.queue.put((row_id, embed))
+                if pending:
+                    print(f"[*] Re-sending {len(pending)} undelivered Discord alerts.")
+            self._thread = threading.Thread(target=self._run, name="discord", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self.queue.put(None)
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    def send(self, embed):
+        """Queue one embed (returns immediately)."""
+        if self._thread is None:
+            self.start() # Before saving, or start()'s reload of pending rows would queue it twice
+        row_id = database.save_pending_alert(embed) if self.persist else None
+        self.counts['queued'] += 1
+        self.queue.put((row_id, embed))
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                item = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                continue
+            self.deliver(self._pack(item))
+            while self._held is not None and not self._stopping.is_set():
+                item, self._held = self._held, None
+                self.deliver(self._pack(item))
+
+    def _pack(self, item):
+        """Burst: whatever queued up meanwhile rides along, within Discord's message limits."""
+        batch = [item]
+        chars = embed_chars(item[1])
+        while len(batch) < EMBEDS_PER_MESSAGE:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                continue
+            size = embed_chars(item[1])
+            if chars + size > CHARS_PER_MESSAGE:
+                self._held = item
+                break
+            batch.append(item)
+            chars += size
+        return batch
+
+    def deliver(self, batch):
+        """POST one message for [(row_id, embed)]. Returns True once Discord accepted it."""
+        ids = [row_id for row_id, _ in batch if row_id is not None]
+        payload = {"username": self.username, "embeds": [embed for _, embed in batch]}
+        for attempt in range(MAX_ATTEMPTS):
+            if self._wait(self._ready_at - time.monotonic()):
+                return False # Stopping: the alerts stay pending in the DB
+            url = self.webhook()
+            if not url:
+                return False
+            try:
+                resp = self.http.post(url, json=payload, timeout=SEND_TIMEOUT)
+                status = resp.status_code
+            except Exception as e:
+                resp, status = None, None
+                print(f"[!] Failed to send Discord alert: {e}")
+
+            if resp is not None:
+                self._track_bucket(resp)
+            if status is not None and 200 <= status < 300:
+                self._forget(ids)
+                self.counts['sent'] += len(batch)
+                self.counts['messages'] += 1
+                return True
+            if status == 429:
+                self.counts['rate_limited'] += 1
+                delay = self._retry_after(resp)
+            elif status == 400 and len(batch) > 1:
+                # One oversized / malformed embed shouldn't take the rest down with it
+                half = len(batch) // 2
+                first = self.deliver(batch[:half])
+                return self.deliver(batch[half:]) and first
+            elif status is not None and 400 <= status < 500:
+                # Bad payload / deleted webhook: retrying will not help
+                print(f"[!] Discord rejected {len(batch)} alerts (HTTP {status}), dropping.")
+                self._forget(ids)
+                self.counts['failed'] += len(batch)
+                return False
+            else:
+                delay = min(RETRY_MAX, RETRY_BASE * 2 ** attempt)
+            self.counts['retries'] += 1
+            self._ready_at = max(self._ready_at, time.monotonic() + delay)
+
+        if self.persist and ids:
+            database.mark_pending_attempt(ids)
+        self.counts['failed'] += len(batch)
+        print(f"[!] Discord unreachable, {len(batch)} alerts kept for the next start.")
+        return False
+
+    def _wait(self, seconds):
+        """Sleep (interruptible by stop). Returns True if stopping."""
+        if seconds > 0:
+            return self._stopping.wait(seconds)
+        return self._stopping.is_set()
+
+    def _track_bucket(self, resp):
+        # Discord tells us how many calls are left in the bucket and when it resets
+        remaining = resp.headers.get('X-RateLimit-Remaining')
+        reset_after = resp.headers.get('X-RateLimit-Reset-After')
+        try:
+            if remaining is not None and int(remaining) <= 0 and reset_after:
+                self._ready_at = max(self._ready_at, time.monotonic() + float(reset_after))
+        except ValueError:
+            pass
+
+    @staticmethod
+    def _retry_after(resp):
+        try:
+            return float(resp.json().get('retry_after'))
+        except Exception:
+            pass
+        try:
+            return float(resp.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return RETRY_BASE
+
+    def _forget(self, ids):
+        if self.persist and ids:
+            database.delete_pending_alerts(ids)
+
+    def stats(self):
+        return dict(self.counts, pending=self.queue.qsize())
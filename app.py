@@ -2,12 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import threading
-import time
 import datetime
 import whale_tracker
 import database
+import scan_sinks
 from dateutil import tz
-import concurrent.futures
+import asyncio
 
 # --- Configuration & State ---
 st.set_page_config(
@@ -105,7 +105,16 @@ with st.sidebar:
         max_value=30,
         help="How far back to check for the Historical Scan."
     )
-    # 4. Sports Filter
+    # 4. Scan Concurrency
+    scan_concurrency = st.number_input(
+        "Scan Concurrency",
+        value=whale_tracker.SCAN_CONCURRENCY,
+        min_value=1,
+        max_value=1000,
+        step=50,
+        help="Max in-flight API requests during the Historical Scan."
+    )
+    # 5. Sports Filter
     exclude_sports = st.checkbox(
         "Exclude Sports", 
         value=True,
@@ -167,6 +176,15 @@ with tab_live:
     if st.session_state.is_running:
         if st.button("🔄 Refresh Feed"):
             st.rerun()
+        live = st.session_state.tracker_instance.event_queue.stats()
+        st.caption(f"Queue depth {live['depth']}/{live['capacity']} | lag {live['lag_s']:.1f}s | "
+                   f"wait p95 {live['queue']['p95_ms']:.0f} ms | processing p95 {live['processing']['p95_ms']:.0f} ms | "
+                   f"{live['processed']} events | {live['dropped']} dropped")
+        feed = st.session_state.tracker_instance.feed_latency.snapshot()
+        st.caption(f"Feed latency p50 {feed['p50_ms']:.0f} ms | p95 {feed['p95_ms']:.0f} ms | "
+                   f"{sum(s['stalls'] for s in st.session_state.tracker_instance.subscriber.stats())} stalled reconnects")
+        if live['lag_s'] > whale_tracker.LIVE_LAG_WARN:
+            st.warning(f"Live monitor is falling behind ({live['lag_s']:.0f}s backlog).")
             
     # Display Cards (Apply Filters Dynamically)
     if st.session_state.live_whales:
@@ -203,10 +221,39 @@ with tab_live:
         st.write("No whales found yet. Waiting for big splashes... 🌊")
 
 
+def scan_row(item):
+    """process_whale item -> Historical Scan table row (UI column names)."""
+    return {
+        "Time": item['time'],
+        "Value": item['value'],
+        "Market": item['market'],
+        "Outcome": item['outcome'],
+        "Side": item['side'],
+        "Wallet": item['wallet'],
+        "Vol 24h": item.get('vol_24h', 0),
+        "Liquidity": item.get('liquidity', 0),
+        "_ts": item['raw_timestamp'],
+        "Link": f"https://polymarket.com/event/{item.get('slug')}",
+        "New User": "Yes" if item['profile'].get('is_fresh') else "No",
+        "Age": item['age'],
+        "Urgency": item.get('urgency', 0),
+        "Bias": item.get('bias', 0),
+        "Liq/Vol": item.get('liq_vol_ratio', 0),
+        "WC/TX%": item.get('wc_tx_pct', 100),
+        "Trade Conc.": item.get('trade_concentration', 0),
+        "Radar Score": item['profile'].get('profitability_score', 0)
+    }
+
 # --- TAB 2: HISTORICAL SCAN ---
 with tab_scan:
     st.subheader("Historical Market Scanner")
     st.markdown(f"**Settings:** Last {days_back} Days | Top {limit_markets} Markets | > ${threshold:,.0f}")
+    scan_mode = st.radio(
+        "Scan Mode",
+        ["Per Market", "Trade Firehose"],
+        horizontal=True,
+        help="Per Market queries each market's trades. Trade Firehose pages the global trade feed once (faster for short lookbacks)."
+    )
     
     if st.button("🚀 Run Historical Scan"):
         tracker = whale_tracker.PolymarketTracker()
@@ -215,118 +262,51 @@ with tab_scan:
             st.write("Fetching active markets...")
             markets = tracker.fetch_active_markets(limit_override=limit_markets)
             
-            # Helper to check sports tags (reusing logic)
-            def is_sports_market(m):
-                tags = [t.lower() for t in m.get('tags', [])]
-                cat = m.get('category', '').lower()
-                return 'sports' in tags or 'nba' in tags or 'nfl' in tags or 'soccer' in tags or cat == 'sports'
-
+            # Sports check (reusing tracker logic)
             if exclude_sports:
-                markets = [m for m in markets if not is_sports_market(m)]
+                markets = [m for m in markets if not tracker.is_sports_market(m)]
+            markets = tracker.prioritize_markets(markets) # Best expected whale yield first
                 
             st.write(f"Scanning {len(markets)} markets for trades > ${threshold:,.0f}...")
             
-            # Re-implement scan logic locally to capture results for Dataframe
-            found_whales = []
+            # Streaming scan engine (shared with the CLI); rows appear as whales are found
             scan_progress = st.progress(0)
-            
-            # Logic unified with whale_tracker.py to ensure persistence
-            def process_market(market):
-                try:
-                    market_id = market.get('conditionId') or market.get('id')
-                    trades = tracker.fetch_recent_trades(market_id)
-                    results = []
-                    for trade in trades:
-                        # Prepare data for Unified Processor
-                        # We need to construct 'trade_data' and 'market_data' matching process_whale expects
-                        
-                        # Size check at source to save processing (though process_whale checks too)
-                        t_size = float(trade.get('size', 0))
-                        t_price = float(trade.get('price', 0))
-                        if (t_size * t_price) < threshold: continue
+            found_box = st.empty()
+            all_results = []
 
-                        t_ts = float(trade.get('timestamp'))
-                        # Fix timestamp scaling if needed
-                        if t_ts > 10000000000: t_ts /= 1000
-                        
-                        # Time Window Check
-                        if (time.time() - t_ts) > (days_back * 86400): continue
+            class StreamlitSink(scan_sinks.ScanSink):
+                """Progress bar + running whale count for the scan tab."""
+                def start(self, total):
+                    self.total = total
+                    self.done = 0
 
-                        # Prepare Trade Data Payload
-                        trade_payload = {
-                            'market_id': market_id,
-                            'price': t_price,
-                            'size': t_size,
-                            'side': trade.get('side'),
-                            'timestamp': t_ts, # Use corrected float seconds
-                            'outcome': trade.get('outcome'),
-                            'outcome_label': None, # API usually provides outcome
-                            'asset_id': trade.get('asset_id'),
-                            'wallet': trade.get('taker_address') or trade.get('owner')
-                        }
+                def whale(self, item):
+                    all_results.append(scan_row(item))
+                    found_box.write(f"🐳 {len(all_results)} whales so far (latest: ${item['value']:,.0f} in {item['market']})")
 
-                        # Prepare Market Data (Normalize Keys)
-                        # Gamma API uses 'question', process_whale expects 'title'
-                        market_payload = market.copy()
-                        if 'question' in market and 'title' not in market:
-                            market_payload['title'] = market['question']
-                        
-                        # Ensure other keys exist to prevent errors
-                        if 'volume24hr' not in market_payload: market_payload['volume24hr'] = market.get('volume', 0)
-                        if 'liquidity' not in market_payload: market_payload['liquidity'] = market.get('liquidityNum', 0)
+                def market_done(self, market, results):
+                    self.done += 1
+                    if self.total and self.done % 10 == 0:
+                        scan_progress.progress(self.done / self.total)
 
-                        # Call the Unified Processor (Handles DB Save!)
-                        # We pass historical=True so it doesn't print to console/discord
-                        # We pass timestamp_override because it's a historical trade
-                        processed_item = tracker.process_whale(
-                            trade_payload, 
-                            market_payload, 
-                            historical=True, 
-                            timestamp_override=t_ts
-                        )
+            async def consume():
+                async for _ in tracker.iter_whales_async(
+                    markets,
+                    mode="firehose" if scan_mode == "Trade Firehose" else "markets",
+                    days=days_back,
+                    min_value=threshold,
+                    concurrency=scan_concurrency,
+                    exclude_sports=exclude_sports,
+                    sinks=[StreamlitSink(), scan_sinks.DatabaseSink(tracker)]
+                ):
+                    pass
 
-                        if processed_item:
-                            # Map returning lowercase keys to UI Capitalized keys
-                            # process_whale returns: time, market, value, outcome, wallet, fresh, side, price...
-                            
-                            results.append({
-                                "Time": processed_item['time'],
-                                "Value": processed_item['value'],
-                                "Market": processed_item['market'],
-                                "Outcome": processed_item['outcome'],
-                                "Side": processed_item['side'],
-                                "Wallet": processed_item['wallet'],
-                                "Vol 24h": processed_item.get('vol_24h', 0),
-                                "Liquidity": processed_item.get('liquidity', 0),
-                                "_ts": processed_item['raw_timestamp'],
-                                "Link": f"https://polymarket.com/event/{processed_item.get('slug')}",
-                                "New User": "Yes" if processed_item['profile'].get('is_fresh') else "No",
-                                "Age": processed_item['age'],
-                                "Urgency": processed_item.get('urgency', 0),
-                                "Bias": processed_item.get('bias', 0),
-                                "Liq/Vol": processed_item.get('liq_vol_ratio', 0),
-                                "WC/TX%": processed_item.get('wc_tx_pct', 100),
-                                "Trade Conc.": processed_item.get('trade_concentration', 0),
-                                "Radar Score": processed_item['profile'].get('profitability_score', 0)
-                            })
-                            
-                    return results
-                except Exception as e:
-                    # print(f"Error in app scan: {e}")
-                    return []
+            asyncio.run(consume())
+            scan_progress.progress(1.0)
 
-            # Parallel Execution
-            completed = 0
-            all_results = []
-            with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-                futures = {executor.submit(process_market, m): m for m in markets}
-                for future in concurrent.futures.as_completed(futures):
-                    res = future.result()
-                    if res:
-                        all_results.extend(res)
-                    completed += 1
-                    if completed % 10 == 0:
-                        scan_progress.progress(completed / len(markets))
+            # Sustained API rate the adaptive limiter settled on
+            for host, lim in tracker.http.limits.stats().items():
+                st.write(f"🚦 {host}: {lim['rate']:.1f} req/s, concurrency {lim['concurrency']}, 429s {lim['throttled']}")
 
             st.session_state.scan_results = all_results
             status.update(label="Scan Complete!", state="complete", expanded=False)
@@ -0,0 +1,165 @@
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _Flight:
+    """One in-progress load that concurrent callers wait on."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe LRU + TTL cache with single-flight loading.
+    - maxsize: entries kept before the least recently used is evicted
+    - ttl: seconds a loaded value stays fresh
+    - negative_ttl: seconds a "not found" (loader returned None) is remembered
+    - ttl_func: optional value -> ttl override for loaded values
+    Concurrent misses on one key share a single loader call.
+    """
+    def __init__(self, maxsize=5000, ttl=300, negative_ttl=60, ttl_func=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.ttl_func = ttl_func
+        self._data = OrderedDict() # key -> (value, expires_at)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0 # Misses served by another caller's in-flight load
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key, now):
+        """Caller holds the lock. Returns cached value, None (negative) or _MISSING."""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if now >= expires_at:
+            del self._data[key]
+            self.expirations += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl=None):
+        if ttl is None:
+            if value is None:
+                ttl = self.negative_ttl
+            elif self.ttl_func is not None:
+                ttl = self.ttl_func(value)
+            else:
+                ttl = self.ttl
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_or_load(self, key, loader):
+        """
+        Cached value for key, calling loader(key) on a miss.
+        loader returns the value, None for "not found" (negative-cached), or raises
+        for transient failures (not cached; re-raised to every waiting caller).
+        """
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is not _MISSING:
+                if value is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return value
+            self.misses += 1
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.loads += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader(key)
+            with self._lock:
+                self._store(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def add(self, key, value=True, ttl=None):
+        """Store key only if absent (or expired). Returns True if it was added (atomic seen-set)."""
+        with self._lock:
+            if self._lookup(key, time.monotonic()) is not _MISSING:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key, time.monotonic()) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
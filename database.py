@@ -49,6 +49,14 @@ def init_db():
         )
     ''')
 
+    # Wallet profile cache columns (added after the original schema)
+    _ensure_columns(c, 'wallets', {
+        'age_hours': 'REAL',
+        'wallet_creation_ts': 'REAL',
+        'total_user_volume': 'REAL',
+        'profiled_at': 'REAL'
+    })
+
     # 3. Alerts Table (The Trade Events)
     # Linked to markets and wallets
     # Unique constraint on (market_id, timestamp, value, wallet) to prevent dupes
@@ -70,6 +78,30 @@ def init_db():
         )
     ''')
     
+    # 4. Scan Watermarks (newest trade already scanned, per market)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS scan_watermarks (
+            market_id TEXT PRIMARY KEY,
+            last_ts REAL,
+            last_trade_id TEXT,
+            updated_at REAL,
+            min_value REAL,
+            covered_from REAL
+        )
+    ''')
+    # Older DBs: watermarks did not record the threshold / window they cover
+    _ensure_columns(c, 'scan_watermarks', {'min_value': 'REAL', 'covered_from': 'REAL'})
+
+    # 5. Pending Discord Alerts (queued until the webhook accepts them; survive restarts)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS pending_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payload TEXT,
+            created_at REAL,
+            attempts INTEGER DEFAULT 0
+        )
+    ''')
+
     # INDICES for Performance
     c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_ts ON trade_alerts(timestamp)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_val ON trade_alerts(value)')
@@ -78,6 +110,13 @@ def init_db():
     conn.commit()
     conn.close()
 
+def _ensure_columns(c, table, columns):
+    """Add missing columns to an existing table (lightweight migration)."""
+    existing = {row[1] for row in c.execute(f"PRAGMA table_info({table})").fetchall()}
+    for name, col_type in columns.items():
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+
 def upsert_market(data):
     """
     Insert or Update market metadata.
@@ -280,6 +319,197 @@ def save_alert(data):
     finally:
         conn.close()
 
+def save_wallet_profile(address, profile):
+    """
+    Persist a full wallet profile (from analyze_wallet) for the profile cache.
+    profile: {is_fresh, win_rate, total_trades, profitability_score, age_hours, wallet_creation_ts, total_user_volume}
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        now = time.time()
+        win_rate = profile.get('win_rate')
+        c.execute('''
+            INSERT INTO wallets (address, win_rate, total_trades, is_fresh, profitability_score, last_seen,
+                                 age_hours, wallet_creation_ts, total_user_volume, profiled_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(address) DO UPDATE SET
+                win_rate=excluded.win_rate,
+                total_trades=excluded.total_trades,
+                is_fresh=excluded.is_fresh,
+                profitability_score=excluded.profitability_score,
+                age_hours=excluded.age_hours,
+                wallet_creation_ts=excluded.wallet_creation_ts,
+                total_user_volume=excluded.total_user_volume,
+                profiled_at=excluded.profiled_at
+        ''', (
+            address,
+            float(win_rate) if isinstance(win_rate, (int, float)) else 0.0,
+            int(profile.get('total_trades', 0)),
+            1 if profile.get('is_fresh') else 0,
+            float(profile.get('profitability_score', 0)),
+            now,
+            float(profile.get('age_hours', 0)),
+            float(profile.get('wallet_creation_ts', 0)),
+            float(profile.get('total_user_volume', 0)),
+            now
+        ))
+        conn.commit()
+    except Exception as e:
+        print(f"[!] Wallet Profile Save Error: {e}")
+    finally:
+        conn.close()
+
+def load_wallet_profile(address, max_age):
+    """
+    Return a persisted wallet profile profiled within max_age seconds, or None.
+    age_hours is advanced by the time since profiling.
+    """
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    try:
+        c.execute('''
+            SELECT win_rate, total_trades, profitability_score, age_hours,
+                   wallet_creation_ts, total_user_volume, profiled_at
+            FROM wallets WHERE address = ? AND profiled_at > ?
+        ''', (address, time.time() - max_age))
+        row = c.fetchone()
+    except Exception:
+        row = None
+    finally:
+        conn.close()
+    if row is None:
+        return None
+
+    age_hours = (row['age_hours'] or 0.0) + (time.time() - row['profiled_at']) / 3600
+    return {
+        'is_fresh': age_hours < 24.0,
+        'age_formatted': f"{int(age_hours)}h" if age_hours < 24 else f"{int(age_hours/24)}d",
+        'win_rate': row['win_rate'],
+        'total_trades': row['total_trades'],
+        'profitability_score': row['profitability_score'],
+        'total_user_volume': row['total_user_volume'],
+        'wallet_creation_ts': row['wallet_creation_ts'],
+        'age_hours': age_hours,
+        'profiled_at': row['profiled_at']
+    }
+
+def get_scan_watermarks():
+    """
+    Return {market_id: (last_ts, last_trade_id, min_value, covered_from)} for incremental scans.
+    min_value / covered_from: threshold and window start the watermark is complete for
+    (None for rows written before they were recorded).
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute('SELECT market_id, last_ts, last_trade_id, min_value, covered_from FROM scan_watermarks')
+        return {row[0]: (row[1], row[2], row[3], row[4]) for row in c.fetchall()}
+    except Exception as e:
+        print(f"[!] Watermark Load Error: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def save_scan_watermarks(marks):
+    """
+    Bulk upsert scan watermarks.
+    marks: {market_id: (last_ts, last_trade_id[, min_value, covered_from])}
+    """
+    if not marks:
+        return
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        now = time.time()
+        rows = []
+        for mid, mark in marks.items():
+            ts, tid, min_value, covered_from = (tuple(mark) + (None, None))[:4]
+            rows.append((mid, float(ts), tid, now, min_value, covered_from))
+        c.executemany('''
+            INSERT INTO scan_watermarks (market_id, last_ts, last_trade_id, updated_at, min_value, covered_from)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(market_id) DO UPDATE SET
+                last_ts=excluded.last_ts,
+                last_trade_id=excluded.last_trade_id,
+                updated_at=excluded.updated_at,
+                min_value=excluded.min_value,
+                covered_from=excluded.covered_from
+            WHERE excluded.last_ts >= scan_watermarks.last_ts
+        ''', rows)
+        conn.commit()
+    except Exception as e:
+        print(f"[!] Watermark Save Error: {e}")
+    finally:
+        conn.close()
+
+def save_pending_alert(embed):
+    """Queue a Discord embed for delivery. Returns its row id (None on error)."""
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute('INSERT INTO pending_alerts (payload, created_at) VALUES (?, ?)', (json.dumps(embed), time.time()))
+        conn.commit()
+        return c.lastrowid
+    except Exception as e:
+        print(f"[!] Pending Alert Save Error: {e}")
+        return None
+    finally:
+        conn.close()
+
+def get_pending_alerts(limit=1000):
+    """Return [(id, embed, attempts)] oldest first."""
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute('SELECT id, payload, attempts FROM pending_alerts ORDER BY id LIMIT ?', (limit,))
+        return [(row[0], json.loads(row[1]), row[2]) for row in c.fetchall()]
+    except Exception as e:
+        print(f"[!] Pending Alert Load Error: {e}")
+        return []
+    finally:
+        conn.close()
+
+def delete_pending_alerts(ids):
+    """Drop delivered (or undeliverable) alerts."""
+    if not ids:
+        return
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.executemany('DELETE FROM pending_alerts WHERE id = ?', [(i,) for i in ids])
+        conn.commit()
+    except Exception as e:
+        print(f"[!] Pending Alert Delete Error: {e}")
+    finally:
+        conn.close()
+
+def mark_pending_attempt(ids):
+    """Count a failed delivery attempt for the given alerts."""
+    if not ids:
+        return
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.executemany('UPDATE pending_alerts SET attempts = attempts + 1 WHERE id = ?', [(i,) for i in ids])
+        conn.commit()
+    except Exception as e:
+        print(f"[!] Pending Alert Update Error: {e}")
+    finally:
+        conn.close()
+
+def get_alerted_trades(since):
+    """(asset_id, side, price, value, timestamp ms) of alerts newer than `since` (epoch seconds)."""
+    conn = get_connection()
+    try:
+        return conn.execute(
+            'SELECT asset_id, side, price, value, timestamp FROM trade_alerts WHERE timestamp >= ?',
+            (int(since * 1000),)
+        ).fetchall()
+    finally:
+        conn.close()
+
 def get_recent_alerts(limit=100, days=None):
     """Fetch joined alerts with market and wallet info."""
     conn = get_connection()
@@ -330,6 +560,20 @@ def get_top_markets(days=7, limit=10):
     conn.close()
     return [dict(row) for row in rows]
 
+def get_alert_counts(days=30):
+    """Return {market_id: alert count} over the last `days` (scan prioritisation)."""
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        cutoff = (time.time() - (days * 86400)) * 1000 # Convert to MS
+        c.execute('SELECT market_id, COUNT(*) FROM trade_alerts WHERE timestamp > ? GROUP BY market_id', (cutoff,))
+        return {row[0]: row[1] for row in c.fetchall()}
+    except Exception as e:
+        print(f"[!] Alert Count Error: {e}")
+        return {}
+    finally:
+        conn.close()
+
 def get_smart_whales(min_trades=3):
     """Return wallets with high win rate or high volume."""
     conn = get_connection()
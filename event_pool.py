@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import queue
+import threading
+import zlib
+from collections import deque
+
+LATENCY_WINDOW = 1000 # Samples kept for percentiles
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_below', 'spill')
+SPILL_LOAD_BATCH = 500 # Events read back from a spill file at a time
+LAG_WARN_INTERVAL = 30 # Seconds between "falling behind" warnings
+
+
+class LatencyStats:
+    """Thread-safe running latency summary (count / avg / max / p50 / p95, ms)."""
+    def __init__(self, window=LATENCY_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.count += 1
+            self.total += ms
+            if ms > self.max: self.max = ms
+            self._recent.append(ms)
+
+    def histogram(self, edges=(100, 250, 500, 1000, 2500, 5000, 10000)):
+        """Rolling histogram over the recent window: [(label, count)], edges in ms."""
+        with self._lock:
+            recent = list(self._recent)
+        counts = [0] * (len(edges) + 1)
+        for ms in recent:
+            counts[next((i for i, edge in enumerate(edges) if ms < edge), len(edges))] += 1
+        labels = [f"<{edge}ms" for edge in edges] + [f">={edges[-1]}ms"]
+        return list(zip(labels, counts))
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, peak = self.count, self.total, self.max
+        def pct(p):
+            return recent[min(len(recent) - 1, int(len(recent) * p))] if recent else 0.0
+        return {
+            'count': count,
+            'avg_ms': total / count if count else 0.0,
+            'max_ms': peak,
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95)
+        }
+
+
+class BoundedEventQueue(queue.Queue):
+    """
+    queue.Queue with a capacity and an overflow policy instead of blocking producers.
+    Items are (enqueued_at, event). When full:
+    - drop_oldest: evict the oldest queued event
+    - drop_below: shed events worth less than drop_below (value_func); if none
+      are queued, fall back to dropping the oldest
+    - spill: append to a JSONL file on disk and read back in order once the
+      in-memory queue drains (FIFO is kept: while spilling, every put spills)
+    """
+    def __init__(self, maxsize, policy='drop_oldest', value_func=None, drop_below=0, spill_path=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        if policy == 'spill' and not spill_path:
+            raise ValueError("spill policy needs a spill_path")
+        super().__init__() # Unbounded underneath; capacity is enforced in put()
+        self.capacity = max(1, int(maxsize))
+        self.policy = policy
+        self.value_func = value_func or (lambda event: 0)
+        self.drop_below = drop_below
+        self.spill_path = spill_path
+        self.spilled = 0 # Events currently on disk
+        self._spill_offset = 0
+        self.drops = {'oldest': 0, 'below': 0, 'spilled': 0}
+        if spill_path and os.path.exists(spill_path):
+            os.remove(spill_path) # Leftovers from a previous run are stale
+
+    def put(self, item, block=False, timeout=None):
+        with self.mutex:
+            if self.spilled or len(self.queue) >= self.capacity:
+                if not self._overflow(item):
+                    return False
+            else:
+                self.queue.append(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+            return True
+
+    def _overflow(self, item):
+        """Caller holds the mutex. Returns True if `item` was queued (or spilled)."""
+        if self.policy == 'spill':
+            folder = os.path.dirname(self.spill_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(item) + "\n")
+            self.spilled += 1
+            self.drops['spilled'] += 1
+            return True
+
+        if self.policy == 'drop_below':
+            if self._value(item[1]) < self.drop_below:
+                self.drops['below'] += 1
+                return False
+            for i, (_, queued) in enumerate(self.queue):
+                if self._value(queued) < self.drop_below:
+                    del self.queue[i]
+                    self.drops['below'] += 1
+                    self._forget_one()
+                    self.queue.append(item)
+                    return True
+
+        self.queue.popleft()
+        self.drops['oldest'] += 1
+        self._forget_one()
+        self.queue.append(item)
+        return True
+
+    def _value(self, event):
+        try:
+            return self.value_func(event)
+        except (TypeError, ValueError):
+            return 0
+
+    def _forget_one(self):
+        # An evicted event will never be task_done()'d
+        self.unfinished_tasks -= 1
+        if self.unfinished_tasks == 0:
+            self.all_tasks_done.notify_all()
+
+    # queue.Queue hooks (called with the mutex held)
+    def _qsize(self):
+        return len(self.queue) + self.spilled
+
+    def _get(self):
+        if not self.queue and self.spilled:
+            self._load_spill()
+        return self.queue.popleft()
+
+    def _load_spill(self):
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            f.seek(self._spill_offset)
+            for _ in range(min(SPILL_LOAD_BATCH, self.capacity, self.spilled)):
+                line = f.readline()
+                if not line:
+                    break
+                ts, event = json.loads(line)
+                self.queue.append((ts, event))
+                self.spilled -= 1
+            self._spill_offset = f.tell()
+        if not self.spilled:
+            os.remove(self.spill_path)
+            self._spill_offset = 0
+
+    def wake(self):
+        """Push a None sentinel past the capacity check (wakes a waiting worker)."""
+        with self.mutex:
+            self.queue.append(None)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def oldest_age(self):
+        """Seconds the oldest in-memory event has been waiting (0 if empty)."""
+        with self.mutex:
+            return time.monotonic() - self.queue[0][0] if self.queue and self.queue[0] else 0.0
+
+
+class EventWorkerPool:
+    """
+    Consumer pool for live WebSocket events.
+    Each worker owns one queue; events are routed by key_func(event) so all
+    events for one key (market or wallet) are handled in order by the same
+    worker, while different keys proceed in parallel.
+    Tracks time spent waiting in the queue and in handler(event).
+    maxsize bounds the events held across all workers; see BoundedEventQueue
+    for the overflow policies. Warns when the oldest event waits > lag_warn s.
+    """
+    def __init__(self, handler, workers=4, key_func=None, name="live", maxsize=10000, policy='drop_oldest',
+                 value_func=None, drop_below=0, spill_dir=None, lag_warn=10.0):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.key_func = key_func or (lambda event: None)
+        self.name = name
+        self.policy = policy
+        self.lag_warn = lag_warn
+        self.queues = [
+            BoundedEventQueue(
+                max(1, maxsize // self.workers), policy=policy, value_func=value_func, drop_below=drop_below,
+                spill_path=os.path.join(spill_dir, f"{name}_spill_{i}.jsonl") if spill_dir else None
+            )
+            for i in range(self.workers)
+        ]
+        self._last_lag_warning = 0.0
+        self.queue_latency = LatencyStats()
+        self.process_latency = LatencyStats()
+        self.processed = 0
+        self.errors = 0
+        self._threads = []
+        self._running = False
+        self._lock = threading.Lock()
+
+    def partition(self, event):
+        key = self.key_func(event)
+        if key is None or self.workers == 1:
+            return 0
+        return zlib.crc32(str(key).encode()) % self.workers # Stable across runs (unlike hash())
+
+    def put(self, event):
+        self.queues[self.partition(event)].put((time.monotonic(), event))
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"{self.name}-worker-{i}", daemon=True)
+            for i, q in enumerate(self.queues)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        for q in self.queues:
+            q.wake()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _run(self, q):
+        while self._running:
+            try:
+                item = q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                q.task_done()
+                continue
+            enqueued, event = item
+            started = time.monotonic()
+            self.queue_latency.add(started - enqueued)
+            if self.lag_warn and started - enqueued > self.lag_warn:
+                self._warn_lag(started - enqueued)
+            try:
+                self.handler(event)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"[!] Worker Error: {e}")
+            finally:
+                self.process_latency.add(time.monotonic() - started)
+                with self._lock:
+                    self.processed += 1
+                q.task_done()
+
+    def _warn_lag(self, lag):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_lag_warning < LAG_WARN_INTERVAL:
+                return
+            self._last_lag_warning = now
+        print(f"[!] Live queue falling behind: {lag:.1f}s lag, depth {self.qsize()}")
+
+    def lag(self):
+        """Seconds the oldest queued event has been waiting (the current backlog)."""
+        return max((q.oldest_age() for q in self.queues), default=0.0)
+
+    def qsize(self):
+        return sum(q.qsize() for q in self.queues)
+
+    def stats(self):
+        with self._lock:
+            processed, errors = self.processed, self.errors
+        drops = {'oldest': 0, 'below': 0, 'spilled': 0}
+        for q in self.queues:
+            for k, v in q.drops.items():
+                drops[k] += v
+        return {
+            'workers': self.workers,
+            'policy': self.policy,
+            'capacity': sum(q.capacity for q in self.queues),
+            'depth': self.qsize(),
+            'depth_per_worker': [q.qsize() for q in self.queues],
+            'on_disk': sum(q.spilled for q in self.queues),
+            'lag_s': self.lag(),
+            'dropped': drops['oldest'] + drops['below'],
+            'drops': drops,
+            'processed': processed,
+            'errors': errors,
+            'queue': self.queue_latency.snapshot(),
+            'processing': self.process_latency.snapshot()
+        }
@@ -0,0 +1,147 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+
+class FillRing:
+    """
+    Ring buffer of one key's recent fills with running totals. Fills are stored
+    interleaved (ts, usd value, shares, fill count) in one flat array that starts
+    at 2 slots and doubles up to `slots`. When full, the oldest fill is folded
+    into the next one (totals stay exact; it just expires a little later).
+    """
+    __slots__ = ('buf', 'slots', 'head', 'count', 'total_value', 'total_size', 'total_fills')
+    STRIDE = 4 # ts, value, size, fills
+    INITIAL_SLOTS = 2
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.buf = array('d', bytes(8 * self.STRIDE * min(slots, self.INITIAL_SLOTS)))
+        self.head = 0 # Slot of the oldest fill
+        self.count = 0
+        self.total_value = 0.0
+        self.total_size = 0.0
+        self.total_fills = 0
+
+    def capacity(self):
+        return len(self.buf) // self.STRIDE
+
+    def _at(self, i):
+        """Array offset of the i-th oldest fill."""
+        return (self.head + i) % self.capacity() * self.STRIDE
+
+    def _grow(self):
+        # Unwrap oldest-first into a bigger array
+        size = min(self.slots, self.capacity() * 2)
+        buf = array('d')
+        for i in range(self.count):
+            at = self._at(i)
+            buf.extend(self.buf[at:at + self.STRIDE])
+        buf.frombytes(bytes(8 * self.STRIDE * (size - self.count)))
+        self.buf, self.head = buf, 0
+
+    def expire(self, cutoff):
+        buf = self.buf
+        while self.count and buf[self.head * self.STRIDE] < cutoff:
+            at = self.head * self.STRIDE
+            self.total_value -= buf[at + 1]
+            self.total_size -= buf[at + 2]
+            self.total_fills -= int(buf[at + 3])
+            self.head = (self.head + 1) % self.capacity()
+            self.count -= 1
+        if not self.count:
+            self.total_value = self.total_size = 0.0 # No float drift on an empty window
+
+    def push(self, ts, value, size):
+        if self.count == self.capacity():
+            if self.count < self.slots:
+                self._grow()
+            else:
+                oldest, nxt = self._at(0), self._at(1)
+                for k in (1, 2, 3):
+                    self.buf[nxt + k] += self.buf[oldest + k]
+                self.head = (self.head + 1) % self.capacity()
+                self.count -= 1
+        at = self._at(self.count)
+        self.buf[at:at + self.STRIDE] = array('d', (ts, value, size, 1))
+        self.count += 1
+        self.total_value += value
+        self.total_size += size
+        self.total_fills += 1
+
+    def newest(self):
+        return self.buf[self._at(self.count - 1)] if self.count else 0.0
+
+    def first(self):
+        return self.buf[self._at(0)] if self.count else 0.0
+
+
+class FillAggregator:
+    """
+    Sliding-window totals per (wallet, market, side) for fills below the whale
+    threshold. add() returns one aggregated fill once a key's total within
+    `window` seconds reaches `threshold`, then starts that key's window afresh.
+    Memory is bounded: at most `max_keys` rings (least recently active evicted)
+    of at most `slots` fills each; most keys only ever hold a couple.
+    """
+    def __init__(self, window=600, threshold=6000, max_keys=50000, slots=16):
+        self.window = window
+        self.threshold = threshold
+        self.max_keys = max_keys
+        self.slots = slots
+        self._rings = OrderedDict() # (wallet, market, side) -> FillRing
+        self._lock = threading.Lock()
+        self.fills = 0
+        self.emitted = 0
+        self.evicted = 0
+
+    def add(self, wallet, market_id, side, ts, price, size, threshold=None):
+        """
+        Record one fill. Returns {'price' (VWAP), 'size', 'value', 'fills', 'first_ts', 'last_ts'}
+        when the window total crosses the threshold, else None.
+        """
+        key = (wallet, market_id, side)
+        value = price * size
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            self.fills += 1
+            ring = self._rings.get(key)
+            if ring is None:
+                self._trim(ts, room=1)
+                ring = self._rings[key] = FillRing(self.slots)
+            else:
+                self._rings.move_to_end(key)
+            ring.expire(ts - self.window)
+            ring.push(ts, value, size)
+            if ring.total_value < threshold:
+                return None
+
+            result = {
+                'price': ring.total_value / ring.total_size if ring.total_size else price,
+                'size': ring.total_size,
+                'value': ring.total_value,
+                'fills': ring.total_fills,
+                'first_ts': ring.first(),
+                'last_ts': ring.newest()
+            }
+            del self._rings[key] # Next alert needs a fresh threshold's worth of fills
+            self.emitted += 1
+            return result
+
+    def _trim(self, now, room=0):
+        """Caller holds the lock. Drop idle rings from the LRU end and keep `room` below max_keys."""
+        while self._rings:
+            key, ring = next(iter(self._rings.items()))
+            if len(self._rings) + room > self.max_keys or ring.newest() < now - self.window:
+                del self._rings[key]
+                self.evicted += 1
+            else:
+                break
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rings)
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._rings), 'fills': self.fills, 'emitted': self.emitted, 'evicted': self.evicted}
@@ -0,0 +1,176 @@
+import ssl
+import time
+import threading
+import contextlib
+from urllib.parse import urlparse
+
+import aiohttp
+import certifi
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+
+# DEFAULTS
+DEFAULT_POOL_SIZE = 25 # Connections kept alive per host (match scan concurrency)
+DEFAULT_TIMEOUT = (5.0, 20.0) # (connect, read) seconds
+HOST_POOLS = 8 # gamma-api, data-api, discord, ... (one pool per host)
+
+
+class HttpClient:
+    """
+    Shared HTTP layer for every Polymarket / Discord call.
+    One requests.Session with keep-alive pools per host, default timeouts, gzip,
+    and per-endpoint call counts + latency.
+    Every request first takes a token from the host's shared adaptive rate limiter.
+    Async scans use an aiohttp session opened via async_session() (same stats).
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'User-Agent': 'poly-scanner/1.1'
+        })
+        # urllib3 keeps one pool per host; pool_maxsize caps keep-alive sockets per host.
+        # pool_block=False -> bursts above the pool size still go out (just not reused).
+        adapter = HTTPAdapter(pool_connections=HOST_POOLS, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Map endpoint -> {calls, errors, total_ms, max_ms, status: {code: count}}
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+        # Per-host adaptive rate limits (shared by all threads and tasks)
+        self.limits = rate_limiter.RateLimiterRegistry()
+
+        # aiohttp session (only alive inside async_session())
+        self._aio = None
+
+    @staticmethod
+    def endpoint_key(url):
+        """'https://gamma-api.polymarket.com/markets/123?x=1' -> 'gamma-api.polymarket.com/markets'"""
+        parsed = urlparse(url)
+        parts = [p for p in parsed.path.split('/') if p]
+        first = parts[0] if parts else ''
+        return f"{parsed.netloc}/{first}"
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        return self.request('GET', url, params=params, timeout=timeout, **kwargs)
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        return self.request('POST', url, json=json, timeout=timeout, **kwargs)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Send a request through the pooled session. Raises like requests does."""
+        endpoint = self.endpoint_key(url)
+        limiter = self.limits.for_url(url)
+        limiter.acquire()
+        start = time.perf_counter()
+        status = None
+        retry_after = None
+        try:
+            if method == 'GET':
+                resp = self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+            elif method == 'POST':
+                resp = self.session.post(url, timeout=timeout or self.timeout, **kwargs)
+            else:
+                resp = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            status = resp.status_code
+            if status == 429 or status >= 500:
+                retry_after = resp.headers.get('Retry-After')
+            return resp
+        finally:
+            self._record(endpoint, (time.perf_counter() - start) * 1000, status)
+            limiter.release(status, retry_after)
+
+    @contextlib.asynccontextmanager
+    async def async_session(self, limit=None):
+        """
+        Open a pooled aiohttp session for the running event loop.
+        limit: max sockets in flight (defaults to pool_size).
+        """
+        limit = limit or self.pool_size
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        connector = aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit,
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+            ssl=ssl.create_default_context(cafile=certifi.where())
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            headers={'Accept-Encoding': 'gzip, deflate', 'User-Agent': self.session.headers['User-Agent']}
+        )
+        previous = self._aio
+        self._aio = session
+        try:
+            yield self
+        finally:
+            self._aio = previous
+            await session.close()
+
+    async def get_json_async(self, url, params=None):
+        """
+        GET through the aiohttp session. Returns (status, data, headers).
+        data is None unless status == 200. Raises on network errors.
+        """
+        if self._aio is None:
+            raise RuntimeError("get_json_async() needs an open async_session()")
+        endpoint = self.endpoint_key(url)
+        limiter = self.limits.for_url(url)
+        await limiter.acquire_async()
+        start = time.perf_counter()
+        status = None
+        retry_after = None
+        try:
+            async with self._aio.get(url, params=params) as resp:
+                status = resp.status
+                if status == 429 or status >= 500:
+                    retry_after = resp.headers.get('Retry-After')
+                data = await resp.json(content_type=None) if status == 200 else None
+                return status, data, resp.headers
+        finally:
+            self._record(endpoint, (time.perf_counter() - start) * 1000, status)
+            limiter.release(status, retry_after)
+
+    def _record(self, endpoint, elapsed_ms, status):
+        with self._stats_lock:
+            s = self._stats.get(endpoint)
+            if s is None:
+                s = {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'status': {}}
+                self._stats[endpoint] = s
+            s['calls'] += 1
+            s['total_ms'] += elapsed_ms
+            if elapsed_ms > s['max_ms']: s['max_ms'] = elapsed_ms
+            if status is None or status >= 400:
+                s['errors'] += 1
+            key = status if status is not None else 'exc'
+            s['status'][key] = s['status'].get(key, 0) + 1
+
+    def stats(self):
+        """Snapshot: endpoint -> {calls, errors, avg_ms, max_ms, status}"""
+        with self._stats_lock:
+            out = {}
+            for endpoint, s in self._stats.items():
+                out[endpoint] = {
+                    'calls': s['calls'],
+                    'errors': s['errors'],
+                    'avg_ms': s['total_ms'] / s['calls'] if s['calls'] else 0.0,
+                    'max_ms': s['max_ms'],
+                    'status': dict(s['status'])
+                }
+            return out
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {}
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# Gamma fields kept out of the compact record (loaded on demand)
+LAZY_FIELDS = ('description',)
+
+
+def _market_key(m):
+    return str(m.get('id') or m.get('conditionId'))
+
+def _as_list(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return value if isinstance(value, list) else []
+
+
+class MarketCatalog:
+    """
+    On-disk market catalog (SQLite) replacing the market_map.json blob.
+    Indexed by Gamma id, conditionId, slug and CLOB token id; lookups hit the
+    index instead of loading every record. Long fields (description) live in
+    their own column and are only read when asked for.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_markets (
+                    id TEXT PRIMARY KEY,
+                    condition_id TEXT,
+                    slug TEXT,
+                    rank INTEGER,
+                    data TEXT,
+                    description TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_tokens (
+                    token_id TEXT PRIMARY KEY,
+                    market_id TEXT,
+                    outcome TEXT,
+                    outcome_index INTEGER
+                )
+            ''')
+            conn.execute('CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_condition ON catalog_markets(condition_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_slug ON catalog_markets(slug)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_rank ON catalog_markets(rank)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_tokens_market ON catalog_tokens(market_id)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def exists(self):
+        return self._conn is not None or os.path.exists(self.path)
+
+    # --- Writes ---
+
+    def replace_all(self, markets, full_sync=None, timestamp=None):
+        """Full rebuild: replace every market (order = rank)."""
+        now = timestamp or time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM catalog_markets')
+                conn.execute('DELETE FROM catalog_tokens')
+                self._write(conn, markets, start_rank=0)
+                self._set_meta(conn, timestamp=now, full_sync=full_sync or now)
+
+    def upsert(self, markets, removed_ids=(), timestamp=None):
+        """Incremental sync: upsert changed markets (new ones rank last) and drop removed ids."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for mid in removed_ids:
+                    conn.execute('DELETE FROM catalog_markets WHERE id = ?', (str(mid),))
+                    conn.execute('DELETE FROM catalog_tokens WHERE market_id = ?', (str(mid),))
+
+                row = conn.execute('SELECT COALESCE(MAX(rank), -1) FROM catalog_markets').fetchone()
+                next_rank = row[0] + 1
+                for m in markets:
+                    key = _market_key(m)
+                    existing = conn.execute('SELECT rank FROM catalog_markets WHERE id = ?', (key,)).fetchone()
+                    conn.execute('DELETE FROM catalog_tokens WHERE market_id = ?', (key,))
+                    if existing:
+                        self._write(conn, [m], start_rank=existing[0])
+                    else:
+                        self._write(conn, [m], start_rank=next_rank)
+                        next_rank += 1
+                self._set_meta(conn, timestamp=timestamp or time.time())
+
+    def _write(self, conn, markets, start_rank):
+        for i, m in enumerate(markets):
+            key = _market_key(m)
+            compact = {k: v for k, v in m.items() if k not in LAZY_FIELDS}
+            conn.execute('''
+                INSERT OR REPLACE INTO catalog_markets (id, condition_id, slug, rank, data, description)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                key,
+                m.get('conditionId'),
+                m.get('slug'),
+                start_rank + i,
+                json.dumps(compact, separators=(',', ':')),
+                m.get('description')
+            ))
+            tokens = _as_list(m.get('clobTokenIds'))
+            outcomes = _as_list(m.get('outcomes'))
+            for idx, token in enumerate(tokens):
+                if idx < len(outcomes):
+                    outcome = outcomes[idx]
+                elif len(tokens) == 2:
+                    outcome = "Yes" if idx == 0 else "No"
+                else:
+                    outcome = None
+                conn.execute(
+                    'INSERT OR REPLACE INTO catalog_tokens (token_id, market_id, outcome, outcome_index) VALUES (?, ?, ?, ?)',
+                    (str(token), key, outcome, idx)
+                )
+
+    def _set_meta(self, conn, **values):
+        for k, v in values.items():
+            conn.execute('INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)', (k, v))
+
+    # --- Reads ---
+
+    def meta(self):
+        """{'timestamp': last sync, 'full_sync': last full rebuild, 'count': n} or None if empty."""
+        if not self.exists():
+            return None
+        with self._lock:
+            conn = self._connect()
+            values = dict(conn.execute('SELECT key, value FROM catalog_meta').fetchall())
+            count = conn.execute('SELECT COUNT(*) FROM catalog_markets').fetchone()[0]
+        if not count or 'timestamp' not in values:
+            return None
+        return {'timestamp': values['timestamp'], 'full_sync': values.get('full_sync', 0), 'count': count}
+
+    def list_markets(self, limit=None):
+        """Compact market dicts (no description) in rank order."""
+        if not self.exists():
+            return []
+        query = 'SELECT data FROM catalog_markets ORDER BY rank'
+        params = ()
+        if limit:
+            query += ' LIMIT ?'
+            params = (int(limit),)
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get(self, key):
+        """Lookup by Gamma id, conditionId, slug or CLOB token id. Returns compact dict or None."""
+        if not key or not self.exists():
+            return None
+        key = str(key)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT data FROM catalog_markets WHERE id = ?', (key,)).fetchone()
+            if row is None:
+                row = conn.execute('SELECT data FROM catalog_markets WHERE condition_id = ?', (key,)).fetchone()
+            if row is None:
+                row = conn.execute('SELECT data FROM catalog_markets WHERE slug = ?', (key,)).fetchone()
+            if row is None:
+                row = conn.execute('''
+                    SELECT m.data FROM catalog_tokens t JOIN catalog_markets m ON m.id = t.market_id
+                    WHERE t.token_id = ?
+                ''', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_token(self, token_id):
+        """CLOB token id -> (compact market dict, outcome label) or (None, None)."""
+        if not token_id or not self.exists():
+            return None, None
+        with self._lock:
+            row = self._connect().execute('''
+                SELECT m.data, t.outcome FROM catalog_tokens t JOIN catalog_markets m ON m.id = t.market_id
+                WHERE t.token_id = ?
+            ''', (str(token_id),)).fetchone()
+        if not row:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def description(self, key):
+        """Lazy read of the long description field (by id or conditionId)."""
+        if not key or not self.exists():
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT description FROM catalog_markets WHERE id = ? OR condition_id = ?', (str(key), str(key))
+            ).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,206 @@
+import time
+import asyncio
+import threading
+import collections
+import email.utils
+from urllib.parse import urlparse
+
+# Per-host defaults: (start rate/s, max rate/s, start concurrency, max concurrency)
+# Starting points only - AIMD walks them up until the API pushes back.
+HOST_LIMITS = {
+    'gamma-api.polymarket.com': (20.0, 60.0, 25, 100),
+    'data-api.polymarket.com': (30.0, 120.0, 50, 400),
+    'discord.com': (1.0, 2.5, 1, 2), # Webhooks: 5 requests / 2s per bucket
+    'discordapp.com': (1.0, 2.5, 1, 2),
+}
+DEFAULT_LIMITS = (10.0, 50.0, 10, 50)
+
+MIN_RATE = 0.5 # Never decrease below this (req/s)
+DECREASE_FACTOR = 0.5 # Multiplicative decrease on 429/5xx
+DEFAULT_BACKOFF = 1.0 # Pause (s) after a 429 without Retry-After
+MAX_BACKOFF = 60.0 # Cap on honoured Retry-After
+SLOT_WAIT = 1.0 # Backstop only: release() wakes callers waiting for a slot
+
+
+def parse_retry_after(value):
+    """Retry-After header (delta-seconds or HTTP-date) -> seconds, or None."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        dt = email.utils.parsedate_to_datetime(str(value))
+        return max(0.0, dt.timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _wake_waiter(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket + AIMD concurrency window for one API host.
+    Thread-safe; usable from threads (acquire) and asyncio tasks (acquire_async).
+    Callers waiting for a concurrency slot sleep until release() frees one.
+    Successes grow rate/concurrency additively (~+1 per window), 429/5xx halve them,
+    and Retry-After pauses every caller of the host until it expires.
+    """
+    def __init__(self, rate, max_rate, concurrency, max_concurrency):
+        self.rate = float(rate)
+        self.max_rate = float(max_rate)
+        self.limit = float(concurrency)
+        self.max_limit = float(max_concurrency)
+
+        self.tokens = 1.0
+        self.burst = max(1.0, self.rate) # Up to ~1s worth of requests at once
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+
+        self.throttled = 0 # 429s seen
+        self.server_errors = 0 # 5xx seen
+        self._lock = threading.RLock()
+        self._slot_freed = threading.Condition(self._lock) # Threads waiting for a slot
+        self._waiters = collections.deque() # (loop, future) of tasks waiting for a slot
+
+    def _try_acquire(self):
+        """Take a token + slot. Returns 0 on success, otherwise seconds to wait."""
+        return self._take()[0]
+
+    def _take(self):
+        """_try_acquire, plus whether the wait is for a free slot (release() wakes those)."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now, False
+
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+
+            if self.in_flight >= int(self.limit):
+                return SLOT_WAIT, True
+            if self.tokens < 1.0:
+                return (1.0 - self.tokens) / self.rate, False
+
+            self.tokens -= 1.0
+            self.in_flight += 1
+            return 0, False
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                wait, slot = self._take()
+                if not wait:
+                    return
+                if slot:
+                    self._slot_freed.wait(wait)
+                    continue
+            time.sleep(wait) # Token refill / Retry-After pause: nothing to be woken by
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                wait, slot = self._take()
+                if not wait:
+                    return
+                if slot:
+                    waiter = loop.create_future()
+                    self._waiters.append((loop, waiter))
+            if not slot:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await asyncio.wait_for(waiter, wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    try:
+                        self._waiters.remove((loop, waiter)) # Still queued: timed out / cancelled
+                    except ValueError:
+                        pass
+
+    def _wake(self):
+        """Caller holds the lock. Wake as many slot waiters as there are free slots."""
+        free = int(self.limit) - self.in_flight
+        if free <= 0:
+            return
+        self._slot_freed.notify(free)
+        while free > 0 and self._waiters:
+            loop, waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            try:
+                loop.call_soon_threadsafe(_wake_waiter, waiter)
+                free -= 1
+            except RuntimeError: # Loop closed
+                pass
+
+    def release(self, status=None, retry_after=None):
+        """Report the outcome of a request (status None = network error)."""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if status == 429 or (status is not None and status >= 500):
+                if status == 429:
+                    self.throttled += 1
+                else:
+                    self.server_errors += 1
+                # Multiplicative decrease
+                self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+                self.limit = max(1.0, self.limit * DECREASE_FACTOR)
+                self.burst = max(1.0, self.rate)
+                self.tokens = min(self.tokens, 0.0)
+
+                pause = parse_retry_after(retry_after)
+                if pause is None and status == 429:
+                    pause = DEFAULT_BACKOFF
+                if pause:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + min(pause, MAX_BACKOFF))
+            elif status is not None and status < 400:
+                # Additive increase: ~+1 req/s and +1 slot per full window of successes
+                self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.burst = max(1.0, self.rate)
+            self._wake()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'concurrency': int(self.limit),
+                'in_flight': self.in_flight,
+                'throttled': self.throttled,
+                'server_errors': self.server_errors,
+                'paused_for': max(0.0, self.blocked_until - time.monotonic())
+            }
+
+
+class RateLimiterRegistry:
+    """One shared AdaptiveRateLimiter per API host."""
+    def __init__(self, host_limits=None):
+        self.host_limits = dict(HOST_LIMITS if host_limits is None else host_limits)
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        return self.for_host(urlparse(url).netloc)
+
+    def for_host(self, host):
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = AdaptiveRateLimiter(*self.host_limits.get(host, DEFAULT_LIMITS))
+                self._limiters[host] = limiter
+            return limiter
+
+    def stats(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {host: lim.stats() for host, lim in limiters.items()}
@@ -0,0 +1,144 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.console import Console
+from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeRemainingColumn
+
+
+class ScanSink:
+    """
+    Receives events from PolymarketTracker.iter_whales_async(). Every hook is optional.
+    - start(total): scan begins (total markets, None when unknown e.g. firehose)
+    - whale(item): one whale result (process_whale item), as soon as it is found
+    - market_done(market, results): a market finished (results may be empty)
+    - finish(summary): scan ended, even on error / budget stop
+    """
+    def start(self, total):
+        pass
+
+    def whale(self, item):
+        pass
+
+    def market_done(self, market, results):
+        pass
+
+    def finish(self, summary):
+        pass
+
+
+class ConsoleSink(ScanSink):
+    """Rich progress bar + one line per whale + coverage summary."""
+    def __init__(self, console=None, label="Scanning"):
+        self.console = console or Console()
+        self.label = label
+        self.progress = None
+        self.task_id = None
+
+    def start(self, total):
+        self.progress = Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+            TimeRemainingColumn(),
+            console=self.console
+        )
+        self.progress.start()
+        what = f"{total} markets" if total is not None else "trade feed"
+        self.task_id = self.progress.add_task(f"[cyan]{self.label} {what}...", total=total)
+
+    def whale(self, item):
+        self.progress.console.print(
+            f"[bold red]🚨 WHALE FOUND: ${item['value']:,.0f} on {item['outcome']}[/] in [blue]{item['market']}[/]"
+        )
+
+    def market_done(self, market, results):
+        self.progress.update(self.task_id, advance=1)
+
+    def finish(self, summary):
+        if self.progress is not None:
+            self.progress.stop()
+        self.console.print(f"\n[bold green][*] Scan complete. Found {summary['found']} whale trades.[/bold green]")
+        if summary.get('markets') is not None:
+            self.console.print(f"[*] Coverage: {summary['scanned']:,}/{summary['markets']:,} markets "
+                               f"({summary['volume_share']:.0%} of 24h volume) in {summary['elapsed']:.1f}s, "
+                               f"{summary['requests']:,} requests")
+            if summary['skipped']:
+                self.console.print(f"[yellow][!] Budget reached: skipped the {summary['skipped']:,} "
+                                   f"lowest-priority markets.[/yellow]")
+        else:
+            self.console.print(f"[*] {summary['scanned']:,} markets with whales in {summary['elapsed']:.1f}s, "
+                               f"{summary['requests']:,} requests")
+        self.console.print()
+
+
+class DatabaseSink(ScanSink):
+    """
+    Persists every whale (market, wallet, alert rows) via tracker.persist_whale.
+    Writes run in batches on one writer thread so SQLite never blocks the scan's
+    event loop; finish() waits until everything is written.
+    """
+    BATCH_SIZE = 50
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self._pending = []
+        self._writer = None
+        self._futures = []
+
+    def start(self, total):
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-sink")
+
+    def whale(self, item):
+        self._pending.append(item)
+        if len(self._pending) >= self.BATCH_SIZE:
+            self._flush()
+
+    def market_done(self, market, results):
+        if self._pending:
+            self._flush()
+
+    def finish(self, summary):
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.shutdown(wait=True)
+        self._writer = None
+        for future in self._futures:
+            future.result() # Surface write errors
+        self._futures = []
+
+    def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        if self._writer is None: # Used without start(): write inline
+            self._write(batch)
+            return
+        self._futures.append(self._writer.submit(self._write, batch))
+
+    def _write(self, batch):
+        for item in batch:
+            self.tracker.persist_whale(item)
+
+
+class JsonlSink(ScanSink):
+    """Appends one JSON object per whale to a .jsonl file."""
+    SKIP_FIELDS = ('description',) # Long text, available from the market catalog
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    def start(self, total):
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def whale(self, item):
+        record = {k: v for k, v in item.items() if k not in self.SKIP_FIELDS}
+        self._fh.write(json.dumps(record, default=str) + "\n")
+        self._fh.flush()
+
+    def finish(self, summary):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,136 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alert_dispatcher
+import database
+
+def response(status, headers=None, body=None):
+    resp = MagicMock(status_code=status, headers=headers or {})
+    resp.json.return_value = body or {}
+    return resp
+
+class TestDiscordDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.http = MagicMock()
+        self.http.post.return_value = response(204)
+        self.dispatcher = alert_dispatcher.DiscordDispatcher(self.http, lambda: 'https://discord/hook', persist=False)
+
+    def test_burst_packed_ten_embeds_per_message(self):
+        self.dispatcher.queue.put((None, {'title': 'first'}))
+        for n in range(14):
+            self.dispatcher.queue.put((None, {'title': n}))
+        self.dispatcher.start()
+        deadline = time.time() + 2
+        while self.dispatcher.counts['sent'] < 15 and time.time() < deadline:
+            time.sleep(0.01)
+        self.dispatcher.stop()
+
+        sizes = [len(c.kwargs['json']['embeds']) for c in self.http.post.call_args_list]
+        self.assertEqual(sizes, [10, 5])
+        self.assertEqual(self.dispatcher.counts['messages'], 2)
+
+    def test_burst_packed_within_character_limit(self):
+        big = {'title': 'x', 'description': 'd' * 2500}
+        for _ in range(5):
+            self.dispatcher.queue.put((None, dict(big)))
+        self.dispatcher.start()
+        deadline = time.time() + 2
+        while self.dispatcher.counts['sent'] < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        self.dispatcher.stop()
+
+        sizes = [len(c.kwargs['json']['embeds']) for c in self.http.post.call_args_list]
+        self.assertEqual(sizes, [2, 2, 1])
+
+    def test_rejected_batch_is_split_and_retried(self):
+        def post(url, json, timeout):
+            bad = any(e['title'] == 'bad' for e in json['embeds'])
+            return response(400 if bad else 204)
+        self.http.post.side_effect = post
+        batch = [(None, {'title': t}) for t in ('a', 'b', 'bad', 'c')]
+
+        self.assertFalse(self.dispatcher.deliver(batch))
+        self.assertEqual(self.dispatcher.counts['sent'], 3)
+        self.assertEqual(self.dispatcher.counts['failed'], 1)
+
+    @patch('alert_dispatcher.RETRY_BASE', 0.01)
+    def test_server_errors_retry_with_backoff(self):
+        self.http.post.side_effect = [response(502), ConnectionError("reset"), response(204)]
+        self.assertTrue(self.dispatcher.deliver([(None, {'title': 'x'})]))
+        self.assertEqual(self.dispatcher.counts['retries'], 2)
+
+    def test_rate_limit_waits_for_retry_after(self):
+        self.http.post.side_effect = [response(429, body={'retry_after': 0.05}), response(204)]
+        started = time.monotonic()
+        self.assertTrue(self.dispatcher.deliver([(None, {'title': 'x'})]))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(self.dispatcher.counts['rate_limited'], 1)
+
+    def test_exhausted_bucket_delays_next_send(self):
+        self.http.post.return_value = response(204, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '0.05'})
+        self.dispatcher.deliver([(None, {'title': 'a'})])
+        started = time.monotonic()
+        self.dispatcher.deliver([(None, {'title': 'b'})])
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+    def test_rejected_payload_is_not_retried(self):
+        self.http.post.return_value = response(400)
+        self.assertFalse(self.dispatcher.deliver([(None, {'title': 'x'})]))
+        self.assertEqual(self.http.post.call_count, 1)
+
+class TestPendingAlerts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.original_db_name = database.DB_NAME
+        database.DB_NAME = os.path.join(self.tmp.name, 'test.db')
+        database.init_db()
+
+    def tearDown(self):
+        database.DB_NAME = self.original_db_name
+        self.tmp.cleanup()
+
+    @patch('alert_dispatcher.MAX_ATTEMPTS', 1)
+    def test_undelivered_alerts_survive_a_restart(self):
+        down = MagicMock()
+        down.post.return_value = response(503)
+        first = alert_dispatcher.DiscordDispatcher(down, lambda: 'https://discord/hook')
+        first.queue.put = MagicMock() # Keep the sender thread out of it
+        first.send({'title': 'whale'})
+        first.deliver([(database.get_pending_alerts()[0][0], {'title': 'whale'})])
+        self.assertEqual(database.get_pending_alerts()[0][2], 1) # Attempt counted
+
+        up = MagicMock()
+        up.post.return_value = response(204)
+        second = alert_dispatcher.DiscordDispatcher(up, lambda: 'https://discord/hook')
+        second.start()
+        deadline = time.time() + 2
+        while second.counts['sent'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        second.stop()
+
+        self.assertEqual(up.post.call_args.kwargs['json']['embeds'], [{'title': 'whale'}])
+        self.assertEqual(database.get_pending_alerts(), [])
+
+    def test_first_alert_is_sent_once(self):
+        http = MagicMock()
+        http.post.return_value = response(204)
+        dispatcher = alert_dispatcher.DiscordDispatcher(http, lambda: 'https://discord/hook')
+        dispatcher.send({'title': 'whale'})
+        deadline = time.time() + 2
+        while database.get_pending_alerts() and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        dispatcher.stop()
+
+        embeds = [e for c in http.post.call_args_list for e in c.kwargs['json']['embeds']]
+        self.assertEqual(embeds, [{'title': 'whale'}])
+
+if __name__ == '__main__':
+    unittest.main()
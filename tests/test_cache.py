@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import threading
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+import whale_tracker
+
+class TestTTLCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        c = cache.TTLCache(maxsize=2, ttl=60)
+        c.set('a', 1)
+        c.set('b', 2)
+        c.get('a') # 'a' is now most recent
+        c.set('c', 3)
+        self.assertIn('a', c)
+        self.assertNotIn('b', c)
+        self.assertEqual(c.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        c = cache.TTLCache(maxsize=10, ttl=0.01)
+        c.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.stats()['expirations'], 1)
+
+    def test_add_is_a_seen_set(self):
+        c = cache.TTLCache(maxsize=10, ttl=0.01)
+        self.assertTrue(c.add('k'))
+        self.assertFalse(c.add('k'))
+        time.sleep(0.02)
+        self.assertTrue(c.add('k')) # Expired keys count as new
+
+    def test_negative_caching(self):
+        c = cache.TTLCache(maxsize=10, ttl=60, negative_ttl=60)
+        loader = MagicMock(return_value=None)
+        self.assertIsNone(c.get_or_load('gone', loader))
+        self.assertIsNone(c.get_or_load('gone', loader))
+        loader.assert_called_once()
+        self.assertEqual(c.stats()['negative_hits'], 1)
+
+    def test_errors_are_not_cached(self):
+        c = cache.TTLCache()
+        loader = MagicMock(side_effect=[RuntimeError("503"), 'ok'])
+        with self.assertRaises(RuntimeError):
+            c.get_or_load('k', loader)
+        self.assertEqual(c.get_or_load('k', loader), 'ok')
+
+    def test_single_flight(self):
+        c = cache.TTLCache()
+        calls = []
+        release = threading.Event()
+
+        def slow_loader(key):
+            calls.append(key)
+            release.wait(2)
+            return {'title': key}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(c.get_or_load('m1', slow_loader))) for _ in range(8)]
+        for t in threads: t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads: t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(c.stats()['coalesced'], 7)
+
+class TestMarketInfoCache(unittest.TestCase):
+    def setUp(self):
+        whale_tracker.market_cache.clear()
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.tracker.catalog = MagicMock(get=MagicMock(return_value=None))
+
+    def test_404_is_negative_cached(self):
+        self.tracker.http = MagicMock()
+        self.tracker.http.get.return_value = MagicMock(status_code=404)
+        self.assertIsNone(self.tracker.get_market_info('0xMissing'))
+        self.assertIsNone(self.tracker.get_market_info('0xMissing'))
+        self.tracker.http.get.assert_called_once()
+
+    def test_hit_skips_gamma(self):
+        self.tracker.http = MagicMock()
+        self.tracker.http.get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={'question': 'Q', 'conditionId': '0x1'}))
+        self.assertEqual(self.tracker.get_market_info('0x1')['title'], 'Q')
+        self.assertEqual(self.tracker.get_market_info('0x1')['title'], 'Q')
+        self.tracker.http.get.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -128,5 +128,52 @@ class TestDatabasePersistence(unittest.TestCase):
         self.assertEqual(row[0], 0.0)
         self.assertEqual(row[1], 0.0)
 
+    def test_wallet_profile_roundtrip(self):
+        """Full profile persists and is only served while within max_age."""
+        profile = {
+            'is_fresh': True, 'win_rate': 0.25, 'total_trades': 4, 'profitability_score': 90,
+            'age_hours': 2.0, 'wallet_creation_ts': time.time() - 7200, 'total_user_volume': 12345.0
+        }
+        database.save_wallet_profile('0xProfiled', profile)
+
+        loaded = database.load_wallet_profile('0xProfiled', max_age=3600)
+        self.assertIsNotNone(loaded)
+        self.assertEqual(loaded['profitability_score'], 90)
+        self.assertEqual(loaded['total_user_volume'], 12345.0)
+        self.assertAlmostEqual(loaded['age_hours'], 2.0, delta=0.01)
+        self.assertTrue(loaded['is_fresh'])
+
+        self.assertIsNone(database.load_wallet_profile('0xProfiled', max_age=-1))
+        self.assertIsNone(database.load_wallet_profile('0xUnknown', max_age=3600))
+
+    def test_scan_watermarks_only_move_forward(self):
+        database.save_scan_watermarks({'0xM': (1000.0, '0xa', 6000.0, 500.0)})
+        database.save_scan_watermarks({'0xM': (900.0, '0xstale', 6000.0, 500.0)})
+        self.assertEqual(database.get_scan_watermarks(), {'0xM': (1000.0, '0xa', 6000.0, 500.0)})
+        database.save_scan_watermarks({'live': (1200.0, None)}) # Coverage is optional
+        self.assertEqual(database.get_scan_watermarks()['live'], (1200.0, None, None, None))
+
+    def test_alert_counts_per_market(self):
+        now = time.time()
+        for i, (mid, ts) in enumerate([('0xA', now), ('0xA', now - 60), ('0xB', now), ('0xC', now - 90 * 86400)]):
+            database.save_alert({'market_id': mid, 'wallet': f'0xW{i}', 'value': 7000.0, 'timestamp': ts})
+        self.assertEqual(database.get_alert_counts(days=30), {'0xA': 2, '0xB': 1})
+
+    def test_init_db_migrates_old_wallets_table(self):
+        """Profile columns are added to a pre-existing wallets table."""
+        conn = database.get_connection()
+        conn.execute("DROP TABLE wallets")
+        conn.execute("CREATE TABLE wallets (address TEXT PRIMARY KEY, win_rate REAL, total_trades INTEGER, is_fresh INTEGER, profitability_score REAL, last_seen REAL)")
+        conn.commit()
+        conn.close()
+
+        database.init_db()
+
+        conn = database.get_connection()
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(wallets)").fetchall()}
+        conn.close()
+        self.assertIn('profiled_at', cols)
+        self.assertIn('total_user_volume', cols)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import time
+import threading
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_pool
+import whale_tracker
+
+class TestEventWorkerPool(unittest.TestCase):
+    def test_per_key_order_kept_across_workers(self):
+        seen = {}
+        lock = threading.Lock()
+
+        def handler(event):
+            time.sleep(0.001)
+            with lock:
+                seen.setdefault(event['key'], []).append(event['seq'])
+
+        pool = event_pool.EventWorkerPool(handler, workers=4, key_func=lambda e: e['key'])
+        pool.start()
+        for seq in range(50):
+            for key in ('a', 'b', 'c'):
+                pool.put({'key': key, 'seq': seq})
+        for q in pool.queues:
+            q.join()
+        pool.stop()
+
+        for key in ('a', 'b', 'c'):
+            self.assertEqual(seen[key], list(range(50)))
+        self.assertEqual(pool.stats()['processed'], 150)
+
+    def test_slow_event_does_not_block_other_keys(self):
+        release = threading.Event()
+        done = []
+
+        def handler(event):
+            if event['key'] == 'slow':
+                release.wait(2)
+            done.append(event['key'])
+
+        pool = event_pool.EventWorkerPool(handler, workers=2, key_func=lambda e: e['key'])
+        # Pick a fast key that lands on the other worker
+        fast = next(k for k in map(str, range(100)) if pool.partition({'key': k}) != pool.partition({'key': 'slow'}))
+        pool.start()
+        pool.put({'key': 'slow'})
+        pool.put({'key': fast})
+        deadline = time.time() + 2
+        while fast not in done and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        pool.stop()
+        self.assertEqual(done[0], fast)
+
+    def test_latency_and_errors_recorded(self):
+        pool = event_pool.EventWorkerPool(MagicMock(side_effect=[None, RuntimeError("boom")]), workers=1)
+        pool.start()
+        pool.put({})
+        pool.put({})
+        pool.queues[0].join()
+        pool.stop()
+        stats = pool.stats()
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['queue']['count'], 2)
+        self.assertEqual(stats['processing']['count'], 2)
+
+    def test_tracker_partitions_both_tokens_of_a_market_together(self):
+        tracker = whale_tracker.PolymarketTracker()
+        tracker.asset_index = {'tokYes': ({'market_id': '0xM'}, 'Yes'), 'tokNo': ({'market_id': '0xM'}, 'No')}
+        self.assertEqual(tracker._event_partition_key({'asset_id': 'tokYes'}),
+                         tracker._event_partition_key({'asset_id': 'tokNo'}))
+
+    def test_latency_histogram_buckets(self):
+        stats = event_pool.LatencyStats()
+        for seconds in (0.05, 0.3, 0.3, 20):
+            stats.add(seconds)
+        hist = dict(stats.histogram(edges=(100, 1000)))
+        self.assertEqual(hist, {'<100ms': 1, '<1000ms': 2, '>=1000ms': 1})
+
+class TestBoundedEventQueue(unittest.TestCase):
+    def _drain(self, q):
+        out = []
+        while q.qsize():
+            out.append(q.get_nowait()[1]['n'])
+            q.task_done()
+        return out
+
+    def test_drop_oldest(self):
+        q = event_pool.BoundedEventQueue(3, policy='drop_oldest')
+        for n in range(5):
+            q.put((time.monotonic(), {'n': n}))
+        self.assertEqual(self._drain(q), [2, 3, 4])
+        self.assertEqual(q.drops['oldest'], 2)
+
+    def test_drop_below_sheds_small_trades_first(self):
+        q = event_pool.BoundedEventQueue(2, policy='drop_below', value_func=lambda e: e['v'], drop_below=100)
+        q.put((0, {'n': 0, 'v': 500}))
+        q.put((0, {'n': 1, 'v': 50}))
+        self.assertTrue(q.put((0, {'n': 2, 'v': 900}))) # Evicts the small one
+        self.assertFalse(q.put((0, {'n': 3, 'v': 10}))) # Small newcomer is dropped
+        self.assertEqual(self._drain(q), [0, 2])
+        self.assertEqual(q.drops['below'], 2)
+
+    def test_spill_keeps_order_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'spill.jsonl')
+            q = event_pool.BoundedEventQueue(2, policy='spill', spill_path=path)
+            for n in range(6):
+                q.put((time.monotonic(), {'n': n}))
+            self.assertEqual(q.qsize(), 6)
+            self.assertEqual(q.spilled, 4)
+            self.assertEqual(self._drain(q), list(range(6)))
+            self.assertFalse(os.path.exists(path))
+
+    def test_pool_reports_depth_lag_and_drops(self):
+        pool = event_pool.EventWorkerPool(MagicMock(), workers=1, maxsize=2)
+        for n in range(3):
+            pool.put({'n': n})
+        time.sleep(0.01)
+        stats = pool.stats()
+        self.assertEqual((stats['depth'], stats['capacity'], stats['dropped']), (2, 2, 1))
+        self.assertGreater(stats['lag_s'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
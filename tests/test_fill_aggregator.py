@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fill_aggregator
+import whale_tracker
+
+class TestFillAggregator(unittest.TestCase):
+    def test_emits_once_when_window_crosses_threshold(self):
+        agg = fill_aggregator.FillAggregator(window=600, threshold=50000)
+        results = [agg.add('0xW', '0xM', 'BUY', 1000 + i, 0.5, 10000) for i in range(10)]
+
+        self.assertEqual(results[:9], [None] * 9)
+        self.assertEqual(results[9]['fills'], 10)
+        self.assertAlmostEqual(results[9]['value'], 50000)
+        self.assertAlmostEqual(results[9]['price'], 0.5) # VWAP
+        self.assertEqual(len(agg), 0) # Window restarts after an alert
+
+    def test_keys_are_wallet_market_side(self):
+        agg = fill_aggregator.FillAggregator(threshold=10000)
+        agg.add('0xW', '0xM', 'BUY', 0, 0.5, 12000)
+        self.assertIsNone(agg.add('0xW', '0xM', 'SELL', 1, 0.5, 12000))
+        self.assertIsNone(agg.add('0xW', '0xOther', 'BUY', 2, 0.5, 12000))
+        self.assertIsNotNone(agg.add('0xW', '0xM', 'BUY', 3, 0.5, 12000))
+
+    def test_old_fills_expire(self):
+        agg = fill_aggregator.FillAggregator(window=60, threshold=10000)
+        agg.add('0xW', '0xM', 'BUY', 0, 0.5, 12000)
+        self.assertIsNone(agg.add('0xW', '0xM', 'BUY', 100, 0.5, 12000))
+
+    def test_full_ring_folds_without_losing_value(self):
+        agg = fill_aggregator.FillAggregator(threshold=1000, slots=4)
+        for i in range(9):
+            self.assertIsNone(agg.add('0xW', '0xM', 'BUY', i, 1.0, 100))
+        result = agg.add('0xW', '0xM', 'BUY', 9, 1.0, 100)
+        self.assertAlmostEqual(result['value'], 1000)
+        self.assertEqual(result['fills'], 10)
+
+    def test_ring_starts_small_and_grows_to_slots(self):
+        ring = fill_aggregator.FillRing(slots=8)
+        self.assertEqual(ring.capacity(), 2)
+        for i in range(5):
+            ring.push(float(i), 10.0, 1.0)
+        self.assertEqual((ring.capacity(), ring.count, ring.first(), ring.newest()), (8, 5, 0.0, 4.0))
+        ring.expire(2.0)
+        for i in range(5, 12):
+            ring.push(float(i), 10.0, 1.0)
+        self.assertEqual(ring.capacity(), 8) # Capped at slots, oldest folded
+        self.assertEqual((ring.total_fills, ring.newest()), (10, 11.0))
+        self.assertAlmostEqual(ring.total_value, 100.0)
+
+    def test_memory_bounded_by_max_keys(self):
+        agg = fill_aggregator.FillAggregator(threshold=1e9, max_keys=100)
+        for i in range(1000):
+            agg.add(f"0x{i}", '0xM', 'BUY', 0, 0.5, 10)
+        self.assertEqual(len(agg), 100)
+        self.assertEqual(agg.stats()['evicted'], 900)
+
+class TestLiveFillAggregation(unittest.TestCase):
+    @patch('whale_tracker.PolymarketTracker.process_whale')
+    def test_split_whale_alerts_once(self, mock_process_whale):
+        tracker = whale_tracker.PolymarketTracker()
+        tracker.asset_index = {'tok': ({'market_id': '0xM', 'title': 'M'}, 'Yes')}
+        for n in range(3):
+            tracker._handle_event_worker({'event_type': 'trade', 'asset_id': 'tok', 'price': '0.5', 'size': '8000',
+                                          'side': 'BUY', 'owner': '0xW', 'timestamp': str(1700000000 + n)})
+
+        mock_process_whale.assert_called_once()
+        t_data = mock_process_whale.call_args.args[0]
+        self.assertEqual((t_data['size'], t_data['fills'], t_data['market_id']), (16000, 2, '0xM'))
+
+    def test_socket_admits_fills_for_aggregation(self):
+        tracker = whale_tracker.PolymarketTracker()
+        tracker.event_queue = MagicMock()
+        tracker.on_message(None, '{"event_type": "trade", "price": "0.5", "size": "3000", "owner": "0xW"}')
+        tracker.on_message(None, '{"event_type": "trade", "price": "0.5", "size": "100", "owner": "0xW"}')
+        self.assertEqual(tracker.event_queue.put.call_count, 1)
+
+    def test_anonymous_fills_keep_the_whale_floor(self):
+        tracker = whale_tracker.PolymarketTracker()
+        tracker.event_queue = MagicMock()
+        tracker.on_message(None, '{"event_type": "last_trade_price", "price": "0.5", "size": "3000"}')
+        tracker.on_message(None, '[{"event_type": "trade", "price": "0.5", "size": "3000"}]')
+        tracker.event_queue.put.assert_not_called()
+        self.assertEqual(tracker.live_filter['dropped_size'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+import whale_tracker
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.client = http_client.HttpClient(pool_size=50, timeout=(1.0, 2.0))
+
+    def test_endpoint_key_strips_ids_and_query(self):
+        key = http_client.HttpClient.endpoint_key("https://gamma-api.polymarket.com/markets/0xabc?x=1")
+        self.assertEqual(key, "gamma-api.polymarket.com/markets")
+
+    def test_pool_sized_to_concurrency(self):
+        adapter = self.client.session.get_adapter("https://data-api.polymarket.com/trades")
+        self.assertEqual(adapter._pool_maxsize, 50)
+
+    @patch('requests.Session.get')
+    def test_default_timeout_and_stats(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200)
+        self.client.get("https://data-api.polymarket.com/trades?market=1")
+        self.client.get("https://data-api.polymarket.com/trades?market=2")
+
+        self.assertEqual(mock_get.call_args.kwargs['timeout'], (1.0, 2.0))
+        stats = self.client.stats()["data-api.polymarket.com/trades"]
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(stats['status'], {200: 2})
+
+    @patch('requests.Session.get')
+    def test_exceptions_counted_as_errors(self, mock_get):
+        mock_get.side_effect = ConnectionError("boom")
+        with self.assertRaises(ConnectionError):
+            self.client.get("https://gamma-api.polymarket.com/markets")
+        stats = self.client.stats()["gamma-api.polymarket.com/markets"]
+        self.assertEqual(stats['errors'], 1)
+
+    def test_tracker_routes_calls_through_client(self):
+        tracker = whale_tracker.PolymarketTracker()
+        tracker.http = MagicMock()
+        tracker.http.get.return_value = MagicMock(status_code=200, json=MagicMock(return_value=[{'id': 1}]))
+        self.assertEqual(tracker.fetch_recent_trades('0x1'), [{'id': 1}])
+        tracker.http.get.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import market_catalog
+
+MARKETS = [
+    {'id': '101', 'conditionId': '0xabc', 'slug': 'btc-100k', 'question': 'BTC 100k?',
+     'clobTokenIds': json.dumps(['111', '222']), 'outcomes': json.dumps(['Yes', 'No']),
+     'description': 'A very long description ' * 50},
+    {'id': '102', 'conditionId': '0xdef', 'slug': 'eth-10k', 'question': 'ETH 10k?',
+     'clobTokenIds': json.dumps(['333', '444'])}
+]
+
+class TestMarketCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "catalog.db")
+        self.catalog = market_catalog.MarketCatalog(self.path)
+        self.catalog.replace_all(MARKETS)
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmpdir.cleanup()
+
+    def test_lookup_by_every_key(self):
+        for key in ('101', '0xabc', 'btc-100k', '222'):
+            self.assertEqual(self.catalog.get(key)['id'], '101')
+        self.assertIsNone(self.catalog.get('missing'))
+
+    def test_description_is_lazy(self):
+        self.assertNotIn('description', self.catalog.get('101'))
+        self.assertTrue(self.catalog.description('0xabc').startswith('A very long'))
+
+    def test_token_outcomes(self):
+        market, outcome = self.catalog.get_token('222')
+        self.assertEqual((market['id'], outcome), ('101', 'No'))
+        # No outcomes list on a binary market -> Yes/No by position
+        self.assertEqual(self.catalog.get_token('333')[1], 'Yes')
+
+    def test_reopen_keeps_order_and_meta(self):
+        self.catalog.close()
+        reopened = market_catalog.MarketCatalog(self.path)
+        self.assertEqual([m['id'] for m in reopened.list_markets()], ['101', '102'])
+        self.assertEqual(reopened.meta()['count'], 2)
+        reopened.close()
+
+    def test_upsert_and_remove(self):
+        self.catalog.upsert([{'id': '103', 'slug': 'new'}, {'id': '101', 'slug': 'btc-100k', 'question': 'Edited'}], removed_ids=['102'])
+        self.assertEqual([m['id'] for m in self.catalog.list_markets()], ['101', '103'])
+        self.assertEqual(self.catalog.get('101')['question'], 'Edited')
+        self.assertIsNone(self.catalog.get('333')) # tokens of removed market are gone
+
+    def test_missing_file_is_not_created_by_reads(self):
+        missing = market_catalog.MarketCatalog(os.path.join(self.tmpdir.name, "none.db"))
+        self.assertIsNone(missing.meta())
+        self.assertIsNone(missing.get('101'))
+        self.assertFalse(os.path.exists(missing.path))
+
+if __name__ == '__main__':
+    unittest.main()
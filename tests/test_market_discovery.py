@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import threading
+from urllib.parse import urlparse, parse_qs
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whale_tracker
+
+class TestParallelMarketDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def _fake_gamma(self, total):
+        """Gamma stand-in with `total` markets; records requested offsets."""
+        def fake_request(url):
+            qs = parse_qs(urlparse(url).query)
+            offset, limit = int(qs['offset'][0]), int(qs['limit'][0])
+            with self.lock:
+                self.requested.append(offset)
+            return [{'id': str(i)} for i in range(offset, min(offset + limit, total))]
+        return fake_request
+
+    def test_pages_merged_in_order_and_stop_at_last_page(self):
+        self.tracker.make_api_request = self._fake_gamma(total=250)
+        self.tracker.save_market_map = MagicMock()
+
+        markets = self.tracker.fetch_active_markets(limit_override=10000, use_cache=False)
+
+        self.assertEqual([m['id'] for m in markets], [str(i) for i in range(250)])
+        # Window is bounded: nothing past the window beyond the last page is requested
+        self.assertLessEqual(max(self.requested), 200 + (whale_tracker.MARKET_PAGE_WINDOW - 1) * 100)
+        self.assertLessEqual(len(self.requested), 3 + whale_tracker.MARKET_PAGE_WINDOW)
+
+    def test_on_page_streams_pages(self):
+        self.tracker.make_api_request = self._fake_gamma(total=1000)
+        self.tracker.save_market_map = MagicMock()
+        pages = []
+
+        markets = self.tracker.fetch_active_markets(limit_override=350, use_cache=False, on_page=pages.append)
+
+        self.assertEqual(len(markets), 350)
+        self.assertEqual([len(p) for p in pages], [100, 100, 100, 50])
+        self.assertEqual(pages[0][0]['id'], '0')
+
+    def test_failed_page_keeps_partial_result(self):
+        fake = self._fake_gamma(total=1000)
+        self.tracker.make_api_request = lambda url: None if 'offset=200' in url else fake(url)
+        self.tracker.save_market_map = MagicMock()
+
+        markets = self.tracker.fetch_active_markets(limit_override=1000, use_cache=False)
+        self.assertEqual(len(markets), 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import json
+import time
+import tempfile
+import datetime
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whale_tracker
+import market_catalog
+
+def iso(ts):
+    return datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+class TestIncrementalMarketRefresh(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tracker.catalog = market_catalog.MarketCatalog(os.path.join(self.tmpdir.name, "catalog.db"))
+        self.original_file = whale_tracker.MARKET_MAP_FILE
+        whale_tracker.MARKET_MAP_FILE = os.path.join(self.tmpdir.name, "market_map.json")
+        self.now = time.time()
+
+    def tearDown(self):
+        self.tracker.catalog.close()
+        whale_tracker.MARKET_MAP_FILE = self.original_file
+        self.tmpdir.cleanup()
+
+    def _write_cache(self, markets, age, full_age):
+        self.tracker.catalog.replace_all(markets, full_sync=self.now - full_age, timestamp=self.now - age)
+
+    def test_expired_cache_merges_changes(self):
+        cached = [{'id': '1', 'question': 'Old'}, {'id': '2', 'question': 'Closing'}, {'id': '3', 'question': 'Stale'}]
+        self._write_cache(cached, age=7200, full_age=7200)
+
+        page = [
+            {'id': '1', 'question': 'Updated', 'updatedAt': iso(self.now - 60), 'active': True, 'closed': False},
+            {'id': '2', 'updatedAt': iso(self.now - 120), 'closed': True},
+            {'id': '4', 'question': 'New', 'updatedAt': iso(self.now - 180), 'active': True, 'closed': False},
+            {'id': '3', 'question': 'Untouched', 'updatedAt': iso(self.now - 86400), 'active': True}
+        ]
+        self.tracker.make_api_request = MagicMock(return_value=page)
+
+        markets = self.tracker.load_market_map()
+
+        self.assertEqual([m['id'] for m in markets], ['1', '3', '4'])
+        self.assertEqual(markets[0]['question'], 'Updated')
+        self.assertEqual(markets[1]['question'], 'Stale') # older than last sync -> ignored
+        self.assertEqual(self.tracker.make_api_request.call_count, 1)
+
+        # Saved back with the original full-sync time and a fresh timestamp
+        meta = self.tracker.catalog.meta()
+        self.assertAlmostEqual(meta['full_sync'], self.now - 7200, delta=1)
+        self.assertGreater(meta['timestamp'], self.now - 5)
+
+    def test_old_full_sync_forces_rebuild(self):
+        self._write_cache([{'id': '1'}], age=7200, full_age=whale_tracker.FULL_REFRESH_INTERVAL + 10)
+        self.tracker.make_api_request = MagicMock()
+
+        self.assertIsNone(self.tracker.load_market_map())
+        self.tracker.make_api_request.assert_not_called()
+
+    def test_failed_refresh_falls_back(self):
+        self._write_cache([{'id': '1'}], age=7200, full_age=7200)
+        self.tracker.make_api_request = MagicMock(return_value=None)
+        self.assertIsNone(self.tracker.load_market_map())
+
+    def test_new_busy_market_survives_the_limit(self):
+        self._write_cache([{'id': str(i), 'volume24hr': 1000 - i} for i in range(5)], age=60, full_age=60)
+        self.tracker.catalog.upsert([{'id': 'hot', 'volume24hr': 10_000_000}]) # Ranks last in the catalog
+
+        markets = self.tracker.fetch_active_markets(limit_override=5)
+        self.assertEqual([m['id'] for m in markets], ['hot', '0', '1', '2', '3'])
+
+    def test_legacy_json_imported_once(self):
+        with open(whale_tracker.MARKET_MAP_FILE, 'w') as f:
+            json.dump({'timestamp': self.now, 'markets': [{'id': '7', 'question': 'Legacy'}]}, f)
+
+        markets = self.tracker.load_market_map()
+        self.assertEqual([m['id'] for m in markets], ['7'])
+        self.assertEqual(self.tracker.catalog.meta()['count'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
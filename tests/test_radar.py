@@ -14,7 +14,7 @@ class TestRadarScore(unittest.TestCase):
     def setUp(self):
         self.tracker = whale_tracker.PolymarketTracker()
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_perfect_sniper_score(self, mock_get):
         """Test a perfect sniper trade (+30 Fresh, +30 Focused, +40 Fast)."""
         now = datetime.datetime.utcnow()
@@ -43,7 +43,7 @@ class TestRadarScore(unittest.TestCase):
         self.assertEqual(result['profitability_score'], 100)
         self.assertTrue(result['is_fresh'])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_slow_fresh_wallet(self, mock_get):
         """Test a fresh wallet that took too long to trade."""
         now = datetime.datetime.utcnow()
@@ -67,7 +67,7 @@ class TestRadarScore(unittest.TestCase):
         # Total: 60
         self.assertEqual(result['profitability_score'], 60)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_old_wallet(self, mock_get):
         """Test an old wallet (Age > 24h)."""
         now = datetime.datetime.now(tz=datetime.timezone.utc)
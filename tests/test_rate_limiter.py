@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+import whale_tracker
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_additive_increase_on_success(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=10, max_rate=20, concurrency=5, max_concurrency=10)
+        for _ in range(10):
+            lim.acquire()
+            lim.release(200)
+        stats = lim.stats()
+        self.assertAlmostEqual(stats['rate'], 11.0, delta=0.1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_multiplicative_decrease_on_429(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=10, max_rate=20, concurrency=8, max_concurrency=10)
+        lim.acquire()
+        lim.release(429, retry_after='0')
+        stats = lim.stats()
+        self.assertEqual(stats['rate'], 5.0)
+        self.assertEqual(stats['concurrency'], 4)
+        self.assertEqual(stats['throttled'], 1)
+
+    def test_retry_after_pauses_host(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=100, max_rate=100, concurrency=10, max_concurrency=10)
+        lim.acquire()
+        lim.release(429, retry_after='2')
+        self.assertGreater(lim._try_acquire(), 1.5)
+        self.assertGreater(lim.stats()['paused_for'], 1.5)
+
+    def test_concurrency_window_blocks(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=100, max_rate=100, concurrency=1, max_concurrency=1)
+        lim.tokens = 5
+        self.assertEqual(lim._try_acquire(), 0)
+        self.assertGreater(lim._try_acquire(), 0) # slot taken
+        lim.release(200)
+        self.assertEqual(lim._try_acquire(), 0)
+
+    def test_async_acquire(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=50, max_rate=50, concurrency=5, max_concurrency=5)
+        async def run():
+            await lim.acquire_async()
+            lim.release(200)
+        asyncio.run(run())
+        self.assertEqual(lim.stats()['in_flight'], 0)
+
+    def test_release_wakes_slot_waiters(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=1000, max_rate=1000, concurrency=1, max_concurrency=1)
+        lim.tokens = 10
+        async def run():
+            await lim.acquire_async()
+            waiter = asyncio.ensure_future(lim.acquire_async())
+            await asyncio.sleep(0.01)
+            self.assertFalse(waiter.done()) # Parked, not polling
+            started = time.monotonic()
+            lim.release(200)
+            await asyncio.wait_for(waiter, 0.5)
+            return time.monotonic() - started
+        self.assertLess(asyncio.run(run()), rate_limiter.SLOT_WAIT / 2)
+
+    def test_token_and_pause_waits_are_not_slot_waiters(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=20, max_rate=20, concurrency=5, max_concurrency=5)
+        lim.tokens = 0 # Next token in 50ms
+        async def run():
+            task = asyncio.ensure_future(lim.acquire_async())
+            await asyncio.sleep(0.01)
+            self.assertEqual(len(lim._waiters), 0) # Sleeping on the refill, not queued for a slot
+            await asyncio.wait_for(task, 1.0)
+        asyncio.run(run())
+
+    def test_timed_out_waiter_is_dropped(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=1000, max_rate=1000, concurrency=1, max_concurrency=1)
+        lim.tokens = 10
+        async def run():
+            await lim.acquire_async()
+            with patch('rate_limiter.SLOT_WAIT', 0.01):
+                task = asyncio.ensure_future(lim.acquire_async())
+                await asyncio.sleep(0.05)
+                self.assertLessEqual(len(lim._waiters), 1) # Re-queued once, never piling up
+                task.cancel()
+            await asyncio.sleep(0)
+        asyncio.run(run())
+        self.assertEqual(len(lim._waiters), 0)
+
+    def test_release_wakes_waiting_thread(self):
+        lim = rate_limiter.AdaptiveRateLimiter(rate=1000, max_rate=1000, concurrency=1, max_concurrency=1)
+        lim.tokens = 10
+        lim.acquire()
+        got = threading.Event()
+        threading.Thread(target=lambda: (lim.acquire(), got.set()), daemon=True).start()
+        time.sleep(0.01)
+        self.assertFalse(got.is_set())
+        lim.release(200)
+        self.assertTrue(got.wait(rate_limiter.SLOT_WAIT / 2))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(rate_limiter.parse_retry_after('3'), 3.0)
+        self.assertIsNone(rate_limiter.parse_retry_after('garbage'))
+        self.assertIsNone(rate_limiter.parse_retry_after(None))
+
+    def test_registry_shares_limiter_per_host(self):
+        reg = rate_limiter.RateLimiterRegistry()
+        a = reg.for_url("https://data-api.polymarket.com/trades?market=1")
+        b = reg.for_url("https://data-api.polymarket.com/activity?user=x")
+        self.assertIs(a, b)
+        self.assertIsNot(a, reg.for_url("https://gamma-api.polymarket.com/markets"))
+
+class TestRetryOn429(unittest.TestCase):
+    @patch('requests.Session.get')
+    def test_make_api_request_retries_instead_of_dropping(self, mock_get):
+        throttled = MagicMock(status_code=429, headers={'Retry-After': '0'})
+        ok = MagicMock(status_code=200, headers={})
+        ok.json.return_value = [{'id': 1}]
+        mock_get.side_effect = [throttled, throttled, ok]
+
+        tracker = whale_tracker.PolymarketTracker()
+        self.assertEqual(tracker.make_api_request("https://data-api.polymarket.com/trades"), [{'id': 1}])
+        self.assertEqual(tracker.http.limits.for_host('data-api.polymarket.com').stats()['throttled'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,371 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import asyncio
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whale_tracker
+
+class TestAsyncScanEngine(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.now = time.time()
+
+    def _collect(self, markets, handler, **kwargs):
+        async def run():
+            return [item async for item in self.tracker.iter_scan_async(markets, handler, **kwargs)]
+        return asyncio.run(run())
+
+    def test_only_candidates_reach_handler(self):
+        """Small and out-of-window trades are filtered before the handler thread."""
+        trades = {
+            'm1': [
+                {'size': 20000, 'price': 0.5, 'timestamp': self.now * 1000}, # whale (ms ts)
+                {'size': 10, 'price': 0.5, 'timestamp': self.now},           # too small
+                {'size': 20000, 'price': 0.5, 'timestamp': self.now - 5 * 86400} # too old
+            ],
+            'm2': []
+        }
+
+        async def fake_pages(market_id, since=None, max_pages=None, min_value=None):
+            if trades[market_id]:
+                yield trades[market_id]
+        self.tracker.iter_trade_pages_async = fake_pages
+
+        handler = MagicMock(side_effect=lambda market, cands: [len(cands)])
+        results = self._collect([{'id': 'm1'}, {'id': 'm2'}], handler, days=1.0, min_value=6000)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(dict((m['id'], r) for m, r in results), {'m1': [1], 'm2': []})
+        handler.assert_called_once()
+
+    def test_concurrency_is_bounded(self):
+        in_flight = 0
+        peak = 0
+
+        async def fake_pages(market_id, since=None, max_pages=None, min_value=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            yield []
+        self.tracker.iter_trade_pages_async = fake_pages
+
+        markets = [{'id': str(i)} for i in range(50)]
+        results = self._collect(markets, MagicMock(), concurrency=5)
+
+        self.assertEqual(len(results), 50)
+        self.assertLessEqual(peak, 5)
+
+class TestIncrementalScan(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.now = time.time()
+        self.trades = [
+            {'transactionHash': '0xnew', 'size': 20000, 'price': 0.5, 'timestamp': self.now - 10},
+            {'transactionHash': '0xmark', 'size': 20000, 'price': 0.5, 'timestamp': self.now - 100},
+            {'transactionHash': '0xold', 'size': 20000, 'price': 0.5, 'timestamp': self.now - 200}
+        ]
+        self.seen_since = []
+
+        async def fake_pages(market_id, since=None, max_pages=None, min_value=None):
+            self.seen_since.append(since)
+            yield [t for t in self.trades if t['timestamp'] >= since]
+        self.tracker.iter_trade_pages_async = fake_pages
+
+    def _collect(self, handler, **kwargs):
+        async def run():
+            return [item async for item in self.tracker.iter_scan_async([{'id': 'm1'}], handler, **kwargs)]
+        return asyncio.run(run())
+
+    @patch('database.save_scan_watermarks')
+    @patch('database.get_scan_watermarks')
+    def test_only_trades_after_watermark(self, mock_get, mock_save):
+        covered = self.now - 2 * 86400
+        mock_get.return_value = {'m1': (self.now - 100, '0xmark', 6000, covered)}
+        handler = MagicMock(side_effect=lambda market, cands: [c['transactionHash'] for c in cands])
+
+        results = self._collect(handler, incremental=True, min_value=6000)
+
+        self.assertEqual(results[0][1], ['0xnew'])
+        self.assertAlmostEqual(self.seen_since[0], self.now - 100, delta=1)
+        mock_save.assert_called_once_with({'m1': (self.now - 10, '0xnew', 6000, covered)})
+
+    @patch('database.save_scan_watermarks')
+    @patch('database.get_scan_watermarks')
+    def test_lower_threshold_ignores_watermark(self, mock_get, mock_save):
+        """A watermark from a 50k scan says nothing about the 10k trades before it."""
+        mock_get.return_value = {'m1': (self.now - 100, '0xmark', 50000, self.now - 2 * 86400)}
+        handler = MagicMock(side_effect=lambda market, cands: [c['transactionHash'] for c in cands])
+
+        results = self._collect(handler, incremental=True, min_value=6000)
+
+        self.assertEqual(results[0][1], ['0xnew', '0xmark', '0xold'])
+        saved = mock_save.call_args.args[0]['m1']
+        self.assertEqual(saved[2], 6000)
+        self.assertAlmostEqual(saved[3], self.now - 86400, delta=5) # Covers the full window now
+
+    @patch('database.save_scan_watermarks')
+    @patch('database.get_scan_watermarks')
+    def test_longer_lookback_ignores_watermark(self, mock_get, mock_save):
+        mock_get.return_value = {'m1': (self.now - 100, '0xmark', 6000, self.now - 86400)}
+        self._collect(MagicMock(), incremental=True, min_value=6000, days=7)
+        self.assertAlmostEqual(self.seen_since[0], self.now - 7 * 86400, delta=5)
+
+    @patch('database.save_scan_watermarks')
+    @patch('database.get_scan_watermarks')
+    def test_legacy_watermark_without_coverage_is_not_trusted(self, mock_get, mock_save):
+        mock_get.return_value = {'m1': (self.now - 100, '0xmark', None, None)}
+        self._collect(MagicMock(), incremental=True, min_value=6000)
+        self.assertAlmostEqual(self.seen_since[0], self.now - 86400, delta=5)
+
+    @patch('database.save_scan_watermarks')
+    @patch('database.get_scan_watermarks', return_value={})
+    def test_failed_handler_keeps_watermark(self, mock_get, mock_save):
+        handler = MagicMock(side_effect=RuntimeError("db down"))
+        self._collect(handler, incremental=True)
+        mock_save.assert_not_called()
+
+    @patch('database.get_scan_watermarks')
+    def test_full_scan_ignores_watermarks(self, mock_get):
+        handler = MagicMock(side_effect=lambda market, cands: cands)
+        results = self._collect(handler)
+        self.assertEqual(len(results[0][1]), 3)
+        mock_get.assert_not_called()
+
+class TestFirehoseScan(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.tracker.catalog = MagicMock()
+        self.tracker.catalog.get.side_effect = lambda cid: {'id': 'g1', 'conditionId': cid, 'question': 'Known'} if cid == '0xa' else None
+        self.now = time.time()
+        self.urls = []
+
+    def _feed(self, pages):
+        async def fake_request(url, retries=None):
+            self.urls.append(url)
+            return pages[len(self.urls) - 1] if len(self.urls) <= len(pages) else []
+        self.tracker.make_api_request_async = fake_request
+
+    def _collect(self, handler, **kwargs):
+        async def run():
+            return [item async for item in self.tracker.iter_firehose_scan_async(handler, **kwargs)]
+        return asyncio.run(run())
+
+    @patch.object(whale_tracker, 'FIREHOSE_PAGE_SIZE', 2)
+    def test_pages_global_feed_and_joins_catalog(self):
+        self._feed([
+            [{'conditionId': '0xa', 'transactionHash': '1', 'size': 20000, 'price': 0.5, 'timestamp': self.now},
+             {'conditionId': '0xb', 'transactionHash': '2', 'size': 30000, 'price': 0.5, 'timestamp': self.now - 10,
+              'title': 'Unlisted', 'slug': 'unlisted'}],
+            [{'conditionId': '0xa', 'transactionHash': '3', 'size': 10, 'price': 0.5, 'timestamp': self.now - 20},
+             {'conditionId': '0xa', 'transactionHash': '4', 'size': 20000, 'price': 0.5, 'timestamp': self.now - 5 * 86400}]
+        ])
+        handler = MagicMock(side_effect=lambda market, cands: [c['transactionHash'] for c in cands])
+
+        results = dict((m['question'], r) for m, r in self._collect(handler, days=1.0, min_value=6000))
+
+        self.assertEqual(results, {'Known': ['1'], 'Unlisted': ['2']})
+        self.assertEqual(len(self.urls), 2) # Second page crosses the cutoff
+        self.assertNotIn('market=', self.urls[0])
+
+    @patch.object(whale_tracker, 'FIREHOSE_PAGE_SIZE', 2)
+    def test_duplicates_across_shifted_pages(self):
+        trade = {'conditionId': '0xa', 'transactionHash': '1', 'size': 20000, 'price': 0.5, 'timestamp': self.now}
+        self._feed([[trade, dict(trade, transactionHash='2')], [dict(trade, transactionHash='2')]])
+        handler = MagicMock(side_effect=lambda market, cands: [c['transactionHash'] for c in cands])
+        results = self._collect(handler)
+        self.assertEqual(results[0][1], ['1', '2'])
+
+    @patch('database.save_scan_watermarks')
+    @patch('database.get_scan_watermarks', return_value={})
+    def test_budget_exhaustion_keeps_watermark(self, mock_get, mock_save):
+        with patch.object(whale_tracker, 'FIREHOSE_PAGE_SIZE', 1):
+            self._feed([[{'conditionId': '0xa', 'transactionHash': str(i), 'size': 1, 'price': 1, 'timestamp': self.now}] for i in range(5)])
+            self._collect(MagicMock(), max_pages=3, incremental=True)
+        self.assertEqual(len(self.urls), 3)
+        mock_save.assert_not_called()
+
+class TestBatchedTrades(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.now = time.time()
+        self.urls = []
+        # '0xbusy' trades every second, the rest once
+        self.trades = {
+            '0xbusy': [{'conditionId': '0xbusy', 'size': 20000, 'price': 0.5, 'timestamp': self.now - i} for i in range(20)],
+            '0xa': [{'conditionId': '0xa', 'size': 20000, 'price': 0.5, 'timestamp': self.now - 30}],
+            '0xb': [{'conditionId': '0xb', 'size': 20000, 'price': 0.5, 'timestamp': self.now - 40}],
+            '0xc': []
+        }
+
+        async def fake_request(url, retries=None):
+            self.urls.append(url)
+            qs = dict(p.split('=') for p in url.split('?')[1].split('&'))
+            rows = [t for mid in qs['market'].split(',') for t in self.trades[mid]]
+            rows.sort(key=lambda t: -t['timestamp'])
+            offset, limit = int(qs['offset']), int(qs['limit'])
+            return rows[offset:offset + limit]
+        self.tracker.make_api_request_async = fake_request
+
+    def _collect(self, markets, handler, **kwargs):
+        async def run():
+            return [item async for item in self.tracker.iter_scan_async(markets, handler, **kwargs)]
+        return asyncio.run(run())
+
+    @patch.object(whale_tracker, 'TRADE_BATCH_LIMIT', 100)
+    def test_one_request_split_per_market(self):
+        markets = [{'conditionId': mid} for mid in ('0xa', '0xb', '0xc')]
+        handler = MagicMock(side_effect=lambda market, cands: [len(cands)])
+
+        results = dict((m['conditionId'], r) for m, r in self._collect(markets, handler, concurrency=1))
+
+        self.assertEqual(results, {'0xa': [1], '0xb': [1], '0xc': []})
+        self.assertEqual(len(self.urls), 1)
+        self.assertIn('market=0xa,0xb,0xc', self.urls[0])
+
+    @patch.object(whale_tracker, 'TRADE_BATCH_LIMIT', 10)
+    @patch.object(whale_tracker, 'TRADE_PAGE_SIZE', 10)
+    def test_saturated_batch_splits_and_pages_busy_market(self):
+        markets = [{'conditionId': mid} for mid in ('0xbusy', '0xa', '0xb', '0xc')]
+        handler = MagicMock(side_effect=lambda market, cands: [len(cands)])
+
+        results = dict((m['conditionId'], r) for m, r in self._collect(markets, handler, concurrency=1))
+
+        self.assertEqual(results, {'0xbusy': [20], '0xa': [1], '0xb': [1], '0xc': []})
+        self.assertLessEqual(self.tracker.trade_batch_size, 2)
+        self.assertTrue(any('market=0xbusy&' in u for u in self.urls)) # Paged on its own
+
+    def test_sparse_batches_grow(self):
+        self.tracker.trade_batch_size = 2
+        async def run():
+            return await self.tracker.fetch_trade_batch_async(['0xa', '0xb'], since=self.now - 86400)
+        by_market, overflow = asyncio.run(run())
+        self.assertEqual(set(by_market), {'0xa', '0xb'})
+        self.assertEqual(overflow, [])
+        self.assertGreater(self.tracker.trade_batch_size, 2)
+
+class TestScanBudget(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+
+    def test_parse_budget(self):
+        self.assertEqual(whale_tracker.parse_budget('60s'), (60.0, None))
+        self.assertEqual(whale_tracker.parse_budget('2m'), (120.0, None))
+        self.assertEqual(whale_tracker.parse_budget('500req'), (None, 500))
+        with self.assertRaises(ValueError):
+            whale_tracker.parse_budget('soon')
+
+    @patch('database.get_alert_counts', return_value={'0xhot': 12})
+    def test_priority_order(self, _):
+        markets = [
+            {'conditionId': '0xquiet', 'volume24hr': 10, 'liquidityNum': 100},
+            {'conditionId': '0xbig', 'volume24hr': 500000, 'liquidityNum': 200000},
+            {'conditionId': '0xhot', 'volume24hr': 20000, 'liquidityNum': 5000}
+        ]
+        ordered = [m['conditionId'] for m in self.tracker.prioritize_markets(markets)]
+        # Past alerts outweigh a bigger but quiet book
+        self.assertEqual(ordered, ['0xhot', '0xbig', '0xquiet'])
+
+    def test_request_budget_scans_best_first(self):
+        async def fake_pages(market_id, since=None, max_pages=None, min_value=None):
+            self.tracker.api_requests += 1
+            yield []
+        self.tracker.iter_trade_pages_async = fake_pages
+
+        async def run():
+            markets = [{'id': str(i)} for i in range(10)]
+            return [m['id'] async for m, _ in self.tracker.iter_scan_async(
+                markets, MagicMock(), concurrency=1, budget_requests=3)]
+        self.assertEqual(asyncio.run(run()), ['0', '1', '2'])
+
+    def test_coverage_report(self):
+        markets = [{'volume24hr': 900}, {'volume24hr': 100}]
+        cov = self.tracker.scan_coverage(markets, markets[:1])
+        self.assertEqual((cov['scanned'], cov['skipped']), (1, 1))
+        self.assertAlmostEqual(cov['volume_share'], 0.9)
+
+class TestTradePagination(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.now = time.time()
+        self.urls = []
+
+    def _fake_api(self, total, spacing):
+        """Newest-first trades, one every `spacing` seconds."""
+        async def fake_request(url):
+            self.urls.append(url)
+            qs = dict(p.split('=') for p in url.split('?')[1].split('&'))
+            offset, limit = int(qs['offset']), int(qs['limit'])
+            return [{'timestamp': self.now - i * spacing, 'size': 1, 'price': 1}
+                    for i in range(offset, min(offset + limit, total))]
+        return fake_request
+
+    def _pages(self, **kwargs):
+        async def run():
+            return [p async for p in self.tracker.iter_trade_pages_async('0xM', **kwargs)]
+        return asyncio.run(run())
+
+    def test_pages_until_cutoff(self):
+        # 1000 trades, one per minute; a 2.5h window needs 2 pages of 100
+        self.tracker.make_api_request_async = self._fake_api(total=1000, spacing=60)
+        pages = self._pages(since=self.now - 150 * 60, page_size=100, max_pages=10)
+        self.assertEqual(len(pages), 2)
+        self.assertIn('offset=100', self.urls[-1])
+
+    def test_page_budget(self):
+        self.tracker.make_api_request_async = self._fake_api(total=10000, spacing=1)
+        pages = self._pages(since=self.now - 86400, page_size=50, max_pages=3)
+        self.assertEqual(len(pages), 3)
+
+    def test_quiet_market_single_request(self):
+        self.tracker.make_api_request_async = self._fake_api(total=7, spacing=60)
+        pages = self._pages(since=self.now - 86400)
+        self.assertEqual([len(p) for p in pages], [7])
+        self.assertEqual(len(self.urls), 1)
+
+    def test_cash_filter_pushed_down(self):
+        self.tracker.make_api_request_async = self._fake_api(total=7, spacing=60)
+        self._pages(since=self.now - 86400, min_value=6000)
+        self.assertIn('filterType=CASH&filterAmount=6000', self.urls[0])
+
+class TestFilterPushdown(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.tracker.http = MagicMock()
+
+    def test_rejected_filter_falls_back_to_unfiltered(self):
+        def fake_get(url):
+            if 'filterType' in url:
+                return MagicMock(status_code=400)
+            return MagicMock(status_code=200, json=MagicMock(return_value=[{'id': 1}]))
+        self.tracker.http.get.side_effect = fake_get
+
+        self.assertEqual(self.tracker.fetch_recent_trades('0x1', min_value=6000), [{'id': 1}])
+        self.assertFalse(self.tracker.trade_filter_pushdown)
+
+        # Later calls skip the filter entirely
+        self.tracker.fetch_recent_trades('0x2', min_value=6000)
+        self.assertNotIn('filterType', self.tracker.http.get.call_args.args[0])
+
+    def test_bad_request_keeps_pushdown(self):
+        """A 400 that also fails unfiltered is about the request, not the filter."""
+        self.tracker.http.get.return_value = MagicMock(status_code=400)
+
+        self.assertIsNone(self.tracker.make_api_request(
+            "https://x/trades?market=bad" + whale_tracker.trade_filter_query(6000)))
+        self.assertEqual(self.tracker.http.get.call_count, 2) # Filtered, then once unfiltered
+        self.assertTrue(self.tracker.trade_filter_pushdown)
+
+    def test_no_filter_without_threshold(self):
+        self.tracker.http.get.return_value = MagicMock(status_code=200, json=MagicMock(return_value=[]))
+        self.tracker.fetch_recent_trades('0x1')
+        self.assertNotIn('filterType', self.tracker.http.get.call_args.args[0])
+
+if __name__ == '__main__':
+    unittest.main()
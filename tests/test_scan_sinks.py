@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whale_tracker
+import scan_sinks
+
+class RecordingSink(scan_sinks.ScanSink):
+    def __init__(self):
+        self.events = []
+
+    def start(self, total):
+        self.events.append(('start', total))
+
+    def whale(self, item):
+        self.events.append(('whale', item['value']))
+
+    def market_done(self, market, results):
+        self.events.append(('done', market['conditionId']))
+
+    def finish(self, summary):
+        self.events.append(('finish', summary['found'], summary['scanned']))
+
+class TestStreamingScan(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.tracker.get_wallet_profile = MagicMock(return_value={'is_fresh': False, 'win_rate': 0.5, 'total_trades': 3})
+        self.now = time.time()
+        self.trades = [
+            {'conditionId': '0xa', 'size': 20000, 'price': 0.5, 'timestamp': self.now, 'proxyWallet': '0xW1',
+             'asset': '111', 'outcome': 'Yes', 'side': 'BUY'},
+            {'conditionId': '0xa', 'size': 30000, 'price': 0.5, 'timestamp': self.now - 5, 'proxyWallet': '0xW2',
+             'asset': '222', 'outcome': 'No', 'side': 'SELL'}
+        ]
+
+        async def fake_request(url, retries=None):
+            return self.trades if '0xa' in url else []
+        self.tracker.make_api_request_async = fake_request
+        self.markets = [{'conditionId': '0xa', 'question': 'Will it?', 'volume24hr': 100},
+                        {'conditionId': '0xb', 'question': 'Quiet'}]
+
+    def _collect(self, **kwargs):
+        async def run():
+            return [item async for item in self.tracker.iter_whales_async(self.markets, **kwargs)]
+        return asyncio.run(run())
+
+    def test_yields_whales_and_feeds_sinks(self):
+        sink = RecordingSink()
+        items = self._collect(min_value=6000, sinks=[sink])
+
+        self.assertEqual(sorted(i['wallet'] for i in items), ['0xW1', '0xW2'])
+        self.assertEqual(items[0]['asset_id'], '111')
+        self.assertEqual(sink.events[0], ('start', 2))
+        self.assertEqual([e[0] for e in sink.events].count('whale'), 2)
+        self.assertEqual(sink.events[-1], ('finish', 2, 2))
+
+    def test_market_payload_built_once_per_market(self):
+        with patch.object(whale_tracker.PolymarketTracker, 'market_payload',
+                          wraps=whale_tracker.PolymarketTracker.market_payload) as payload:
+            self._collect(min_value=6000)
+        self.assertEqual(payload.call_count, 1) # Only 0xa had candidates
+
+    @patch('database.save_alert')
+    @patch('database.upsert_wallet')
+    @patch('database.upsert_market')
+    def test_persistence_is_a_sink(self, mock_market, mock_wallet, mock_alert):
+        self._collect(min_value=6000)
+        mock_alert.assert_not_called()
+
+        self._collect(min_value=6000, sinks=[scan_sinks.DatabaseSink(self.tracker)])
+        self.assertEqual(mock_alert.call_count, 2)
+        self.assertEqual(mock_market.call_args.args[0]['market_id'], '0xa')
+
+class TestDatabaseSink(unittest.TestCase):
+    def test_writes_off_the_calling_thread_in_batches(self):
+        tracker = MagicMock()
+        threads = []
+        tracker.persist_whale.side_effect = lambda item: threads.append(threading.get_ident())
+        sink = scan_sinks.DatabaseSink(tracker)
+        sink.start(1)
+        for n in range(3):
+            sink.whale({'value': n})
+        self.assertEqual(tracker.persist_whale.call_count, 0) # Buffered until the market is done
+        sink.market_done({}, [])
+        sink.finish({'found': 3})
+
+        self.assertEqual([c.args[0]['value'] for c in tracker.persist_whale.call_args_list], [0, 1, 2])
+        self.assertNotIn(threading.get_ident(), threads)
+
+class TestJsonlSink(unittest.TestCase):
+    def test_writes_one_line_per_whale(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'whales.jsonl')
+            sink = scan_sinks.JsonlSink(path)
+            sink.start(1)
+            sink.whale({'value': 7000.0, 'market': 'M', 'description': 'long text'})
+            sink.whale({'value': 8000.0, 'market': 'N'})
+            sink.finish({'found': 2})
+
+            with open(path) as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual([r['value'] for r in rows], [7000.0, 8000.0])
+        self.assertNotIn('description', rows[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,8 @@ from unittest.mock import MagicMock, patch
 import sys
 import os
 import queue
+import time
+import tempfile
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -50,6 +52,25 @@ class TestTrackerAsync(unittest.TestCase):
         # Verify put called
         self.tracker.event_queue.put.assert_called_with(event)
 
+    @patch('json.loads')
+    def test_on_message_drops_non_trade_frames_undecoded(self, mock_loads):
+        self.tracker.on_message(None, '[{"event_type": "book", "bids": [{"price": "0.5", "size": "900000"}]}]')
+        self.tracker.on_message(None, '{"event_type": "price_change", "price": "0.5", "size": "900000"}')
+        mock_loads.assert_not_called()
+        self.tracker.event_queue.put.assert_not_called()
+        self.assertEqual(self.tracker.live_filter['dropped_type'], 2)
+
+    def test_on_message_enqueues_only_whale_trades(self):
+        small = '{"event_type": "last_trade_price", "price": "0.5", "size": "10", "asset_id": "1"}'
+        big = '{"event_type": "last_trade_price", "price": "0.5", "size": "20000", "asset_id": "2"}'
+        self.tracker.on_message(None, small)
+        self.tracker.on_message(None, big)
+        self.tracker.on_message(None, f'[{small}, {big}]')
+
+        enqueued = [c.args[0]['asset_id'] for c in self.tracker.event_queue.put.call_args_list]
+        self.assertEqual(enqueued, ['2', '2'])
+        self.assertEqual(self.tracker.live_filter['dropped_size'], 2)
+
     @patch('database.save_alert')
     def test_process_whale_saves_to_db(self, mock_save_alert):
         """Verify process_whale calls database.save_alert."""
@@ -63,5 +84,127 @@ class TestTrackerAsync(unittest.TestCase):
         # Verify DB call
         mock_save_alert.assert_called_once()
 
+    @patch('whale_tracker.PolymarketTracker.process_whale')
+    def test_asset_index_resolves_without_lookup(self, mock_process_whale):
+        """Subscribed tokens resolve to market + outcome with no Gamma call."""
+        self.tracker.get_market_info = MagicMock()
+        market = {
+            'id': '55', 'conditionId': '0xCond', 'question': 'Indexed Market', 'slug': 'indexed',
+            'clobTokenIds': '["tokYes", "tokNo"]', 'outcomes': '["Trump", "Harris"]'
+        }
+        with patch('time.sleep'):
+            self.tracker._send_subscriptions([market])
+
+        event = {'event_type': 'last_trade_price', 'price': '0.5', 'size': '20000', 'asset_id': 'tokNo', 'side': 'BUY'}
+        self.tracker._handle_event_worker(event)
+
+        self.tracker.get_market_info.assert_not_called()
+        t_data, m_info = mock_process_whale.call_args.args[:2]
+        self.assertEqual(t_data['outcome'], 'Harris')
+        self.assertEqual(t_data['market_id'], '0xCond')
+        self.assertEqual(m_info['title'], 'Indexed Market')
+
+        # Incremental removal
+        self.tracker._unindex_markets(['0xCond'])
+        self.assertNotIn('tokNo', self.tracker.asset_index)
+
+    @patch('database.save_wallet_profile')
+    @patch('database.load_wallet_profile', return_value=None)
+    def test_wallet_profiled_once_per_wallet(self, mock_load, mock_save):
+        """Repeat whales from one wallet are enriched from the profile cache."""
+        whale_tracker.wallet_cache.clear()
+        profile = {'is_fresh': False, 'win_rate': 0.5, 'total_trades': 10, 'age_hours': 100.0,
+                   'wallet_creation_ts': 1.0, 'total_user_volume': 1000.0, 'profitability_score': 30}
+        self.tracker.analyze_wallet = MagicMock(return_value=profile)
+
+        for _ in range(3):
+            self.assertIs(self.tracker.get_wallet_profile('0xBusy'), profile)
+
+        self.tracker.analyze_wallet.assert_called_once_with('0xBusy')
+        mock_save.assert_called_once_with('0xBusy', profile)
+
+class TestGapBackfill(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker()
+        self.tracker.event_queue = MagicMock()
+        self.now = time.time()
+        self.trades = [
+            {'conditionId': '0xA', 'asset': 'tokA', 'price': 0.5, 'size': 40000, 'side': 'BUY',
+             'proxyWallet': '0xW', 'outcome': 'Yes', 'timestamp': int(self.now - 20)},
+            {'conditionId': '0xA', 'asset': 'tokA', 'price': 0.5, 'size': 30000, 'side': 'SELL',
+             'proxyWallet': '0xV', 'outcome': 'Yes', 'timestamp': int(self.now - 40)},
+            {'conditionId': '0xA', 'asset': 'tokA', 'price': 0.5, 'size': 50000, 'side': 'BUY',
+             'proxyWallet': '0xOld', 'outcome': 'Yes', 'timestamp': int(self.now - 500)} # Before the gap
+        ]
+        self.urls = []
+
+        async def fake_request(url, retries=None):
+            self.urls.append(url)
+            return self.trades
+        self.tracker.make_api_request_async = fake_request
+
+    def test_gap_trades_enter_the_live_queue_oldest_first(self):
+        queued = self.tracker.backfill_gap(['0xA'], self.now - 60)
+
+        self.assertEqual(queued, 2)
+        events = [c.args[0] for c in self.tracker.event_queue.put.call_args_list]
+        self.assertEqual([e['owner'] for e in events], ['0xV', '0xW'])
+        self.assertEqual(events[0]['asset_id'], 'tokA')
+        self.assertIn('filterType=CASH', self.urls[0]) # Only whale-sized trades are fetched
+
+    @patch('whale_tracker.PolymarketTracker.process_whale')
+    def test_trade_seen_live_is_not_alerted_twice(self, mock_process_whale):
+        live = {'event_type': 'last_trade_price', 'asset_id': 'tokA', 'market': '0xA', 'price': '0.5',
+                'size': '40000', 'side': 'BUY', 'timestamp': str(int(self.now - 20) * 1000)}
+        self.tracker.get_market_info = MagicMock(return_value={'market_id': '0xA', 'title': 'A'})
+        self.tracker._handle_event_worker(live)
+        self.tracker._handle_event_worker(self.tracker.backfill_event(self.trades[0]))
+
+        self.assertEqual(mock_process_whale.call_count, 1)
+        self.assertEqual(self.tracker.live_backfill['duplicates'], 1)
+
+    @patch('whale_tracker.PolymarketTracker.process_whale')
+    def test_restart_backfill_skips_trades_alerted_before(self, mock_process_whale):
+        with tempfile.TemporaryDirectory() as tmp:
+            original = database.DB_NAME
+            database.DB_NAME = os.path.join(tmp, 'test.db')
+            try:
+                database.init_db()
+                # The previous run alerted this trade, then crashed
+                database.save_alert({'timestamp': float(self.now - 20), 'market_id': '0xA', 'wallet': '0xW',
+                                     'value': 20000.0, 'outcome': 'Yes', 'side': 'BUY', 'price': 0.5,
+                                     'asset_id': 'tokA'})
+                self.assertEqual(self.tracker.seed_seen_trades(self.now - 60), 1)
+            finally:
+                database.DB_NAME = original
+
+        self.tracker.get_market_info = MagicMock(return_value={'market_id': '0xA', 'title': 'A'})
+        self.tracker._handle_event_worker(self.tracker.backfill_event(self.trades[0]))
+        self.tracker._handle_event_worker(self.tracker.backfill_event(self.trades[1]))
+
+        self.assertEqual(mock_process_whale.call_count, 1) # Only the trade never alerted
+        self.assertEqual(self.tracker.live_backfill['duplicates'], 1)
+
+    def test_reconnect_backfills_only_that_shards_markets(self):
+        self.tracker.asset_index = {'tokA': ({'market_id': '0xA'}, 'Yes'), 'tokB': ({'market_id': '0xB'}, 'Yes')}
+        shard = MagicMock(index=1, assets={'tokA'}, gap_start=self.now - 100)
+        self.tracker.schedule_backfill = MagicMock()
+        self.tracker._on_shard_connect(shard, reconnect=True)
+
+        markets, since = self.tracker.schedule_backfill.call_args.args[:2]
+        self.assertEqual(markets, ['0xA'])
+        self.assertEqual(since, shard.gap_start - whale_tracker.LIVE_BACKFILL_OVERLAP)
+
+    @patch('database.save_scan_watermarks')
+    def test_live_watermark_flushed_in_batches(self, mock_save):
+        self.tracker.last_event_at = self.now
+        self.tracker.flush_live_watermark()
+        self.tracker.last_event_at = self.now + 1
+        self.tracker.flush_live_watermark() # Too soon
+        self.tracker.flush_live_watermark(force=True)
+
+        self.assertEqual(mock_save.call_count, 2)
+        self.assertEqual(mock_save.call_args.args[0], {whale_tracker.LIVE_WATERMARK_KEY: (self.now + 1, None)})
+
 if __name__ == '__main__':
     unittest.main()
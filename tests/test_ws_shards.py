@@ -0,0 +1,187 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import json
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ws_shards
+import whale_tracker
+
+class FakeApp:
+    """Stands in for websocket.WebSocketApp; records sent frames."""
+    def __init__(self, url, on_open=None, on_message=None, on_error=None, on_close=None):
+        self.on_open = on_open
+        self.on_message = on_message
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(json.loads(payload) if payload.startswith('{') else payload)
+
+    def close(self):
+        pass
+
+def connect(shard):
+    """Open a fresh fake connection on a shard (what _run does on each (re)connect)."""
+    shard._ws = FakeApp(shard.url, on_open=shard._on_open)
+    shard._ws.on_open(shard._ws)
+    return shard._ws
+
+@patch('time.sleep')
+class TestWsShard(unittest.TestCase):
+    def test_connect_sends_own_assets_in_large_batches(self, _):
+        shard = ws_shards.WsShard(0, 'wss://x', on_message=lambda s, m: None)
+        shard.subscribe([f"tok{i}" for i in range(1200)]) # Not connected yet: nothing sent
+        app = connect(shard)
+
+        self.assertEqual([len(f['assets_ids']) for f in app.sent], [500, 500, 200])
+        self.assertEqual(app.sent[0]['type'], 'market')
+        self.assertEqual(app.sent[1]['operation'], 'subscribe')
+
+    def test_live_subscribe_and_unsubscribe_send_deltas(self, _):
+        shard = ws_shards.WsShard(0, 'wss://x', on_message=lambda s, m: None)
+        shard.subscribe(['a'])
+        app = connect(shard)
+        shard.subscribe(['a', 'b'])
+        shard.unsubscribe(['a', 'zz'])
+
+        self.assertEqual(app.sent[1:], [{'assets_ids': ['b'], 'operation': 'subscribe'},
+                                        {'assets_ids': ['a'], 'operation': 'unsubscribe'}])
+        self.assertEqual(shard.assets, {'b'})
+
+    def test_reconnect_resubscribes_and_notifies(self, _):
+        seen = []
+        shard = ws_shards.WsShard(0, 'wss://x', on_message=lambda s, m: None,
+                                  on_connect=lambda s, reconnect: seen.append(reconnect))
+        shard.subscribe(['a', 'b'])
+        connect(shard)
+        shard.connected = False # Socket dropped
+        app = connect(shard)
+
+        self.assertEqual(sorted(app.sent[0]['assets_ids']), ['a', 'b'])
+        self.assertEqual(seen, [False, True])
+
+class TestHealth(unittest.TestCase):
+    def test_pong_is_proof_of_life_not_a_message(self):
+        seen = []
+        shard = ws_shards.WsShard(0, 'wss://x', on_message=lambda s, m: seen.append(m))
+        app = connect(shard)
+        shard.heartbeat()
+        shard._on_message(app, 'PONG')
+        shard._on_message(app, '{"event_type": "book"}')
+
+        self.assertEqual(app.sent[-1], 'PING')
+        self.assertEqual(seen, ['{"event_type": "book"}'])
+        self.assertEqual(shard.pongs, 1)
+
+    def test_silent_shard_is_reconnected(self):
+        sub = ws_shards.ShardedSubscriber('wss://x', shards=2)
+        for shard in sub.shards:
+            connect(shard)
+            shard._ws.close = MagicMock()
+        now = time.time()
+        sub.shards[0].last_message_at = now - ws_shards.STALL_TIMEOUT - 1
+        sub.shards[0].connected_at = now - ws_shards.STALL_TIMEOUT - 5
+        sub.shards[1].last_message_at = now
+
+        self.assertEqual(sub.check_health(now=now), [0])
+        sub.shards[0]._ws.close.assert_called_once()
+        sub.shards[1]._ws.close.assert_not_called()
+        self.assertEqual(sub.shards[1]._ws.sent[-1], 'PING')
+
+    def test_feed_latency_recorded_for_every_trade_frame(self):
+        tracker = whale_tracker.PolymarketTracker()
+        tracker.event_queue = MagicMock()
+        sent = (time.time() - 2) * 1000
+        tracker.on_message(None, json.dumps({'event_type': 'last_trade_price', 'price': '0.5', 'size': '10',
+                                             'timestamp': str(int(sent))})) # Small: dropped, still timed
+        snap = tracker.feed_latency.snapshot()
+        self.assertEqual(snap['count'], 1)
+        self.assertGreater(snap['max_ms'], 1500)
+
+@patch('time.sleep')
+class TestShardedSubscriber(unittest.TestCase):
+    def test_assets_spread_evenly_and_only_once(self, _):
+        sub = ws_shards.ShardedSubscriber('wss://x', shards=3)
+        self.assertEqual(sub.subscribe([f"tok{i}" for i in range(10)]), 10)
+        self.assertEqual(sub.subscribe(['tok0', 'tok1']), 0) # Already owned
+
+        self.assertEqual(sorted(len(s.assets) for s in sub.shards), [3, 3, 4])
+        sub.unsubscribe(['tok0'])
+        self.assertNotIn('tok0', sub.assets())
+
+    def test_one_shard_reconnect_leaves_others_alone(self, _):
+        sub = ws_shards.ShardedSubscriber('wss://x', shards=2)
+        sub.subscribe(['a', 'b', 'c', 'd'])
+        apps = [connect(s) for s in sub.shards]
+        sub.shards[0].connected = False
+        fresh = connect(sub.shards[0])
+
+        self.assertEqual(sorted(fresh.sent[0]['assets_ids']), sorted(sub.shards[0].assets))
+        self.assertEqual(len(apps[1].sent), 1)
+
+    def test_failed_send_does_not_strand_other_shards(self, _):
+        class DeadApp(FakeApp):
+            def send(self, payload):
+                raise ConnectionError("socket is already closed")
+            close = MagicMock()
+
+        sub = ws_shards.ShardedSubscriber('wss://x', shards=2, app_factory=DeadApp)
+        for shard in sub.shards:
+            shard._ws = sub.shards[0].app_factory(shard.url)
+            shard.connected = True # Closed underneath, not noticed yet
+
+        self.assertEqual(sub.subscribe(['a', 'b', 'c', 'd']), 4)
+        self.assertEqual([len(s.assets) for s in sub.shards], [2, 2])
+        self.assertEqual(DeadApp.close.call_count, 2) # Each shard reconnects
+
+        apps = [connect(s) for s in sub.shards] # ...and re-sends its whole set
+        self.assertEqual(sorted(a for app in apps for a in app.sent[0]['assets_ids']), ['a', 'b', 'c', 'd'])
+
+    def test_tracker_routes_subscriptions_through_shards(self, _):
+        tracker = whale_tracker.PolymarketTracker(shards=2)
+        market = {'conditionId': '0xC', 'question': 'Q', 'clobTokenIds': '["y", "n"]', 'outcomes': '["Yes", "No"]'}
+        tracker._send_subscriptions([market])
+        self.assertEqual(tracker.subscriber.assets(), {'y', 'n'})
+        self.assertEqual([len(s.assets) for s in tracker.subscriber.shards], [1, 1])
+
+def market(cid, volume):
+    return {'conditionId': cid, 'question': cid, 'volume24hr': volume,
+            'clobTokenIds': json.dumps([f"{cid}-y", f"{cid}-n"]), 'outcomes': '["Yes", "No"]'}
+
+@patch('time.sleep')
+@patch('database.get_alert_counts', return_value={})
+@patch('whale_tracker.MAX_MARKETS', 2)
+class TestRerank(unittest.TestCase):
+    def setUp(self):
+        self.tracker = whale_tracker.PolymarketTracker(shards=1)
+        self.tracker._send_subscriptions([market('0xA', 100), market('0xB', 50)])
+        self.app = connect(self.tracker.subscriber.shards[0])
+
+    def test_diff_sent_on_open_connection(self, *_):
+        diff = self.tracker.rerank_subscriptions([market('0xA', 100), market('0xC', 900), market('0xB', 1)])
+
+        self.assertEqual(diff, {'added': 1, 'removed': 1, 'deferred': 0})
+        self.assertEqual(self.tracker.subscribed_market_ids(), ['0xA', '0xC'])
+        self.assertEqual(self.app.sent[1:], [{'assets_ids': ['0xB-y', '0xB-n'], 'operation': 'unsubscribe'},
+                                             {'assets_ids': ['0xC-y', '0xC-n'], 'operation': 'subscribe'}])
+        self.assertEqual(self.tracker.subscriber.shards[0].connects, 1) # No reconnect
+        self.assertEqual(self.tracker.rerank_stats['last_churn'], 1.0)
+
+    def test_kept_markets_refresh_metadata_only(self, *_):
+        diff = self.tracker.rerank_subscriptions([market('0xA', 5000), market('0xB', 70)])
+        self.assertEqual(diff, {'added': 0, 'removed': 0, 'deferred': 0})
+        self.assertEqual(len(self.app.sent), 1)
+        self.assertEqual(self.tracker.asset_index['0xA-y'][0]['volume24hr'], 5000)
+
+    @patch('whale_tracker.LIVE_RERANK_MAX_CHURN', 1)
+    def test_churn_is_capped_per_run(self, *_):
+        diff = self.tracker.rerank_subscriptions([market('0xC', 900), market('0xD', 800), market('0xA', 100), market('0xB', 1)])
+        self.assertEqual(diff, {'added': 1, 'removed': 1, 'deferred': 2})
+        self.assertEqual(self.tracker.subscribed_market_ids(), ['0xA', '0xC']) # 0xB (lowest) went first
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import json
+import math
+import re
 import time
 import datetime
 import sys
@@ -6,20 +8,27 @@ import os
 import ssl
 import threading
 import argparse
+import asyncio
+import collections
+import functools
 import concurrent.futures
 
-import requests
-import websocket
-import certifi
 from dateutil import parser, tz
 
 # Rich Imports
 from rich.console import Console
 from rich.table import Table
-from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeRemainingColumn
 from rich import print as rprint
 from rich.text import Text
 import database # Local DB for persistence
+import http_client # Pooled keep-alive HTTP session
+import market_catalog # Indexed on-disk market cache
+import cache # Thread-safe TTL/LRU caches
+import scan_sinks # Pluggable outputs for the streaming scan
+import event_pool # Partitioned worker pool for live events
+import ws_shards # Sharded WebSocket subscriptions
+import alert_dispatcher # Background Discord delivery
+import fill_aggregator # Sliding-window totals of sub-threshold fills
 
 from dotenv import load_dotenv
 
@@ -54,6 +63,49 @@ DISCORD_WEBHOOK_URL = get_secret("DISCORD_WEBHOOK_URL", "")
 MIN_TRADE_SIZE_USD = 6000.0
 MARKET_CHECK_INTERVAL = 300 # Cache market category for 5 minutes
 MAX_MARKETS = 10000 # Increased to capture wider net (Polymarket has ~21k mkts)
+SCAN_WORKERS = 25 # Sync worker threads (sizes the keep-alive HTTP pool)
+LIVE_WORKERS = 4 # Threads handling live whale events (per-key ordering is kept)
+LIVE_PARTITION = 'market' # Route live events to workers by 'market' or 'wallet'
+LIVE_QUEUE_SIZE = 5000 # Max live events held in memory (bounded: the Pi must not OOM)
+LIVE_OVERFLOW = 'drop_oldest' # When full: 'drop_oldest', 'drop_below' (LIVE_DROP_BELOW_USD) or 'spill' (to LIVE_SPILL_DIR)
+LIVE_DROP_BELOW_USD = 25000 # drop_below: trades under this are shed first under overload
+LIVE_SPILL_DIR = "live_spill" # spill: overflow events are parked here as JSONL
+LIVE_LAG_WARN = 10 # Warn when a live event waited longer than this (s)
+LIVE_SHARDS = 4 # WebSocket connections the live subscriptions are spread over
+LIVE_BACKFILL = True # Re-fetch trades missed while a shard was disconnected (or the tracker was down)
+LIVE_BACKFILL_OVERLAP = 30 # Re-check this many seconds before the gap (clock skew / in-flight frames)
+LIVE_BACKFILL_MAX_WINDOW = 21600 # Never backfill more than 6h; older gaps are left to --scan
+LIVE_BACKFILL_CONCURRENCY = 8 # In-flight /trades requests per backfill
+LIVE_WATERMARK_KEY = 'live' # scan_watermarks row: last time the live feed was known alive
+LIVE_WATERMARK_FLUSH = 30 # Persist it at most this often (s)
+LIVE_DEDUP_SIZE = 50000 # Recent live trade keys remembered (backfill vs socket de-dup)
+LIVE_DEDUP_TTL = 2 * LIVE_BACKFILL_MAX_WINDOW
+LIVE_RERANK_INTERVAL = 900 # Re-rank the subscribed market set every 15 min (0 = never)
+LIVE_RERANK_MAX_CHURN = 500 # Max markets added / removed per re-rank (the rest waits for the next run)
+LIVE_RERANK_HYSTERESIS = 0.1 # Keep a subscribed market until it falls out of the top MAX_MARKETS * 1.1
+FILL_AGGREGATION = True # Alert on whales split into many sub-threshold fills (live)
+FILL_WINDOW = 600 # Sum a wallet's fills in one market/side over this many seconds
+FILL_MIN_USD = 1000 # Smaller fills are not worth tracking (and are dropped at the socket)
+FILL_MAX_WALLETS = 50000 # (wallet, market, side) windows kept in memory (least recently active evicted)
+FILL_SLOTS = 16 # Fills kept per window (ring buffer; older ones are folded together)
+SCAN_CONCURRENCY = 200 # Max in-flight trade requests in the async scan engine
+API_RETRIES = 5 # Attempts per request (429/5xx backoff comes from the host rate limiter)
+TRADE_PAGE_SIZE = 100 # Trades per /trades page
+TRADE_PAGE_BUDGET = 10 # Max /trades pages per market per scan (deep scans stay bounded)
+FIREHOSE_PAGE_SIZE = 500 # Trades per page of the global /trades feed (firehose mode)
+FIREHOSE_PAGE_BUDGET = 200 # Max global /trades pages per firehose scan
+FIREHOSE_PAGE_WINDOW = 4 # Sockets for the firehose session
+FIREHOSE_WATERMARK_KEY = '*' # scan_watermarks row for the global feed
+TRADE_BATCH_SIZE = 50 # Markets per batched /trades request (adapts between 1 and TRADE_BATCH_MAX)
+TRADE_BATCH_MAX = 100 # conditionIds are 66 chars: keeps batched URLs well under 8KB
+TRADE_BATCH_STEP = 10 # Batch size growth after a sparse response
+TRADE_BATCH_LIMIT = 500 # Trades per batched request
+SCAN_ALERT_DAYS = 30 # Alert history used to rank markets for a scan
+ALERT_DENSITY_WEIGHT = 3.0 # A past alert counts like ~20x more 24h volume
+TRADE_FILTER_PUSHDOWN = True # Ask the data API for trades >= threshold only (local filter still applies)
+WATERMARK_FLUSH_EVERY = 200 # Persist incremental-scan watermarks in batches of this many markets
+MARKET_PAGE_SIZE = 100 # Gamma markets per page
+MARKET_PAGE_WINDOW = 8 # Gamma pages fetched in parallel during discovery
 
 # API ENDPOINTS
 CLOB_WS_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
@@ -61,137 +113,520 @@ GAMMA_API_URL = "https://gamma-api.polymarket.com/markets"
 DATA_API_ACTIVITY_URL = "https://data-api.polymarket.com/activity"
 DATA_API_TRADES_URL = "https://data-api.polymarket.com/trades"
 
+class TradeFetchError(Exception):
+    """A /trades page could not be fetched (retries exhausted)."""
+
+def normalize_ts(raw):
+    """Trade timestamp (seconds or ms, str or number) -> float seconds."""
+    ts = float(raw)
+    if ts > 10000000000:
+        ts = ts / 1000
+    return ts
+
+def parse_budget(value):
+    """
+    Scan budget -> (seconds, requests); either may be None.
+    '60s', '5m', '1h' or a bare number are time budgets, '500req' a request budget.
+    """
+    text = str(value).strip().lower()
+    try:
+        if text.endswith('req'):
+            return None, int(text[:-3])
+        units = {'s': 1, 'm': 60, 'h': 3600}
+        if text and text[-1] in units:
+            return float(text[:-1]) * units[text[-1]], None
+        return float(text), None
+    except ValueError:
+        raise ValueError(f"Invalid scan budget: {value!r} (use e.g. 60s, 5m or 500req)")
+
+def _as_float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def market_priority(market, alert_count=0):
+    """Expected whale yield of a market: 24h volume, liquidity and past alert density."""
+    volume = _as_float(market.get('volume24hr'))
+    liquidity = _as_float(market.get('liquidityNum') or market.get('liquidity'))
+    return math.log1p(volume) + 0.5 * math.log1p(liquidity) + ALERT_DENSITY_WEIGHT * math.log1p(alert_count)
+
+# Live pre-filter: read event_type / price / size straight from the raw frame
+TRADE_EVENT_TYPES = ('last_trade_price', 'trade')
+_EVENT_TYPE_RE = re.compile(r'"(?:event_type|type)"\s*:\s*"([a-z_]+)"')
+_PRICE_RE = re.compile(r'"price"\s*:\s*"?([0-9.eE+-]+)')
+_SIZE_RE = re.compile(r'"size"\s*:\s*"?([0-9.eE+-]+)')
+_TIMESTAMP_RE = re.compile(r'"timestamp"\s*:\s*"?([0-9.]+)')
+
+def quick_classify(raw):
+    """
+    Single-event WS frame -> (event_type, value_usd) without a full JSON decode.
+    value_usd is None when price/size could not be read.
+    """
+    m = _EVENT_TYPE_RE.search(raw)
+    event_type = m.group(1) if m else None
+    if event_type not in TRADE_EVENT_TYPES:
+        return event_type, None
+    price, size = _PRICE_RE.search(raw), _SIZE_RE.search(raw)
+    try:
+        return event_type, float(price.group(1)) * float(size.group(1))
+    except (AttributeError, ValueError):
+        return event_type, None
+
+def event_value(event):
+    """USD value of a live trade event."""
+    return float(event.get('price', 0)) * float(event.get('size', 0))
+
+def is_whale_candidate(event, min_value=None):
+    """Decoded live event -> True if it is a trade worth at least min_value."""
+    if event.get('event_type') not in TRADE_EVENT_TYPES and event.get('type') != 'trade':
+        return False
+    try:
+        value = event_value(event)
+    except (TypeError, ValueError):
+        return False
+    return value >= (MIN_TRADE_SIZE_USD if min_value is None else min_value)
+
+def usable_watermark(mark, min_value, cutoff):
+    """
+    Stored scan watermark -> (last_ts, last_trade_id) if it can stand in for the
+    trades before it: it was checked at a threshold <= min_value and covers the
+    window back to at least `cutoff`. Otherwise (0, None): scan the full window.
+    """
+    if not mark:
+        return 0, None
+    last_ts, last_id, mark_min, covered_from = (tuple(mark) + (None, None))[:4]
+    if mark_min is None or covered_from is None or min_value < mark_min or cutoff < covered_from:
+        return 0, None
+    return last_ts or 0, last_id
+
+def next_watermark(mark, newest, min_value, cutoff):
+    """Watermark to store after a complete scan up to `newest` (ts, trade id)."""
+    last_ts, _ = usable_watermark(mark, min_value, cutoff)
+    # Continuing a usable watermark keeps its coverage; a full-window scan covers from the cutoff
+    covered_from = (tuple(mark) + (None, None))[3] if last_ts else cutoff
+    return (newest[0], newest[1], min_value, covered_from)
+
+def trade_key(event):
+    """
+    Identity of a trade across the WebSocket feed and the data API (backfill).
+    Neither source shares a trade id, so use asset/side/price/size/second.
+    """
+    asset = event.get('asset_id') or event.get('asset')
+    ts = int(normalize_ts(event.get('timestamp') or 0))
+    return (str(asset), str(event.get('side') or '').upper(),
+            round(float(event.get('price', 0)), 4), round(float(event.get('size', 0)), 2), ts)
+
+def trade_filter_query(min_value):
+    """Data API cash filter for /trades ('' when there is nothing to push down)."""
+    if not min_value or min_value <= 0:
+        return ""
+    return f"&filterType=CASH&filterAmount={min_value:g}"
+
+def without_trade_filter(url):
+    """Same /trades URL with the cash filter stripped (local filtering takes over)."""
+    return url.split("&filterType=")[0]
+
 # CACHE
-# CACHE
-# CACHE
-market_cache = {} # Map market_id -> {is_sports: bool, timestamp: float, title: str, slug: str}
-MARKET_MAP_FILE = "market_map.json"
-CACHE_EXPIRY = 3600 # 1 Hour
-MARKET_MAP_FILE = "market_map.json"
+MARKET_CACHE_SIZE = 5000 # Max market infos kept in memory (LRU)
+MARKET_NEGATIVE_TTL = 60 # Remember unknown markets (404) for 1 minute
+market_cache = cache.TTLCache(maxsize=MARKET_CACHE_SIZE, ttl=MARKET_CHECK_INTERVAL, negative_ttl=MARKET_NEGATIVE_TTL) # market_id -> market info
+
+WALLET_CACHE_SIZE = 20000 # Wallet profiles kept in memory (LRU)
+WALLET_PROFILE_TTL = 3600 # Re-profile established wallets at most hourly
+WALLET_FRESH_TTL = 600 # Fresh (<24h) wallets change fast: re-profile every 10 min
+WALLET_ERROR_TTL = 30 # Failed lookups are retried soon (and never persisted)
+
+def _wallet_profile_ttl(profile):
+    if 'age_hours' not in profile and not profile.get('is_fresh'):
+        return WALLET_ERROR_TTL
+    return WALLET_FRESH_TTL if profile.get('is_fresh') else WALLET_PROFILE_TTL
+
+wallet_cache = cache.TTLCache(maxsize=WALLET_CACHE_SIZE, ttl=WALLET_PROFILE_TTL, ttl_func=_wallet_profile_ttl) # address -> profile
+MARKET_MAP_FILE = "market_map.json" # Legacy JSON cache (imported into the catalog once)
+MARKET_CATALOG_FILE = "market_catalog.db" # Indexed SQLite market catalog
 CACHE_EXPIRY = 3600 # 1 Hour
+FULL_REFRESH_INTERVAL = 86400 # Full market re-download at most once a day; incremental sync otherwise
+MARKET_SYNC_OVERLAP = 300 # Re-check 5 min before the last sync to cover clock skew
+MARKET_SYNC_MAX_PAGES = 20 # More changed pages than this -> full rebuild instead
 
-import queue
 
 # ... imports ...
 
 class PolymarketTracker:
-    def __init__(self):
-        self.ws = None
-        # Async Processing Queue
-        self.event_queue = queue.Queue()
+    def __init__(self, live_workers=None, overflow=None, shards=None):
+        # Live feed: asset subscriptions sharded over several WebSocket connections
+        self.subscriber = ws_shards.ShardedSubscriber(
+            CLOB_WS_URL,
+            shards=shards or LIVE_SHARDS,
+            on_message=self.on_message,
+            on_connect=self._on_shard_connect
+        )
+        # Async Processing Queue: bounded worker pool partitioned by market (or wallet)
+        self.event_queue = event_pool.EventWorkerPool(
+            lambda event: self._handle_event_worker(event),
+            workers=live_workers or LIVE_WORKERS,
+            key_func=self._event_partition_key,
+            name="live",
+            maxsize=LIVE_QUEUE_SIZE,
+            policy=overflow or LIVE_OVERFLOW,
+            value_func=event_value,
+            drop_below=LIVE_DROP_BELOW_USD,
+            spill_dir=LIVE_SPILL_DIR,
+            lag_warn=LIVE_LAG_WARN
+        )
         self.is_running = False
+        # Receive-side pre-filter counters (WS thread only)
+        self.live_filter = {'frames': 0, 'dropped_type': 0, 'dropped_size': 0, 'enqueued': 0}
+        # Exchange timestamp -> local receive time, for every trade frame (is the feed real-time?)
+        self.feed_latency = event_pool.LatencyStats()
+
+        # Gap backfill: one backfill at a time, de-duplicated against the socket feed
+        self.last_event_at = 0.0 # Local time of the last frame from any shard
+        self._live_watermark_saved = 0.0
+        self.backfill_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="backfill")
+        self.seen_trades = cache.TTLCache(maxsize=LIVE_DEDUP_SIZE, ttl=LIVE_DEDUP_TTL)
+        self.live_backfill = {'runs': 0, 'trades': 0, 'queued': 0, 'duplicates': 0}
+
+        # Background re-ranking of the subscribed market set (churn metrics)
+        self.rerank_stats = {'runs': 0, 'added': 0, 'removed': 0, 'deferred': 0, 'last_churn': 0.0, 'last_run': 0.0}
+        self._stopping = threading.Event()
         
-        # Keep track of recent trades for potential LP detection (simple heuristic)
-        # Map wallet -> list of (timestamp, side, amount, market_id)
-        self.wallet_activity_cache = {} 
+        # Recent sub-threshold fills per (wallet, market, side): one alert once they add up to a whale
+        self.wallet_activity_cache = fill_aggregator.FillAggregator(
+            window=FILL_WINDOW, threshold=MIN_TRADE_SIZE_USD, max_keys=FILL_MAX_WALLETS, slots=FILL_SLOTS
+        )
+
+        # On-disk market catalog (indexed by id / conditionId / slug / token id)
+        self.catalog = market_catalog.MarketCatalog(MARKET_CATALOG_FILE)
+
+        # Live asset index: CLOB token id -> (market info, outcome label)
+        self.asset_index = {}
+
+        # Shared HTTP client (keep-alive pools sized to scan concurrency)
+        self.http = http_client.HttpClient(pool_size=SCAN_WORKERS)
+        self.trade_filter_pushdown = TRADE_FILTER_PUSHDOWN # Flipped off if the API rejects the filter
+        self.trade_batch_size = TRADE_BATCH_SIZE # Adapted by fetch_trade_batch_async
+        self.api_requests = 0 # Attempts made by make_api_request(_async) (request budgets)
+        # Discord alerts go out from their own thread (batched, rate-limit aware, persisted)
+        self.alerts = alert_dispatcher.DiscordDispatcher(self.http, lambda: DISCORD_WEBHOOK_URL)
 
     def start(self, use_cache=True):
         print(f"[*] Starting Polymarket Whale Tracker...")
         print(f"[*] Threshold: ${MIN_TRADE_SIZE_USD}")
-        print(f"[*] Connecting to {CLOB_WS_URL}...")
+        print(f"[*] Connecting to {CLOB_WS_URL} ({len(self.subscriber.shards)} shards)...")
         
-        # Start Async Worker
+        # Start Async Workers
         self.is_running = True
-        worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-        worker_thread.start()
+        self.event_queue.start()
+        self.alerts.start() # Also re-sends alerts a previous run could not deliver
+        print(f"[*] {self.event_queue.workers} live workers started (partitioned by {LIVE_PARTITION}).")
         
         # Enable trace for debugging if needed
         # websocket.enableTrace(True)
         
-        self.ws = websocket.WebSocketApp(
-            CLOB_WS_URL,
-            # Pass use_cache via functools or just store in self? 
-            # or simplify: subscribe_to_markets is called in on_open.
-            # We can store a flag in self.
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-            on_open=lambda ws: self.on_open(ws, use_cache)
-        )
-        
-        # Run in a loop to auto-reconnect
-        while True:
-            try:
-                self.ws.run_forever(sslopt={"ca_certs": certifi.where()})
-                print("[*] WebSocket connection closed. Reconnecting in 5 seconds...")
-                time.sleep(5)
-            except KeyboardInterrupt:
-                print("\n[!] Stopping tracker...")
-                self.is_running = False
-                break
-            except Exception as e:
-                print(f"[!] Critical error: {e}")
-                time.sleep(5)
+        # Each shard connects / reconnects on its own thread and re-sends its own assets
+        self.subscriber.start()
+        self.subscribe_to_markets(use_cache=use_cache)
 
-    def _worker_loop(self):
-        """Background thread to process events from Queue."""
-        print("[*] Async Worker Started. Ready to process whales.")
-        while self.is_running:
-            try:
-                event = self.event_queue.get(timeout=1.0)
-                self._handle_event_worker(event)
-                self.event_queue.task_done()
-            except queue.Empty:
+        # Trades made while the tracker was down (since the live watermark of the last run)
+        last_alive = database.get_scan_watermarks().get(LIVE_WATERMARK_KEY, (0, None))[0]
+        if last_alive:
+            since = last_alive - LIVE_BACKFILL_OVERLAP
+            self.seed_seen_trades(since) # Don't re-alert what the last run already sent
+            self.schedule_backfill(self.subscribed_market_ids(), since, reason="restart")
+
+        # New hot markets in, dead ones out, without reconnecting
+        self._stopping.clear()
+        if LIVE_RERANK_INTERVAL:
+            threading.Thread(target=self._rerank_loop, name="rerank", daemon=True).start()
+
+        try:
+            while self.is_running:
+                time.sleep(1)
+                self.flush_live_watermark()
+        except KeyboardInterrupt:
+            print("\n[!] Stopping tracker...")
+        self.is_running = False
+        self._stopping.set()
+        self.subscriber.stop()
+        self.flush_live_watermark(force=True)
+        self.backfill_pool.shutdown(wait=False, cancel_futures=True)
+        self.event_queue.stop()
+        self.alerts.stop()
+        self.print_live_stats()
+        self.print_http_stats()
+
+    def _event_partition_key(self, event):
+        """Live event -> worker key. Both tokens of a market share a key via the asset index."""
+        if LIVE_PARTITION == 'wallet':
+            wallet = event.get('owner') or event.get('taker')
+            if wallet:
+                return wallet
+        indexed = self.asset_index.get(str(event.get('asset_id')))
+        if indexed:
+            return indexed[0]['market_id']
+        return event.get('market') or event.get('asset_id')
+
+    def _on_shard_connect(self, shard, reconnect):
+        if reconnect:
+            print(f"[*] Shard {shard.index} resubscribed {len(shard.assets)} assets after reconnect.")
+            if shard.gap_start:
+                markets = self.subscribed_market_ids(shard.assets)
+                self.schedule_backfill(markets, shard.gap_start - LIVE_BACKFILL_OVERLAP, reason=f"shard {shard.index}")
+
+    def subscribed_market_ids(self, asset_ids=None):
+        """conditionIds behind subscribed assets (all of them, or the given ones) via the asset index."""
+        if asset_ids is None:
+            asset_ids = list(self.asset_index)
+        markets = set()
+        for asset in asset_ids:
+            indexed = self.asset_index.get(str(asset))
+            if indexed:
+                markets.add(indexed[0]['market_id'])
+        return sorted(markets)
+
+    def flush_live_watermark(self, force=False):
+        """Persist when the live feed was last alive, so a restart knows which window to backfill."""
+        if not self.last_event_at or self.last_event_at <= self._live_watermark_saved:
+            return
+        if not force and time.time() - self._live_watermark_saved < LIVE_WATERMARK_FLUSH:
+            return
+        database.save_scan_watermarks({LIVE_WATERMARK_KEY: (self.last_event_at, None)})
+        self._live_watermark_saved = self.last_event_at
+
+    def schedule_backfill(self, market_ids, since, reason="reconnect"):
+        """Queue backfill_gap() on the (single) backfill thread. Returns the future, or None."""
+        if not LIVE_BACKFILL or not market_ids:
+            return None
+        try:
+            return self.backfill_pool.submit(self.backfill_gap, list(market_ids), since, reason)
+        except RuntimeError:
+            return None # Shutting down
+
+    def seed_seen_trades(self, since):
+        """Mark trades alerted since `since` (by any earlier run) as seen. Returns how many."""
+        since = max(since, time.time() - LIVE_BACKFILL_MAX_WINDOW)
+        seeded = 0
+        try:
+            rows = database.get_alerted_trades(since)
+        except Exception as e:
+            print(f"[!] Could not load recent alerts: {e}")
+            return 0
+        for asset_id, side, price, value, ts_ms in rows:
+            if not price:
                 continue
-            except Exception as e:
-                print(f"[!] Worker Error: {e}")
+            self.seen_trades.add(trade_key({'asset_id': asset_id, 'side': side, 'price': price,
+                                            'size': value / price, 'timestamp': ts_ms / 1000}))
+            seeded += 1
+        return seeded
 
-    def on_open(self, ws, use_cache=True):
-        print("[*] Connected to Polymarket CLOB!")
-        self.subscribe_to_markets(use_cache=use_cache)
+    def backfill_gap(self, market_ids, since, reason="reconnect"):
+        """
+        Fetch whale-sized trades since `since` for the given markets from the data API
+        and feed them into the live pipeline (oldest first). The worker drops any trade
+        the socket already delivered (seen_trades). Returns the number queued.
+        """
+        since = max(since, time.time() - LIVE_BACKFILL_MAX_WINDOW)
+        started = time.time()
+        try:
+            trades = asyncio.run(self._fetch_gap_trades(market_ids, since))
+        except Exception as e:
+            print(f"[!] Backfill ({reason}) failed: {e}")
+            return 0
+
+        trades.sort(key=lambda t: normalize_ts(t.get('timestamp') or 0))
+        queued = 0
+        for trade in trades:
+            event = self.backfill_event(trade)
+            if is_whale_candidate(event):
+                self.process_trade_event(event)
+                queued += 1
+        self.live_backfill['runs'] += 1
+        self.live_backfill['trades'] += len(trades)
+        self.live_backfill['queued'] += queued
+        print(f"[*] Backfilled {started - since:.0f}s gap ({reason}): {len(trades)} trades "
+              f"in {len(market_ids)} markets, {queued} queued.")
+        return queued
+
+    async def _fetch_gap_trades(self, market_ids, since):
+        """Whale-sized trades newer than `since` for the markets (batched, overflow paged per market)."""
+        trades = []
+        sem = asyncio.Semaphore(LIVE_BACKFILL_CONCURRENCY)
+
+        async def batch(chunk):
+            async with sem:
+                return await self.fetch_trade_batch_async(chunk, since=since, min_value=MIN_TRADE_SIZE_USD)
+
+        async def pages(market_id):
+            async with sem:
+                async for page in self.iter_trade_pages_async(market_id, since=since, min_value=MIN_TRADE_SIZE_USD):
+                    trades.extend(page)
+
+        async with self.http.async_session(limit=LIVE_BACKFILL_CONCURRENCY):
+            size = self.trade_batch_size
+            results = await asyncio.gather(*(batch(market_ids[i:i + size]) for i in range(0, len(market_ids), size)))
+            overflow = []
+            for by_market, over in results:
+                for market_trades in by_market.values():
+                    trades.extend(market_trades)
+                overflow.extend(over)
+            await asyncio.gather(*(pages(m) for m in overflow))
+        return [t for t in trades if normalize_ts(t.get('timestamp') or 0) >= since]
+
+    @staticmethod
+    def backfill_event(trade):
+        """Data API trade -> the live event shape _handle_event_worker expects."""
+        return {
+            'event_type': 'trade',
+            'asset_id': str(trade.get('asset')),
+            'market': trade.get('conditionId'),
+            'price': trade.get('price', 0),
+            'size': trade.get('size', 0),
+            'side': trade.get('side'),
+            'owner': trade.get('proxyWallet'),
+            'outcome': trade.get('outcome'),
+            'timestamp': trade.get('timestamp'),
+            'source': 'backfill'
+        }
 
     def subscribe_to_markets(self, use_cache=True):
         # Fetch top markets to subscribe to
-        # Since we can't easily subscribe to ALL, we'll get the top 50 active markets
+        # Pages are subscribed as they arrive so coverage starts before discovery finishes
         print("[*] Fetching active markets to subscribe...")
-        markets = self.fetch_active_markets(use_cache=use_cache)
+        streamed = []
+        def on_page(page):
+            streamed.append(len(page))
+            self._send_subscriptions(page)
+
+        markets = self.fetch_active_markets(use_cache=use_cache, on_page=on_page)
         if not markets:
             print("[!] No markets found to subscribe.")
             return
 
-        print(f"[*] Subscribing to {len(markets)} markets...")
-        # Subscription payload format: {"assets_ids": ["..."], "type": "market"} usually for trade updates
-        # Check standard CLOB docs: usually {"type": "subscribe", "channels": [{"name": "level1", "token_ids": [...]}]}
-        # But for 'trades', let's guess the channel name 'trades' or 'market_trades'.
-        # Using a common pattern for now. If this fails in testing, I'll need to research exact subscribe msg.
-        
-        # NOTE: Polymarket CLOB often uses asset_id (token_id) for subscriptions.
-        asset_ids = []
-        for m in markets:
-            # Each market has 2 tokens (Yes/No usually). We need their asset_ids.
-            # Gamma structure usually has 'clobTokenIds' or 'tokens'.
-            if 'clobTokenIds' in m:
-                asset_ids.extend(json.loads(m['clobTokenIds'])) 
-            elif 'tokens' in m:
-                 # tokens might be list of dicts
-                 pass
-        
-        # Simplified: Try subscribing by market_id/condition_id if supported, else asset_ids
-        # Let's try sending asset_ids which is safer for CLOB.
+        if not streamed:
+            # Served from cache - nothing was streamed yet
+            self._send_subscriptions(markets)
+        print(f"[*] Subscribed to {len(markets)} markets.")
+
+    def _send_subscriptions(self, markets):
+        # Polymarket CLOB subscribes by asset_id (token id); each market has 2 tokens (Yes/No usually).
+        # The index maps them back to market + outcome.
+        asset_ids = self._index_markets(markets)
         if not asset_ids:
             print("[!] Could not extract asset IDs.")
             return
 
-        chunk_size = 20 # Subscribe in chunks
-        for i in range(0, len(asset_ids), chunk_size):
-            chunk = asset_ids[i:i+chunk_size]
-            msg = {
-                "type": "subscribe",
-                "channels": [
-                    {
-                        "name": "trades",
-                        "token_ids": chunk
-                    }
-                ]
-            }
-            self.ws.send(json.dumps(msg))
-            time.sleep(0.1) # Rate limit protection
+        # Spread over the shard connections; each sends large batched frames (ws_shards.SUBSCRIBE_BATCH)
+        self.subscriber.subscribe(asset_ids)
+
+    def _rerank_loop(self):
+        while not self._stopping.wait(LIVE_RERANK_INTERVAL):
+            try:
+                self.rerank_subscriptions()
+            except Exception as e:
+                print(f"[!] Re-rank failed: {e}")
+
+    def _fetch_rerank_markets(self):
+        """Fresh active-market list: incremental catalog sync, full fetch if that is not possible."""
+        meta = self.catalog.meta()
+        if meta and time.time() - meta['full_sync'] < FULL_REFRESH_INTERVAL:
+            markets = self.refresh_market_map(meta)
+            if markets is not None:
+                return markets
+        return self.fetch_active_markets(use_cache=False)
+
+    def rerank_subscriptions(self, markets=None):
+        """
+        Re-rank the live market set (prioritize_markets) and apply the diff on the open
+        connections: new top markets are subscribed, markets that fell out of the top
+        MAX_MARKETS * (1 + LIVE_RERANK_HYSTERESIS) (or closed) are unsubscribed.
+        At most LIVE_RERANK_MAX_CHURN adds and removes per run.
+        Returns {'added', 'removed', 'deferred'} or None if no market list was available.
+        """
+        if markets is None:
+            markets = self._fetch_rerank_markets()
+        if not markets:
+            return None
 
-    def process_whale(self, trade_data, market_data, historical=False, timestamp_override=None):
+        ranked = self.prioritize_markets(markets)
+        ids = [m.get('conditionId') or m.get('id') for m in ranked]
+        rank = {mid: i for i, mid in enumerate(ids)}
+        current = set(self.subscribed_market_ids())
+        keep_limit = int(MAX_MARKETS * (1 + LIVE_RERANK_HYSTERESIS))
+
+        to_add = [m for m, mid in zip(ranked[:MAX_MARKETS], ids) if mid not in current]
+        # Worst first: closed / unlisted markets, then the lowest ranked
+        to_remove = sorted((mid for mid in current if rank.get(mid, keep_limit) >= keep_limit),
+                           key=lambda mid: rank.get(mid, len(ids)), reverse=True)
+        deferred = max(0, len(to_add) - LIVE_RERANK_MAX_CHURN) + max(0, len(to_remove) - LIVE_RERANK_MAX_CHURN)
+        to_add, to_remove = to_add[:LIVE_RERANK_MAX_CHURN], set(to_remove[:LIVE_RERANK_MAX_CHURN])
+
+        # Unsubscribe first so the connections never hold more than the target set
+        if to_remove:
+            tokens = [token for token, (info, _) in list(self.asset_index.items()) if info['market_id'] in to_remove]
+            self.subscriber.unsubscribe(tokens)
+            self._unindex_markets(to_remove)
+        # Kept markets get fresh metadata (volume, prices); only new ones are subscribed
+        self._index_markets([m for m, mid in zip(ranked[:keep_limit], ids) if mid in current and mid not in to_remove])
+        if to_add:
+            self._send_subscriptions(to_add)
+
+        stats = self.rerank_stats
+        stats['runs'] += 1
+        stats['added'] += len(to_add)
+        stats['removed'] += len(to_remove)
+        stats['deferred'] = deferred
+        stats['last_churn'] = (len(to_add) + len(to_remove)) / max(1, len(current))
+        stats['last_run'] = time.time()
+        print(f"[*] Re-ranked live markets: +{len(to_add)} / -{len(to_remove)} "
+              f"({stats['last_churn']:.1%} churn{f', {deferred} deferred' if deferred else ''}).")
+        return {'added': len(to_add), 'removed': len(to_remove), 'deferred': deferred}
+
+    def _index_markets(self, markets):
+        """
+        Add markets to the live asset index: token id -> (market info, outcome label).
+        Parses clobTokenIds/outcomes once here so live events need no JSON or API work.
+        Returns the token ids that were indexed.
+        """
+        now = time.time()
+        asset_ids = []
+        for m in markets:
+            # Gamma structure usually has 'clobTokenIds' or 'tokens'.
+            if 'clobTokenIds' not in m:
+                continue
+            try:
+                tokens = m['clobTokenIds']
+                if isinstance(tokens, str): tokens = json.loads(tokens)
+                outcomes = m.get('outcomes')
+                if isinstance(outcomes, str): outcomes = json.loads(outcomes)
+            except ValueError:
+                continue
+            info = self._build_market_info(m, now)
+            for idx, token in enumerate(tokens):
+                if outcomes and len(outcomes) > idx:
+                    outcome = outcomes[idx]
+                elif len(tokens) == 2:
+                    outcome = "Yes" if idx == 0 else "No"
+                else:
+                    outcome = "Unknown"
+                self.asset_index[str(token)] = (info, outcome)
+                asset_ids.append(str(token))
+        return asset_ids
+
+    def _unindex_markets(self, market_ids):
+        """Drop markets (by conditionId / id) from the live asset index."""
+        market_ids = set(market_ids)
+        for token, (info, _) in list(self.asset_index.items()):
+            if info['market_id'] in market_ids or info.get('gamma_id') in market_ids:
+                self.asset_index.pop(token, None)
+
+    def process_whale(self, trade_data, market_data, historical=False, timestamp_override=None, persist=True, min_value=None):
         """
         Unified logic to process a detected whale trade.
         trade_data: {price, size, side, asset_id, outcome?, wallet}
         market_data: {title, slug, volume24hr, liquidity, clobTokenIds, outcomes, end_date, description}
+        persist: write market/wallet/alert rows (scans leave this to a DatabaseSink)
         """
         try:
             # 1. Calculate Value
@@ -199,7 +634,7 @@ class PolymarketTracker:
             size = float(trade_data.get('size', 0))
             value_usd = price * size
             
-            if value_usd < MIN_TRADE_SIZE_USD:
+            if value_usd < (MIN_TRADE_SIZE_USD if min_value is None else min_value):
                 return None
 
             # 2. Resolve Outcome
@@ -233,7 +668,7 @@ class PolymarketTracker:
             
             # 3. Analyze Wallet
             wallet = trade_data.get('wallet')
-            profile = self.analyze_wallet(wallet) if wallet else {'is_fresh': False, 'win_rate': 'N/A', 'total_trades': 0}
+            profile = self.get_wallet_profile(wallet) if wallet else {'is_fresh': False, 'win_rate': 'N/A', 'total_trades': 0}
             
             # 4. Timestamps
             # If historical, use provided timestamp. If live, use NOW.
@@ -244,38 +679,8 @@ class PolymarketTracker:
             dt_ts = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc).astimezone(pst)
             time_str = dt_ts.strftime('%m-%d %I:%M %p')
 
-            # 5. Persistence (DB)
-            # Upsert Market
-            database.upsert_market({
-                'market_id': trade_data.get('market_id'),
-                'question': market_data['title'],
-                'slug': market_data['slug'],
-                'volume': market_data['volume24hr'],
-                'liquidity': market_data['liquidity'],
-                'end_date': market_data.get('end_date'),
-                'description': market_data.get('description')
-            })
-            
-            # Upsert Wallet
-            database.upsert_wallet({
-                'address': wallet,
-                'win_rate': profile.get('win_rate'),
-                'total_trades': profile.get('total_trades'),
-                'is_fresh': profile.get('is_fresh'),
-                'profitability_score': profile.get('profitability_score', 0)
-            })
-            
-            # Save Alert
-            database.save_alert({
-                'timestamp': ts,
-                'market_id': trade_data.get('market_id'),
-                'wallet': wallet,
-                'value': value_usd,
-                'outcome': outcome,
-                'side': trade_data.get('side'),
-                'price': price,
-                'asset_id': trade_data.get('asset_id')
-            })
+            # Long description is kept out of the compact catalog records; read it lazily
+            description = market_data.get('description') or self.catalog.description(trade_data.get('market_id'))
 
             # 6. Console & Alert
             # For Scan Mode, we might want to defer printing to avoid garbling progress bar?
@@ -333,10 +738,15 @@ class PolymarketTracker:
                 
                 '_ts': ts,
                 'end_date': market_data.get('end_date'),
-                'description': market_data.get('description'),
-                'raw_timestamp': ts 
+                'description': description,
+                'raw_timestamp': ts,
+                'fills': trade_data.get('fills', 1) # >1: aggregated from sub-threshold fills
             }
             
+            # 5. Persistence (DB)
+            if persist:
+                self.persist_whale(result_item)
+
             # Live Mode Check: If not historical, print and alert immediately
             if not historical:
                 val_str = f"${value_usd:,.0f}"
@@ -345,12 +755,14 @@ class PolymarketTracker:
                 o_text = Text(str(outcome), style="yellow")
                 
                 # We need to access console global or pass it
-                console.print(f"[{time_str}] 🚨 [bold red]LIVE WHALE[/]: {v_text} on {o_text} in {m_text}")
+                fills = result_item['fills']
+                fills_str = f" ({fills} fills)" if fills > 1 else ""
+                console.print(f"[{time_str}] 🚨 [bold red]LIVE WHALE[/]: {v_text}{fills_str} on {o_text} in {m_text}")
                 
                 # Discord
                 t_event = {
                     'value': value_usd, 'side': trade_data.get('side'), 'outcome': outcome,
-                    'price': price, 'market_id': trade_data.get('market_id')
+                    'price': price, 'market_id': trade_data.get('market_id'), 'fills': fills
                 }
                 m_info = {
                     'title': market_data['title'], 
@@ -367,6 +779,36 @@ class PolymarketTracker:
             print(f"Error processing whale: {e}")
             return None
 
+    def persist_whale(self, item):
+        """Upsert the market and wallet behind a process_whale item and save the alert."""
+        profile = item['profile']
+        database.upsert_market({
+            'market_id': item['market_id'],
+            'question': item['market'],
+            'slug': item['slug'],
+            'volume': item['vol_24h'],
+            'liquidity': item['liquidity'],
+            'end_date': item.get('end_date'),
+            'description': item.get('description')
+        })
+        database.upsert_wallet({
+            'address': item['wallet'],
+            'win_rate': profile.get('win_rate'),
+            'total_trades': profile.get('total_trades'),
+            'is_fresh': profile.get('is_fresh'),
+            'profitability_score': profile.get('profitability_score', 0)
+        })
+        database.save_alert({
+            'timestamp': item['raw_timestamp'],
+            'market_id': item['market_id'],
+            'wallet': item['wallet'],
+            'value': item['value'],
+            'outcome': item['outcome'],
+            'side': item['side'],
+            'price': item['price'],
+            'asset_id': item['asset_id']
+        })
+
     def _calculate_advanced_metrics(self, market_data):
         """
         Calculates Polysights-style advanced metrics.
@@ -431,137 +873,403 @@ class PolymarketTracker:
         except Exception:
             return {'spread': 0, 'urgency': 0, 'bias': 0, 'liq_vol_ratio': 0}
 
-    def run_scan(self, limit=None, days=1.0, use_cache=True):
-        print(f"[*] Starting Historical Scan (Last {days} Days)...")
+    @staticmethod
+    def is_sports_market(market):
+        tags = [t.lower() for t in market.get('tags', [])]
+        category = market.get('category', '').lower()
+        return 'sports' in tags or 'nba' in tags or 'nfl' in tags or 'soccer' in tags or category == 'sports'
+
+    def prioritize_markets(self, markets):
+        """Markets sorted by expected whale yield (market_priority), best first."""
+        counts = database.get_alert_counts(days=SCAN_ALERT_DAYS)
+        return sorted(markets, key=lambda m: market_priority(m, counts.get(m.get('conditionId') or m.get('id'), 0)),
+                      reverse=True)
+
+    async def iter_scan_async(self, markets, handler, days=1.0, min_value=None, concurrency=None, max_pages=None,
+                              incremental=False, batch=True, budget_seconds=None, budget_requests=None):
+        """
+        Async scan engine. Pages through trades for every market (back to the
+        lookback cutoff, at most max_pages per market) with at most
+        `concurrency` requests in flight (worker pool) and yields
+        (market, results) as each market completes.
+        handler(market, candidates) runs in a worker thread and only for markets
+        with trades >= min_value inside the lookback window.
+        incremental: only fetch/process trades newer than each market's stored
+        watermark (scan_watermarks table) and advance it afterwards.
+        batch: fetch many markets per /trades request (see fetch_trade_batch_async);
+        markets that overflow their batch are paged one by one.
+        budget_seconds / budget_requests: stop starting new markets once spent;
+        markets are taken in list order, so pass them best first. Markets never
+        started are not yielded.
+        """
+        concurrency = concurrency or SCAN_CONCURRENCY
+        max_pages = max_pages or TRADE_PAGE_BUDGET
+        min_value = MIN_TRADE_SIZE_USD if min_value is None else min_value
+        cutoff = time.time() - (days * 24 * 3600)
+
+        watermarks = (await asyncio.to_thread(database.get_scan_watermarks)) if incremental else {}
+        pending_marks = {}
+        pending = collections.deque(markets)
+        solo = set() # Markets that overflowed a batch (paged one by one)
+        done = asyncio.Queue()
+        budget_spent = self._budget_check(budget_seconds, budget_requests)
+
+        def market_key(market):
+            return market.get('conditionId') or market.get('id')
+
+        def mark_for(market_id):
+            """(last_ts, last_id) of a watermark valid for this scan's threshold and window."""
+            return usable_watermark(watermarks.get(market_id), min_value, cutoff)
+
+        def since_for(market_id):
+            return max(cutoff, mark_for(market_id)[0])
+
+        def take(market_id, trades, candidates, newest):
+            """Keep whale-size trades inside the window; returns the newest (ts, trade id) seen."""
+            last_ts, last_id = mark_for(market_id)
+            since = since_for(market_id)
+            for trade in trades:
+                try:
+                    ts = normalize_ts(trade.get('timestamp'))
+                    trade_id = trade.get('transactionHash')
+                    if newest is None or ts > newest[0]:
+                        newest = (ts, trade_id)
+                    if ts < since or (ts == last_ts and trade_id == last_id):
+                        continue
+                    if float(trade.get('size', 0)) * float(trade.get('price', 0)) < min_value:
+                        continue
+                    candidates.append(trade)
+                except (TypeError, ValueError):
+                    continue
+            return newest
+
+        async def page_one(market_id):
+            """All pages for one market -> (candidates, newest, complete), filtered as pages arrive."""
+            since = since_for(market_id)
+            candidates, newest, pages, last_page = [], None, 0, None
+            try:
+                async for page in self.iter_trade_pages_async(market_id, since=since, max_pages=max_pages, min_value=min_value):
+                    pages += 1
+                    newest = take(market_id, page, candidates, newest)
+                    last_page = page
+            except TradeFetchError:
+                return candidates, newest, False
+            if pages == max_pages and len(last_page) == TRADE_PAGE_SIZE and not self._page_reaches_cutoff(last_page, since):
+                return candidates, newest, False # Budget ran out before reaching the watermark
+            return candidates, newest, True
+
+        async def settle(market, candidates, newest, complete):
+            market_id = market_key(market)
+            last_ts, _ = mark_for(market_id)
+            results = []
+            if candidates:
+                try:
+                    # process_whale does blocking HTTP + DB work; keep it off the event loop
+                    results = (await asyncio.to_thread(handler, market, candidates)) or []
+                except Exception:
+                    complete = False
+
+            # Only advance the watermark once everything newer was fetched and processed
+            if incremental and complete and newest and newest[0] > (last_ts or 0):
+                pending_marks[market_id] = next_watermark(watermarks.get(market_id), newest, min_value, cutoff)
+            await done.put((market, results))
+
+        async def worker():
+            try:
+                await work()
+            finally:
+                done.put_nowait(None) # Worker finished
+
+        def next_chunk():
+            """Next market alone, or a batch of consecutive batchable markets."""
+            chunk = [pending.popleft()]
+            if batch and market_key(chunk[0]) not in solo and chunk[0].get('conditionId'):
+                while (pending and len(chunk) < self.trade_batch_size and pending[0].get('conditionId')
+                       and market_key(pending[0]) not in solo):
+                    chunk.append(pending.popleft())
+            return chunk
+
+        async def work():
+            while pending and not budget_spent():
+                chunk = next_chunk()
+                settled = 0
+                try:
+                    if len(chunk) == 1:
+                        await settle(chunk[0], *await page_one(market_key(chunk[0])))
+                        settled = 1
+                        continue
+                    ids = [market_key(m) for m in chunk]
+                    try:
+                        fetched, overflow = await self.fetch_trade_batch_async(
+                            ids, since=min(since_for(mid) for mid in ids), min_value=min_value)
+                    except TradeFetchError:
+                        fetched, overflow = {}, ids # Whole batch failed: retry one market at a time
+                    # Busy markets go back to the front of the queue to be paged on their own
+                    solo.update(overflow)
+                    pending.extendleft(reversed([m for m in chunk if market_key(m) in solo]))
+                    for market in chunk:
+                        market_id = market_key(market)
+                        if market_id not in solo:
+                            candidates = []
+                            newest = take(market_id, fetched.get(market_id, []), candidates, None)
+                            await settle(market, candidates, newest, True)
+                        settled += 1
+                except Exception:
+                    # Never leave the consumer waiting on a market
+                    for market in chunk[settled:]:
+                        await done.put((market, []))
+
+        async def flush_marks():
+            if pending_marks:
+                marks = dict(pending_marks)
+                pending_marks.clear()
+                await asyncio.to_thread(database.save_scan_watermarks, marks)
+
+        async with self.http.async_session(limit=concurrency):
+            workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(markets)))]
+            finished = 0
+            try:
+                while finished < len(workers):
+                    item = await done.get()
+                    if item is None:
+                        finished += 1
+                        continue
+                    yield item
+                    if len(pending_marks) >= WATERMARK_FLUSH_EVERY:
+                        await flush_marks()
+            finally:
+                for t in workers:
+                    t.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                await flush_marks()
+
+    async def iter_firehose_scan_async(self, handler, days=1.0, min_value=None, max_pages=None, incremental=False,
+                                       exclude_sports=True, budget_seconds=None, budget_requests=None):
+        """
+        Firehose scan: page the global /trades feed (no market filter) newest-first
+        back to the lookback cutoff, keep whale-size trades, and join each hit to the
+        market catalog. Request count scales with trade volume, not market count.
+        Yields (market, results) per market with whales, like iter_scan_async.
+        """
+        max_pages = max_pages or FIREHOSE_PAGE_BUDGET
+        min_value = MIN_TRADE_SIZE_USD if min_value is None else min_value
+        cutoff = time.time() - (days * 24 * 3600)
+        last_ts, last_id, mark = 0, None, None
+        if incremental:
+            marks = await asyncio.to_thread(database.get_scan_watermarks)
+            mark = marks.get(FIREHOSE_WATERMARK_KEY)
+            last_ts, last_id = usable_watermark(mark, min_value, cutoff)
+        since = max(cutoff, last_ts or 0)
+
+        budget_spent = self._budget_check(budget_seconds, budget_requests)
+        by_market = {} # conditionId -> (market, candidates)
+        seen = set() # Offsets shift while new trades arrive; de-dup across pages
+        newest = None
+        complete = True
+        async with self.http.async_session(limit=FIREHOSE_PAGE_WINDOW):
+            for page_no in range(max_pages):
+                if budget_spent():
+                    complete = False
+                    break
+                url = f"{DATA_API_TRADES_URL}?limit={FIREHOSE_PAGE_SIZE}&offset={page_no * FIREHOSE_PAGE_SIZE}"
+                url += self._trade_filter(min_value)
+                page = await self.make_api_request_async(url)
+                if page is None:
+                    complete = False
+                    break
+                if not isinstance(page, list) or not page:
+                    break
+
+                for trade in page:
+                    try:
+                        ts = normalize_ts(trade.get('timestamp'))
+                        trade_id = trade.get('transactionHash')
+                        if newest is None or ts > newest[0]:
+                            newest = (ts, trade_id)
+                        if ts < since or (ts == last_ts and trade_id == last_id):
+                            continue
+                        if float(trade.get('size', 0)) * float(trade.get('price', 0)) < min_value:
+                            continue
+                        key = (trade_id, trade.get('asset'), trade.get('size'), trade.get('proxyWallet'))
+                        if key in seen:
+                            continue
+                        seen.add(key)
+
+                        cid = trade.get('conditionId') or trade.get('market')
+                        if cid not in by_market:
+                            market = self.catalog.get(cid) or {
+                                # Not in the catalog: fall back to what the trade carries
+                                'conditionId': cid,
+                                'question': trade.get('title', 'Unknown'),
+                                'slug': trade.get('slug') or trade.get('eventSlug', '')
+                            }
+                            by_market[cid] = (market, [])
+                        by_market[cid][1].append(trade)
+                    except (TypeError, ValueError):
+                        continue
+
+                if len(page) < FIREHOSE_PAGE_SIZE or self._page_reaches_cutoff(page, since):
+                    break
+            else:
+                complete = False # Budget ran out before reaching the cutoff
+
+        for cid, (market, candidates) in by_market.items():
+            if exclude_sports and self.is_sports_market(market):
+                continue
+            try:
+                results = (await asyncio.to_thread(handler, market, candidates)) or []
+            except Exception:
+                complete = False
+                results = []
+            yield market, results
+
+        if incremental and complete and newest and newest[0] > (last_ts or 0):
+            await asyncio.to_thread(database.save_scan_watermarks,
+                                    {FIREHOSE_WATERMARK_KEY: next_watermark(mark, newest, min_value, cutoff)})
+
+    @staticmethod
+    def market_payload(market):
+        """Gamma market -> process_whale market_data (built once per market, not per trade)."""
+        return {
+            'title': market.get('question') or market.get('title', 'Unknown'),
+            'slug': market.get('slug', ''),
+            'volume': _as_float(market.get('volume')),
+            'volume24hr': _as_float(market.get('volume24hr')),
+            'liquidity': _as_float(market.get('liquidityNum') or market.get('liquidity')),
+            'liquidityNum': _as_float(market.get('liquidityNum') or market.get('liquidity')),
+            'outcomePrices': market.get('outcomePrices'),
+            'clobTokenIds': market.get('clobTokenIds'),
+            'outcomes': market.get('outcomes'),
+            'end_date': market.get('endDate') or market.get('end_date'),
+            'description': market.get('description')
+        }
+
+    @staticmethod
+    def trade_payload(trade, market_id):
+        """Data API trade -> process_whale trade_data."""
+        return {
+            'market_id': market_id,
+            'price': float(trade.get('price', 0)),
+            'size': float(trade.get('size', 0)),
+            'side': trade.get('side'),
+            'outcome': trade.get('outcome'),
+            'asset_id': trade.get('asset') or trade.get('asset_id'),
+            'wallet': trade.get('proxyWallet') or trade.get('taker_address') or trade.get('owner')
+        }
+
+    def _scan_market(self, market, trades, min_value=None):
+        """Scan handler: run process_whale over one market's candidate trades (worker thread)."""
+        market_id = market.get('conditionId') or market.get('id')
+        market_data = self.market_payload(market)
+        results = []
+        for trade in trades:
+            try:
+                item = self.process_whale(
+                    self.trade_payload(trade, market_id), market_data, historical=True,
+                    timestamp_override=normalize_ts(trade.get('timestamp')), persist=False, min_value=min_value
+                )
+            except (TypeError, ValueError):
+                continue
+            if item:
+                results.append(item)
+        return results
+
+    async def iter_whales_async(self, markets=None, mode='markets', days=1.0, min_value=None, concurrency=None,
+                                max_pages=None, incremental=False, budget_seconds=None, budget_requests=None,
+                                exclude_sports=True, sinks=()):
+        """
+        Streaming scan: yields process_whale items as soon as they are found and
+        fans scan events out to sinks (see scan_sinks.ScanSink).
+        mode 'markets' scans `markets` (pass them best first when using a budget);
+        mode 'firehose' pages the global trade feed and ignores `markets`.
+        Nothing is persisted unless a scan_sinks.DatabaseSink is passed.
+        """
+        min_value = MIN_TRADE_SIZE_USD if min_value is None else min_value
+        handler = functools.partial(self._scan_market, min_value=min_value)
+        if mode == 'firehose':
+            scan = self.iter_firehose_scan_async(
+                handler, days=days, min_value=min_value, max_pages=max_pages, incremental=incremental,
+                exclude_sports=exclude_sports, budget_seconds=budget_seconds, budget_requests=budget_requests)
+            markets = None
+        else:
+            markets = list(markets or [])
+            if exclude_sports:
+                markets = [m for m in markets if not self.is_sports_market(m)]
+            scan = self.iter_scan_async(
+                markets, handler, days=days, min_value=min_value, concurrency=concurrency, max_pages=max_pages,
+                incremental=incremental, budget_seconds=budget_seconds, budget_requests=budget_requests)
+
+        started = time.monotonic()
+        start_requests = self.api_requests
+        scanned = []
+        found = 0
+        for sink in sinks:
+            sink.start(len(markets) if markets is not None else None)
+        try:
+            async for market, results in scan:
+                scanned.append(market)
+                for item in results:
+                    found += 1
+                    for sink in sinks:
+                        sink.whale(item)
+                    yield item
+                for sink in sinks:
+                    sink.market_done(market, results)
+        finally:
+            await scan.aclose()
+            summary = {'found': found, 'scanned': len(scanned), 'markets': None, 'skipped': 0, 'volume_share': None,
+                       'elapsed': time.monotonic() - started, 'requests': self.api_requests - start_requests}
+            if markets is not None:
+                summary.update(self.scan_coverage(markets, scanned))
+            for sink in sinks:
+                sink.finish(summary)
+
+    def run_scan(self, limit=None, days=1.0, use_cache=True, concurrency=None, max_pages=None, incremental=True, mode='markets',
+                 budget=None, jsonl_path=None):
+        """
+        incremental: skip trades already covered by a previous scan (per-market watermarks).
+        mode: 'markets' fans out one /trades stream per market, 'firehose' pages the global feed.
+        budget: (seconds, requests) from parse_budget; markets are scanned best first and
+        the scan stops starting new ones once the budget is spent.
+        jsonl_path: also append every whale to this JSONL file.
+        """
+        print(f"[*] Starting Historical Scan (Last {days} Days, {mode}{', incremental' if incremental else ''})...")
         
         limit = limit if limit else MAX_MARKETS
+        concurrency = concurrency or SCAN_CONCURRENCY
         markets = self.fetch_active_markets(limit_override=limit, use_cache=use_cache)
         
         if not markets:
             print("[!] No active markets found to scan.")
             return
 
-        print(f"[*] Scanning {len(markets)} markets with 25 concurrent threads...")
-        
+        # 1. Check Category (skip sports before spending a request on them)
+        markets = [m for m in markets if not self.is_sports_market(m)]
+
+        # 2. Highest expected whale yield first (matters when the budget runs out)
+        markets = self.prioritize_markets(markets)
+        budget_seconds, budget_requests = budget or (None, None)
+
+        if mode == 'firehose':
+            # Market list only warms the catalog; the feed itself covers every market
+            print(f"[*] Paging the global trade feed (up to {max_pages or FIREHOSE_PAGE_BUDGET} pages)...")
+        else:
+            print(f"[*] Scanning {len(markets)} markets with {concurrency} concurrent requests...")
+
+        sinks = [scan_sinks.ConsoleSink(console), scan_sinks.DatabaseSink(self)]
+        if jsonl_path:
+            sinks.append(scan_sinks.JsonlSink(jsonl_path))
+
         found_whales = []
-        count_found = 0
-        total = len(markets)
-        lock = threading.Lock() # Thread lock for print/count updates
-        
-        # Helper function for a single market scan
-        def scan_market(market):
-            market_results = []
-            market_id = market.get('conditionId') or market.get('id')
-            title = market.get('question', 'Unknown')
-            slug = market.get('slug', '')
-            
-            # 1. Check Category
-            tags = [t.lower() for t in market.get('tags', [])]
-            category = market.get('category', '').lower()
-            is_sports = 'sports' in tags or 'nba' in tags or 'nfl' in tags or 'soccer' in tags or category == 'sports'
-            
-            if is_sports:
-                return []
 
-            # 2. Fetch Recent Trades
-            trades = self.fetch_recent_trades(market_id)
-            for trade in trades:
-                try:
-                    size = float(trade.get('size', 0))
-                    price = float(trade.get('price', 0))
-                    value_usd = size * price
-                    
-                    if value_usd < MIN_TRADE_SIZE_USD:
-                        continue
-                        
-                    # Check time (Last 24h)
-                    trade_time = float(trade.get('timestamp')) 
-                    if trade_time > 10000000000: 
-                        trade_time = trade_time / 1000
-                    
-                    if (time.time() - trade_time) > (days * 24 * 3600):
-                        continue
-                        
-                    # Found a whale!
-                    wallet = trade.get('taker_address') or trade.get('maker_address') or trade.get('owner')
-                    
-                    # Prepare Data
-                    t_data = {
-                        'price': price,
-                        'size': size,
-                        'side': trade.get('side'),
-                        'asset_id': trade.get('asset_id'),
-                        'outcome': trade.get('outcome'),
-                        'wallet': wallet,
-                        'market_id': market_id
-                    }
-                    m_data = {
-                        'title': title, # title from scan_market scope
-                        'slug': slug,
-                        'volume24hr': float(market.get('volume24hr', 0)),
-                        'liquidity': float(market.get('liquidityNum', 0)),
-                        'clobTokenIds': market.get('clobTokenIds'),
-                        'outcomes': market.get('outcomes'),
-                        'end_date': market.get('endDate'),
-                        'description': market.get('description')
-                    }
-
-                    # Process
-                    result = self.process_whale(t_data, m_data, historical=True, timestamp_override=trade_time)
-                    if result:
-                        market_results.append(result)
-                    
-                except Exception:
-                    pass
-            return market_results
+        async def consume():
+            async for item in self.iter_whales_async(
+                    markets, mode=mode, days=days, concurrency=concurrency, max_pages=max_pages, incremental=incremental,
+                    budget_seconds=budget_seconds, budget_requests=budget_requests, sinks=sinks):
+                found_whales.append(item)
 
+        asyncio.run(consume())
 
-        # Run Scan in ThreadPool
-        # Run Scan with Rich Progress
-        # Using 25 Workers for speed on large datasets
-        completed = 0
-        
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-            TimeRemainingColumn(),
-            console=console
-        ) as progress:
-            task_id = progress.add_task(f"[cyan]Scanning {len(markets)} markets...", total=total)
-            # Increased workers to 25 for massive 10k market scan
-            with concurrent.futures.ThreadPoolExecutor(max_workers=25) as executor:
-                futures = {executor.submit(scan_market, m): m for m in markets}
-                
-                for future in concurrent.futures.as_completed(futures):
-                    # Update Progress
-                    progress.update(task_id, advance=1)
-                    
-                    try:
-                        results = future.result()
-                        if results:
-                            for item in results:
-                                with lock:
-                                    count_found += 1
-                                    found_whales.append(item)
-                                    
-                                    val_str = f"${item['value']:,.0f}"
-                                    m_text = item['market']
-                                    o_text = str(item['outcome'])
-                                    
-                                    # Console Print (Keep this for Progress Bar compatibility)
-                                    progress.console.print(f"[bold red]🚨 WHALE FOUND: {val_str} on {o_text}[/] in [blue]{m_text}[/]")
-
-                                    
-                                    # Alert logic handled by process_whale
-
-                            
-                    except Exception as e:
-                        pass
-
-        console.print(f"\n[bold green][*] Scan complete. Found {count_found} whale trades.[/bold green]\n")
-        
         if found_whales:
             table = Table(title=f"🐳 Whale Scan Results (Last {days} Days)", show_header=True, header_style="bold magenta")
             table.add_column("Time", style="dim")
@@ -599,58 +1307,390 @@ class PolymarketTracker:
             console.print(table)
             console.print("\n")
 
-    def make_api_request(self, url, retries=3):
+        self.print_http_stats()
+
+    @staticmethod
+    def scan_coverage(markets, scanned):
+        """How much of the (prioritised) market list a scan covered."""
+        total_volume = sum(_as_float(m.get('volume24hr')) for m in markets)
+        scanned_volume = sum(_as_float(m.get('volume24hr')) for m in scanned)
+        return {
+            'markets': len(markets),
+            'scanned': len(scanned),
+            'skipped': len(markets) - len(scanned),
+            'volume_share': scanned_volume / total_volume if total_volume else (1.0 if len(scanned) == len(markets) else 0.0)
+        }
+
+    def print_live_stats(self):
+        """Live pipeline: feed latency (exchange -> us), queue wait and processing time per event."""
+        stats = self.event_queue.stats()
+        table = Table(title=f"Live Workers ({stats['workers']})", show_header=True, header_style="bold magenta")
+        table.add_column("Stage")
+        table.add_column("Events", justify="right")
+        table.add_column("Avg ms", justify="right")
+        table.add_column("p95 ms", justify="right")
+        table.add_column("Max ms", justify="right")
+        stages = [('feed', self.feed_latency.snapshot()), ('queue', stats['queue']), ('processing', stats['processing'])]
+        for stage, s in stages:
+            table.add_row(stage, str(s['count']), f"{s['avg_ms']:.0f}", f"{s['p95_ms']:.0f}", f"{s['max_ms']:.0f}")
+        console.print(table)
+        console.print("[dim]Feed latency: " + ", ".join(f"{label} {n}" for label, n in self.feed_latency.histogram()) + "[/dim]")
+        console.print(f"[dim]Queue depth {stats['depth']}/{stats['capacity']} ({stats['on_disk']} on disk), "
+                      f"lag {stats['lag_s']:.1f}s, {stats['policy']} dropped {stats['dropped']}, "
+                      f"handler errors {stats['errors']}[/dim]")
+        f = self.live_filter
+        console.print(f"[dim]WS frames {f['frames']}: {f['enqueued']} enqueued, {f['dropped_type']} non-trade, "
+                      f"{f['dropped_size']} below threshold[/dim]")
+        a = self.wallet_activity_cache.stats()
+        console.print(f"[dim]Fill aggregation: {a['fills']} fills in {a['keys']} windows, "
+                      f"{a['emitted']} aggregated whales, {a['evicted']} windows evicted[/dim]")
+        b = self.live_backfill
+        console.print(f"[dim]Backfill: {b['runs']} runs, {b['trades']} trades fetched, {b['queued']} queued, "
+                      f"{b['duplicates']} duplicates skipped[/dim]")
+        r = self.rerank_stats
+        console.print(f"[dim]Re-rank: {r['runs']} runs, +{r['added']} / -{r['removed']} markets, "
+                      f"last churn {r['last_churn']:.1%}, {len(self.subscribed_market_ids())} subscribed[/dim]")
+        d = self.alerts.stats()
+        console.print(f"[dim]Discord: {d['sent']} alerts in {d['messages']} messages, {d['retries']} retries "
+                      f"({d['rate_limited']} rate limited), {d['failed']} failed, {d['pending']} pending[/dim]")
+        shards = self.subscriber.stats()
+        console.print("[dim]Shards: " + ", ".join(
+            f"#{i} {s['assets']} assets/{s['connects']} connects/{s['stalls']} stalls{'' if s['connected'] else ' (down)'}"
+            for i, s in enumerate(shards)) + "[/dim]")
+
+    def print_http_stats(self):
+        """Per-endpoint call counts and latency from the shared HTTP client."""
+        stats = self.http.stats()
+        if not stats:
+            return
+        table = Table(title="🌐 API Calls", show_header=True, header_style="bold magenta")
+        table.add_column("Endpoint", style="cyan")
+        table.add_column("Calls", justify="right")
+        table.add_column("Errors", justify="right")
+        table.add_column("Avg ms", justify="right")
+        table.add_column("Max ms", justify="right")
+        for endpoint, s in sorted(stats.items(), key=lambda kv: kv[1]['calls'], reverse=True):
+            table.add_row(endpoint, str(s['calls']), str(s['errors']), f"{s['avg_ms']:.0f}", f"{s['max_ms']:.0f}")
+        console.print(table)
+
+        mc = market_cache.stats()
+        console.print(f"[dim]Market cache: {mc['size']}/{mc['maxsize']} entries | {mc['hits']} hits, "
+                      f"{mc['negative_hits']} negative hits, {mc['misses']} misses, {mc['coalesced']} coalesced, "
+                      f"{mc['evictions']} evictions[/]")
+        wc = wallet_cache.stats()
+        console.print(f"[dim]Wallet cache: {wc['size']}/{wc['maxsize']} profiles | {wc['hits']} hits, "
+                      f"{wc['loads']} profiled, {wc['coalesced']} coalesced[/]")
+
+        limits = self.http.limits.stats()
+        if limits:
+            table = Table(title="🚦 Rate Limits", show_header=True, header_style="bold magenta")
+            table.add_column("Host", style="cyan")
+            table.add_column("Rate/s", justify="right")
+            table.add_column("Concurrency", justify="right")
+            table.add_column("429s", justify="right")
+            table.add_column("5xx", justify="right")
+            for host, l in limits.items():
+                table.add_row(host, f"{l['rate']:.1f}", str(l['concurrency']), str(l['throttled']), str(l['server_errors']))
+            console.print(table)
+
+    def _budget_check(self, seconds=None, requests=None):
+        """Callable that turns True once the time or request budget is used up."""
+        start = time.monotonic()
+        start_requests = self.api_requests
+        def spent():
+            if seconds is not None and time.monotonic() - start >= seconds:
+                return True
+            return requests is not None and self.api_requests - start_requests >= requests
+        return spent
+
+    def make_api_request(self, url, retries=API_RETRIES):
+        unfiltered = False # Retrying without a rejected cash filter
         for i in range(retries):
+            self.api_requests += 1
             try:
-                resp = requests.get(url)
+                resp = self.http.get(url)
                 if resp.status_code == 200:
+                    if unfiltered:
+                        self._disable_filter_pushdown()
                     return resp.json()
-                elif resp.status_code == 429:
-                    # Rate limit - wait and retry
-                    wait_time = (i + 1) * 0.5 # 0.5s, 1.0s, 1.5s
-                    time.sleep(wait_time)
+                elif resp.status_code == 429 or resp.status_code >= 500:
+                    # Rate limit / overload - the shared host limiter has already
+                    # backed off (Retry-After + AIMD), so the retry waits its turn
+                    continue
+                elif self._rejected_filter(url, resp.status_code):
+                    url, unfiltered = without_trade_filter(url), True
+                    continue
+                else:
+                    return None
+            except Exception:
+                time.sleep(0.5 * (i + 1))
+        return None
+
+    async def make_api_request_async(self, url, retries=API_RETRIES):
+        unfiltered = False
+        for i in range(retries):
+            self.api_requests += 1
+            try:
+                status, data, _ = await self.http.get_json_async(url)
+                if status == 200:
+                    if unfiltered:
+                        self._disable_filter_pushdown()
+                    return data
+                elif status == 429 or status >= 500:
+                    # Shared host limiter handles the backoff
+                    continue
+                elif self._rejected_filter(url, status):
+                    url, unfiltered = without_trade_filter(url), True
                     continue
                 else:
                     return None
             except Exception:
-                time.sleep(0.5)
+                await asyncio.sleep(0.5 * (i + 1))
         return None
 
-    def fetch_recent_trades(self, market_id):
+    @staticmethod
+    def _rejected_filter(url, status):
+        """A 400 on a cash-filtered /trades call: retry once without the filter."""
+        return status == 400 and "&filterType=" in url
+
+    def _disable_filter_pushdown(self):
+        # Only once the same call succeeded unfiltered: the 400 was the filter, not the request
+        if self.trade_filter_pushdown:
+            print("[!] Trades API rejected the cash filter, filtering locally.")
+        self.trade_filter_pushdown = False
+
+    @staticmethod
+    def _page_reaches_cutoff(page, since):
+        """True if the (newest-first) page already contains trades older than `since`."""
+        if since is None:
+            return False
         try:
-            url = f"{DATA_API_TRADES_URL}?market={market_id}&limit=20"
-            data = self.make_api_request(url)
-            
-            if data and isinstance(data, list):
-                return data
-            return []
-        except Exception:
-            return []
+            return min(normalize_ts(t.get('timestamp')) for t in page) < since
+        except (TypeError, ValueError):
+            return False
+
+    def _trade_filter(self, min_value):
+        return trade_filter_query(min_value) if self.trade_filter_pushdown else ""
 
-    def save_market_map(self, markets):
+    async def iter_trade_pages_async(self, market_id, since=None, page_size=None, max_pages=None, min_value=None):
+        """
+        Yield newest-first pages of /trades for one market.
+        Keeps paging until a page reaches `since` (lookback cutoff), comes back short,
+        or the per-market page budget runs out. Raises TradeFetchError if a page fails.
+        min_value: only ask the API for trades worth at least this much (cash filter).
+        """
+        page_size = page_size or TRADE_PAGE_SIZE
+        max_pages = max_pages or TRADE_PAGE_BUDGET
+        for page_no in range(max_pages):
+            url = f"{DATA_API_TRADES_URL}?market={market_id}&limit={page_size}&offset={page_no * page_size}"
+            url += self._trade_filter(min_value)
+            data = await self.make_api_request_async(url)
+            if data is None:
+                # Retries exhausted - let the scan know this market is incomplete
+                raise TradeFetchError(market_id)
+            if not data or not isinstance(data, list):
+                return
+            yield data
+            if len(data) < page_size or self._page_reaches_cutoff(data, since):
+                return
+
+    async def fetch_trade_batch_async(self, market_ids, since=None, min_value=None, _split=False):
+        """
+        One /trades request for several markets (comma-separated conditionIds).
+        Returns ({market_id: trades}, overflow_ids). A response that fills the page
+        before reaching `since` may be missing trades, so the batch is split in half
+        and retried; single markets that still overflow come back in overflow_ids
+        for per-market paging. Sparse responses grow self.trade_batch_size, full
+        ones shrink it. Raises TradeFetchError if a request fails.
+        """
+        market_ids = list(market_ids)
+        if not market_ids:
+            return {}, []
+        url = f"{DATA_API_TRADES_URL}?market={','.join(market_ids)}&limit={TRADE_BATCH_LIMIT}&offset=0"
+        url += self._trade_filter(min_value)
+        data = await self.make_api_request_async(url)
+        if data is None:
+            raise TradeFetchError(market_ids)
+        if not isinstance(data, list):
+            data = []
+
+        if len(data) < TRADE_BATCH_LIMIT or self._page_reaches_cutoff(data, since):
+            if not _split and len(data) < TRADE_BATCH_LIMIT // 4 and len(market_ids) >= self.trade_batch_size:
+                self.trade_batch_size = min(TRADE_BATCH_MAX, self.trade_batch_size + TRADE_BATCH_STEP)
+            by_market = {}
+            for trade in data:
+                by_market.setdefault(trade.get('conditionId') or trade.get('market'), []).append(trade)
+            return by_market, []
+
+        # Saturated: too many trades for one page
+        if len(market_ids) == 1:
+            return {}, market_ids
+        half = len(market_ids) // 2
+        self.trade_batch_size = max(1, min(self.trade_batch_size, half))
+        left, left_over = await self.fetch_trade_batch_async(market_ids[:half], since=since, min_value=min_value, _split=True)
+        right, right_over = await self.fetch_trade_batch_async(market_ids[half:], since=since, min_value=min_value, _split=True)
+        left.update(right)
+        return left, left_over + right_over
+
+    def iter_trade_pages(self, market_id, since=None, page_size=None, max_pages=None, min_value=None):
+        """Sync twin of iter_trade_pages_async."""
+        page_size = page_size or TRADE_PAGE_SIZE
+        max_pages = max_pages or TRADE_PAGE_BUDGET
+        for page_no in range(max_pages):
+            url = f"{DATA_API_TRADES_URL}?market={market_id}&limit={page_size}&offset={page_no * page_size}"
+            url += self._trade_filter(min_value)
+            try:
+                data = self.make_api_request(url)
+            except Exception:
+                return
+            if not data or not isinstance(data, list):
+                return
+            yield data
+            if len(data) < page_size or self._page_reaches_cutoff(data, since):
+                return
+
+    def fetch_recent_trades(self, market_id, since=None, max_pages=1, min_value=None):
+        trades = []
+        for page in self.iter_trade_pages(market_id, since=since, max_pages=max_pages, min_value=min_value):
+            trades.extend(page)
+        return trades
+
+    def save_market_map(self, markets, full_sync=None):
+        """Full rebuild of the on-disk market catalog."""
         try:
-            with open(MARKET_MAP_FILE, 'w') as f:
-                json.dump({'timestamp': time.time(), 'markets': markets}, f)
+            self.catalog.replace_all(markets, full_sync=full_sync)
             print("[*] Saved market map to cache.")
         except Exception as e:
             print(f"[!] Warning: Could not save cache: {e}")
 
     def load_market_map(self):
         try:
-            if not os.path.exists(MARKET_MAP_FILE): return None
-            with open(MARKET_MAP_FILE, 'r') as f:
-                data = json.load(f)
+            meta = self.catalog.meta()
+            if meta is None:
+                meta = self._import_legacy_market_map()
+                if meta is None: return None
                 
-            if time.time() - data.get('timestamp', 0) < CACHE_EXPIRY:
-                print(f"[*] Loaded {len(data['markets'])} markets from cache.")
-                return data['markets']
-            else:
-                print("[*] Cache expired.")
-                return None
+            if time.time() - meta['timestamp'] < CACHE_EXPIRY:
+                markets = self.catalog.list_markets()
+                print(f"[*] Loaded {len(markets)} markets from cache.")
+                return markets
+
+            # Expired: incremental sync unless the last full rebuild is too old
+            if time.time() - meta['full_sync'] < FULL_REFRESH_INTERVAL:
+                print("[*] Cache expired. Refreshing incrementally...")
+                return self.refresh_market_map(meta)
+
+            print("[*] Cache expired.")
+            return None
         except Exception:
             return None
 
-    def fetch_active_markets(self, limit_override=None, use_cache=True):
+    def _import_legacy_market_map(self):
+        """One-time move of an old market_map.json into the catalog."""
+        if not os.path.exists(MARKET_MAP_FILE): return None
+        with open(MARKET_MAP_FILE, 'r') as f:
+            data = json.load(f)
+        if not data.get('markets'): return None
+        self.catalog.replace_all(data['markets'], full_sync=data.get('full_sync', data.get('timestamp')), timestamp=data.get('timestamp'))
+        print(f"[*] Imported {len(data['markets'])} markets from {MARKET_MAP_FILE} into {MARKET_CATALOG_FILE}.")
+        return self.catalog.meta()
+
+    def refresh_market_map(self, meta):
+        """
+        Incremental sync of the market catalog.
+        Pages Gamma by updatedAt (newest first) until it reaches markets older than
+        the last sync, upserts changed markets and drops closed ones.
+        Returns the merged list, or None if a full rebuild is needed instead.
+        """
+        since = meta['timestamp'] - MARKET_SYNC_OVERLAP
+        changed = {}
+        closed = set()
+        batch_size = MARKET_PAGE_SIZE
+        for page_no in range(MARKET_SYNC_MAX_PAGES):
+            # No active/closed filter: markets that closed since the last sync must show up too
+            url = f"{GAMMA_API_URL}?limit={batch_size}&offset={page_no * batch_size}&order=updatedAt&ascending=false"
+            page = self.make_api_request(url)
+            if isinstance(page, dict):
+                page = page.get('data')
+            if not isinstance(page, list):
+                print("[!] Incremental refresh failed, falling back to full fetch.")
+                return None
+
+            reached_old = False
+            for m in page:
+                try:
+                    changed_at = parser.isoparse(m['updatedAt']).timestamp()
+                except Exception:
+                    changed_at = None
+                if changed_at is not None and changed_at < since:
+                    reached_old = True
+                    continue
+
+                mid = str(m.get('id') or m.get('conditionId'))
+                if m.get('closed') or m.get('archived') or m.get('active') is False:
+                    closed.add(mid)
+                    changed.pop(mid, None)
+                elif mid not in closed:
+                    changed[mid] = m
+
+            if reached_old or len(page) < batch_size:
+                break
+        else:
+            # Too much churn since last sync - cheaper to rebuild
+            print("[*] Too many changes since last sync, doing full fetch.")
+            return None
+
+        self.catalog.upsert(list(changed.values()), removed_ids=closed)
+        markets = self.catalog.list_markets()
+        print(f"[*] Incremental refresh: {len(changed)} updated, {len(closed)} closed, {len(markets)} markets ({page_no + 1} requests).")
+        return markets
+
+    def iter_market_pages(self, target_limit, batch_size=MARKET_PAGE_SIZE, window=MARKET_PAGE_WINDOW):
+        """
+        Yield Gamma market pages in offset order.
+        Up to `window` pages are in flight at once; a short/empty page marks the
+        end and stops further requests. Early pages are yielded while later ones load.
+        """
+        def fetch_page(offset):
+            # Using default sort (usually liquidity/activity) as explicit volume sort returned inactive markets
+            url = f"{GAMMA_API_URL}?limit={batch_size}&offset={offset}&active=true&closed=false"
+            data = self.make_api_request(url)
+            if isinstance(data, dict):
+                data = data.get('data')
+            return data if isinstance(data, list) else None # None = request failed
+
+        offsets = iter(range(0, target_limit, batch_size))
+        pending = {}
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=window)
+        try:
+            def fill():
+                while len(pending) < window:
+                    offset = next(offsets, None)
+                    if offset is None:
+                        return
+                    pending[offset] = pool.submit(fetch_page, offset)
+
+            fill()
+            next_offset = 0
+            while next_offset in pending:
+                page = pending.pop(next_offset).result()
+                if page is None:
+                    print(f"[!] Gamma API failed (offset {next_offset})")
+                    break
+                if page:
+                    yield page
+                if len(page) < batch_size:
+                    break # Last page
+                next_offset += batch_size
+                fill()
+        finally:
+            # Drop anything past the last page
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def fetch_active_markets(self, limit_override=None, use_cache=True, on_page=None):
+        """
+        on_page(page): optional callback fed each page as soon as it arrives (fresh fetch only).
+        """
         all_markets = []
         target_limit = limit_override if limit_override else MAX_MARKETS
         
@@ -662,39 +1702,21 @@ class PolymarketTracker:
                 # Usually we cache the full MAX_MARKETS set.
                 # Simplification: If cache has decent size, use it.
                 if len(cached) >= (target_limit * 0.5): # Use if at least half target
-                     return cached[:target_limit]
+                    if len(cached) > target_limit:
+                        # Incremental syncs append new markets last; keep the busiest, not the oldest
+                        cached = sorted(cached, key=lambda m: _as_float(m.get('volume24hr')), reverse=True)
+                    return cached[:target_limit]
 
-        batch_size = 100 # Increased batch size for speed
-        
-        print(f"[*] Fetching up to {target_limit} active markets (sorted by volume)...")
+        print(f"[*] Fetching up to {target_limit} active markets ({MARKET_PAGE_WINDOW} pages in parallel)...")
         
         try:
-            for offset in range(0, target_limit, batch_size):
-                # Using default sort (usually liquidity/activity) as explicit volume sort returned inactive markets
-                url = f"{GAMMA_API_URL}?limit={batch_size}&offset={offset}&active=true&closed=false"
-                resp = requests.get(url)
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    chunk = []
-                    if isinstance(data, list):
-                        chunk = data
-                    elif isinstance(data, dict) and 'data' in data: 
-                        chunk = data['data']
-                    
-                    if not chunk:
-                        break 
-                        
-                    all_markets.extend(chunk)
-                    
-                    # Stop if we have enough
-                    if len(all_markets) >= target_limit:
-                        all_markets = all_markets[:target_limit]
-                        break
-                        
-                    time.sleep(0.1) 
-                else:
-                    print(f"[!] Gamma API failed (Status {resp.status_code})")
+            for page in self.iter_market_pages(target_limit):
+                page = page[:target_limit - len(all_markets)]
+                all_markets.extend(page)
+                if on_page and page:
+                    on_page(page)
+                # Stop if we have enough
+                if len(all_markets) >= target_limit:
                     break
             
             # Save to Cache if we fetched a good amount
@@ -708,45 +1730,79 @@ class PolymarketTracker:
         return all_markets
 
     def on_message(self, ws, message):
+        # Pre-filter at the socket: only candidate whale trades reach the queue
         try:
             if not message: return
+            self.last_event_at = time.time()
+            stats = self.live_filter
+            stats['frames'] += 1
+            if '"last_trade_price"' not in message and '"trade"' not in message:
+                stats['dropped_type'] += 1 # Book / price_change / tick frames: never decoded
+                return
+
+            single = message.lstrip().startswith('{')
+            if single:
+                event_type, value = quick_classify(message)
+                if event_type not in TRADE_EVENT_TYPES:
+                    stats['dropped_type'] += 1
+                    return
+                m = _TIMESTAMP_RE.search(message)
+                if m:
+                    self._record_feed_latency(m.group(1))
+                if value is not None and value < self.live_floor('"owner"' in message or '"taker"' in message):
+                    stats['dropped_size'] += 1
+                    return
+
             data = json.loads(message)
-            if isinstance(data, list):
-                for item in data:
+            for item in (data if isinstance(data, list) else [data]):
+                if not single and item.get('timestamp') and item.get('event_type') in TRADE_EVENT_TYPES:
+                    self._record_feed_latency(item['timestamp'])
+                if is_whale_candidate(item, self.live_floor(bool(item.get('owner') or item.get('taker')))):
+                    stats['enqueued'] += 1
                     self.process_trade_event(item)
-            else:
-                self.process_trade_event(data)
+                elif item.get('event_type') in TRADE_EVENT_TYPES or item.get('type') == 'trade':
+                    stats['dropped_size'] += 1
+                else:
+                    stats['dropped_type'] += 1
         except Exception:
             pass
 
+    @staticmethod
+    def live_floor(has_wallet=False):
+        """Smallest trade worth queueing. Fills only feed the aggregator if we know whose they are."""
+        return min(FILL_MIN_USD, MIN_TRADE_SIZE_USD) if FILL_AGGREGATION and has_wallet else MIN_TRADE_SIZE_USD
+
+    def _record_feed_latency(self, raw_ts):
+        try:
+            self.feed_latency.add(max(0.0, self.last_event_at - normalize_ts(raw_ts)))
+        except (TypeError, ValueError):
+            pass
+
     def process_trade_event(self, event):
         """Async Producer: Pushes raw event to queue."""
         self.event_queue.put(event)
 
     def _handle_event_worker(self, event):
         """Consumer: Heavy processing of valid trades."""
-        if event.get('event_type') != 'last_trade_price' and event.get('type') != 'trade':
+        if event.get('event_type') not in TRADE_EVENT_TYPES and event.get('type') != 'trade':
             return
             
         try:
             price = float(event.get('price', 0))
             size = float(event.get('size', 0))
-            market_id = event.get('market') or event.get('asset_id')
+            wallet = event.get('owner') or event.get('taker')
             
             # Helper check to avoid unnecessary api calls for small trades?
             # process_whale has check but we need market info first.
-            if (price * size) < MIN_TRADE_SIZE_USD:
+            whole = (price * size) >= MIN_TRADE_SIZE_USD
+            if not whole and not (FILL_AGGREGATION and wallet and price * size >= FILL_MIN_USD):
                 return
-            
-            market_info = self.get_market_info(market_id)
-            if not market_info:
-                return
-            
-            if market_info.get('is_sports'):
+
+            # Backfill re-fetches an overlap window: skip trades the socket already delivered
+            if not self.seen_trades.add(trade_key(event)):
+                self.live_backfill['duplicates'] += 1
                 return
 
-            # Prepare Payload
-            wallet = event.get('owner') or event.get('taker')
             # Extract Timestamp to ensure Deduplication with Historical Scans
             # WS event usually has 'timestamp' (ms or seconds) or 'time'
             evt_ts = float(event.get('timestamp', 0))
@@ -754,14 +1810,40 @@ class PolymarketTracker:
             # precision check
             if evt_ts > 10000000000: evt_ts /= 1000
             
+            # O(1) resolution via the subscription index; Gamma lookup only for unknown assets
+            indexed = self.asset_index.get(str(event.get('asset_id')))
+            market_id = indexed[0]['market_id'] if indexed else (event.get('market') or event.get('asset_id'))
+
+            fills = 1
+            if not whole:
+                # Sub-threshold fill: only alerts once the wallet's window adds up to a whale
+                agg = self.wallet_activity_cache.add(wallet, market_id, event.get('side'), evt_ts, price, size,
+                                                     threshold=MIN_TRADE_SIZE_USD)
+                if not agg:
+                    return
+                price, size, fills = agg['price'], agg['size'], agg['fills']
+
+            if indexed:
+                market_info, indexed_outcome = indexed
+            else:
+                indexed_outcome = None
+                market_info = self.get_market_info(market_id)
+            if not market_info:
+                return
+            
+            if market_info.get('is_sports'):
+                return
+
+            # Prepare Payload
             t_data = {
                 'price': price,
                 'size': size,
                 'side': event.get('side'),
                 'asset_id': event.get('asset_id'),
-                'outcome': event.get('outcome_label') or event.get('outcome'), # outcome_label might be in live event
+                'outcome': event.get('outcome_label') or event.get('outcome') or indexed_outcome, # outcome_label might be in live event
                 'wallet': wallet,
-                'market_id': market_id
+                'market_id': market_id,
+                'fills': fills
             }
             # process_whale calls analyze_wallet, etc.
             
@@ -771,62 +1853,76 @@ class PolymarketTracker:
             # print(f"Error: {e}")
             pass
 
-    def on_error(self, ws, error):
-        print(f"[!] WebSocket Error: {error}")
-
-    def on_close(self, ws, close_status_code, close_msg):
-        print("[*] WebSocket Closed")
-
     def get_market_info(self, market_id):
-        # Check cache
-        now = time.time()
-        if market_id in market_cache:
-            cached = market_cache[market_id]
-            if now - cached['timestamp'] < MARKET_CHECK_INTERVAL:
-                return cached
-        
-        # Fetch from Gamma
+        # Bounded TTL cache; concurrent misses on one market share a single fetch
         try:
+            return market_cache.get_or_load(market_id, self._load_market_info)
+        except Exception as e:
+            print(f"[!] Gamma API Error: {e}")
+            return None
+
+    def _load_market_info(self, market_id):
+        """Cache loader: returns info, None for unknown markets (negative-cached), raises on transient errors."""
+        # Indexed catalog lookup first (id / conditionId / slug / token id) - no network
+        data = self.catalog.get(market_id)
+        if data is None:
+            # Fetch from Gamma
             # Note: Gamma API uses 'condition_id' or 'id'. Let's assume market_id is what we need.
             # Sometimes 'market_id' in WS is the 'condition_id'.
             url = f"{GAMMA_API_URL}/{market_id}" 
-            resp = requests.get(url)
+            resp = self.http.get(url)
+            if resp.status_code == 429 or resp.status_code >= 500:
+                raise RuntimeError(f"Gamma API status {resp.status_code} for {market_id}")
             if resp.status_code != 200:
-                # Try finding by token/asset if direct ID fails, or assume it's valid but private?
+                # 404 & co: unknown/private market - remember the miss for a while
                 return None
             
             data = resp.json()
-            
-            # Check Tags/Category
-            # Gamma structure: data.get('tags') is a list usually, or 'category'
-            tags = [t.lower() for t in data.get('tags', [])]
-            category = data.get('category', '').lower()
-            
-            is_sports = 'sports' in tags or 'nba' in tags or 'nfl' in tags or 'soccer' in tags or category == 'sports'
-            
-            info = {
-                'is_sports': is_sports,
-                'title': data.get('question', 'Unknown Market'),
-                'slug': data.get('slug', ''),
-                'timestamp': now,
-                'outcomes': data.get('outcomes'), # List or string
-                'volume24hr': data.get('volume24hr', 0),
-                'liquidity': data.get('liquidityNum', 0),
-                'clobTokenIds': data.get('clobTokenIds'),
-                'end_date': data.get('endDate'),
-                'description': data.get('description')
-            }
-            market_cache[market_id] = info
-            return info
-        except Exception as e:
-            print(f"[!] Gamma API Error: {e}")
-            return None
+        return self._build_market_info(data)
+
+    def _build_market_info(self, data, now=None):
+        """Gamma market dict -> market info used by process_whale."""
+        # Check Tags/Category
+        # Gamma structure: data.get('tags') is a list usually, or 'category'
+        return {
+            'is_sports': self.is_sports_market(data),
+            'market_id': data.get('conditionId') or data.get('id'),
+            'gamma_id': data.get('id'),
+            'title': data.get('question', 'Unknown Market'),
+            'slug': data.get('slug', ''),
+            'timestamp': now or time.time(),
+            'outcomes': data.get('outcomes'), # List or string
+            'volume24hr': data.get('volume24hr', 0),
+            'liquidity': data.get('liquidityNum', 0),
+            'liquidityNum': data.get('liquidityNum', 0),
+            'outcomePrices': data.get('outcomePrices'),
+            'clobTokenIds': data.get('clobTokenIds'),
+            'end_date': data.get('endDate'),
+            'description': data.get('description')
+        }
+
+    def get_wallet_profile(self, wallet_address):
+        """
+        Cached wallet profile: memory (TTL) -> wallets table -> /activity.
+        Concurrent whales from one wallet share a single profiling request.
+        """
+        return wallet_cache.get_or_load(wallet_address, self._load_wallet_profile)
+
+    def _load_wallet_profile(self, wallet_address):
+        stored = database.load_wallet_profile(wallet_address, max_age=WALLET_PROFILE_TTL)
+        if stored and (not stored['is_fresh'] or time.time() - stored['profiled_at'] < WALLET_FRESH_TTL):
+            return stored
+
+        profile = self.analyze_wallet(wallet_address)
+        if 'age_hours' in profile:
+            database.save_wallet_profile(wallet_address, profile)
+        return profile
 
     def analyze_wallet(self, wallet_address):
         # Returns dict: {'is_fresh': bool, 'win_rate': str, 'total_trades': int}
         try:
             url = f"{DATA_API_ACTIVITY_URL}?user={wallet_address}&limit=100" 
-            resp = requests.get(url)
+            resp = self.http.get(url)
             if resp.status_code != 200:
                 return {'is_fresh': False, 'win_rate': 0.0, 'total_trades': 0}
             
@@ -944,7 +2040,7 @@ class PolymarketTracker:
         return False
 
     def send_discord_alert(self, trade_data, market_data, profile_data, wallet, historical=False):
-        if "YOUR_DISCORD" in DISCORD_WEBHOOK_URL:
+        if not DISCORD_WEBHOOK_URL or "YOUR_DISCORD" in DISCORD_WEBHOOK_URL:
             # print("[!] Discord Webhook not set. Skipping alert.")
             return
 
@@ -961,6 +2057,11 @@ class PolymarketTracker:
         vol_str = f"${float(market_data.get('volume24hr', 0)):,.0f}"
         liq_str = f"${float(market_data.get('liquidity', 0)):,.0f}"
         
+        # Aggregated whale: several sub-threshold fills in one window
+        fills_str = ""
+        if trade_data.get('fills', 1) > 1:
+            fills_str = f"**Fills:** {trade_data['fills']} within {FILL_WINDOW // 60} min (price is VWAP)\n"
+
         # Time PST
         pst_zone = tz.gettz("America/Los_Angeles")
         time_pst = datetime.datetime.now(datetime.timezone.utc).astimezone(pst_zone).strftime('%I:%M %p PST')
@@ -971,6 +2072,7 @@ class PolymarketTracker:
                            f"**Side:** {side_str}\n" 
                            f"**Outcome:** {trade_data['outcome']}\n"
                            f"**Price:** {trade_data['price']}\n"
+                           f"{fills_str}"
                             f"**Context:** Vol 24h: {vol_str} | Liq: {liq_str}\n"
                            f"**Metrics:** Urgency: {market_data.get('metrics', {}).get('urgency', 0):.0f}% | Bias: {market_data.get('metrics', {}).get('bias', 0):.2f}\n"
                            f"**Time:** {time_pst}\n"
@@ -982,16 +2084,8 @@ class PolymarketTracker:
             }
         }
         
-        payload = {
-            "username": "Whale Tracker",
-            "embeds": [embed]
-        }
-        
-        try:
-            requests.post(DISCORD_WEBHOOK_URL, json=payload)
-            # print("[*] Discord alert sent!")
-        except Exception as e:
-            print(f"[!] Failed to send Discord alert: {e}")
+        # Queued: the dispatcher thread batches, rate-limits and retries
+        self.alerts.send(embed)
 
 if __name__ == "__main__":
     epilog_text = '''
@@ -1018,20 +2112,34 @@ Examples:
     parser.add_argument('--threshold', type=float, help='Minimum trade value in USD to alert on (default: 6000)')
     parser.add_argument('--days', type=float, default=1.0, help='Number of days to look back in scan mode (default: 1)')
     parser.add_argument("--no-cache", action="store_true", help="Force refresh of market list (ignore cache)")
+    parser.add_argument('--max-pages', type=int, help=f'Max /trades pages per market in scan mode (default: {TRADE_PAGE_BUDGET}; firehose: {FIREHOSE_PAGE_BUDGET} in total)')
+    parser.add_argument('--full-rescan', action='store_true', help='Scan the whole lookback window, ignoring watermarks from previous scans')
+    parser.add_argument('--mode', choices=['markets', 'firehose'], default='markets', help='Scan mode: per-market fan-out or the global trade feed (default: markets)')
+    parser.add_argument('--budget', type=parse_budget, help='Scan budget, e.g. 60s, 5m or 500req; best markets are scanned first (default: none)')
+    parser.add_argument('--jsonl', metavar='PATH', help='Also append scan results to a JSONL file (Scan only)')
+    parser.add_argument('--workers', type=int, default=LIVE_WORKERS, help=f'Live monitor worker threads (default: {LIVE_WORKERS})')
+    parser.add_argument('--shards', type=int, default=LIVE_SHARDS, help=f'Live monitor WebSocket connections (default: {LIVE_SHARDS})')
+    parser.add_argument('--rerank', type=int, default=LIVE_RERANK_INTERVAL, metavar='SECONDS', help=f'Re-rank live subscriptions this often; 0 = never (default: {LIVE_RERANK_INTERVAL})')
+    parser.add_argument('--overflow', choices=event_pool.OVERFLOW_POLICIES, default=LIVE_OVERFLOW, help=f'Live queue overflow policy (default: {LIVE_OVERFLOW})')
+    parser.add_argument('--concurrency', type=int, default=SCAN_CONCURRENCY, help=f'Max in-flight requests in scan mode (default: {SCAN_CONCURRENCY})')
     args = parser.parse_args()
 
     # Initialize Database
     database.init_db()
 
-    tracker = PolymarketTracker()
+    tracker = PolymarketTracker(live_workers=args.workers, overflow=args.overflow, shards=args.shards)
     
     # Update threshold if provided
     if args.threshold:
         MIN_TRADE_SIZE_USD = args.threshold
 
+    LIVE_RERANK_INTERVAL = args.rerank
+
     allow_cache = not args.no_cache
 
     if args.scan:
-        tracker.run_scan(limit=args.limit, days=args.days, use_cache=allow_cache)
+        tracker.run_scan(limit=args.limit, days=args.days, use_cache=allow_cache, concurrency=args.concurrency, max_pages=args.max_pages,
+                         incremental=not args.full_rescan, mode=args.mode, budget=args.budget,
+                         jsonl_path=args.jsonl)
     else:
         tracker.start(use_cache=allow_cache)
@@ -0,0 +1,282 @@
+import json
+import time
+import threading
+
+import certifi
+import websocket
+
+SUBSCRIBE_BATCH = 500 # Token ids per subscribe frame
+FRAME_INTERVAL = 0.05 # Pause between frames on one shard (s)
+RECONNECT_DELAY = 5 # First reconnect wait (s); doubles while a shard keeps failing
+MAX_RECONNECT_DELAY = 60
+STABLE_AFTER = 60 # A connection that lived this long resets the backoff
+HEARTBEAT_INTERVAL = 10 # Send an app-level PING this often (s); the server answers PONG
+STALL_TIMEOUT = 60 # No frame (not even a PONG) for this long -> the socket is dead, reconnect
+
+
+def subscribe_frame(asset_ids, operation=None):
+    """
+    CLOB market-channel frame. operation=None is the initial subscription sent
+    on connect; 'subscribe' / 'unsubscribe' change the set on an open socket.
+    """
+    if operation is None:
+        return json.dumps({"assets_ids": list(asset_ids), "type": "market"})
+    return json.dumps({"assets_ids": list(asset_ids), "operation": operation})
+
+
+def batches(items, size=SUBSCRIBE_BATCH):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class WsShard:
+    """
+    One WebSocket connection owning a slice of the subscribed assets.
+    Runs its own reconnect loop; on (re)connect it re-sends only its own assets.
+    on_message(shard, message) and on_connect(shard, reconnect) are called from
+    the shard's thread. gap_start is set before on_connect: the last time the
+    previous connection was known to be alive.
+    """
+    def __init__(self, index, url, on_message, on_connect=None, app_factory=None):
+        self.index = index
+        self.url = url
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.app_factory = app_factory or websocket.WebSocketApp
+        self.assets = set()
+        self.connected = False
+        self.connects = 0
+        self.frames_sent = 0
+        self.last_message_at = 0.0
+        self.connected_at = 0.0
+        self.gap_start = 0.0 # Last sign of life before the current connection (for gap backfill)
+        self.pongs = 0
+        self.stalls = 0
+        self._ws = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"ws-shard-{self.index}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def reconnect(self):
+        """Drop the current connection; the run loop connects again."""
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while self._running:
+            self._ws = self.app_factory(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: print(f"[!] Shard {self.index} WebSocket Error: {error}"),
+                on_close=lambda ws, code, msg: None
+            )
+            try:
+                self._ws.run_forever(sslopt={"ca_certs": certifi.where()})
+            except Exception as e:
+                print(f"[!] Shard {self.index} critical error: {e}")
+            with self._lock:
+                self.connected = False
+            if not self._running:
+                break
+            if self.connected_at and time.time() - self.connected_at > STABLE_AFTER:
+                delay = RECONNECT_DELAY
+            print(f"[*] Shard {self.index} closed. Reconnecting in {delay}s ({len(self.assets)} assets)...")
+            time.sleep(delay)
+            delay = min(MAX_RECONNECT_DELAY, delay * 2)
+
+    def _on_open(self, ws):
+        with self._lock:
+            self.gap_start = self.last_message_at or self.connected_at
+            self.connected = True
+            self.connects += 1
+            self.connected_at = time.time()
+            assets = sorted(self.assets)
+        # Initial frame, then the rest of this shard's assets in large batches
+        chunks = list(batches(assets)) or [[]]
+        if self._send(chunks[0], None):
+            for chunk in chunks[1:]:
+                if not self._send(chunk, 'subscribe'):
+                    break
+        print(f"[*] Shard {self.index} connected ({len(assets)} assets).")
+        if self.on_connect:
+            self.on_connect(self, self.connects > 1)
+
+    def _on_message(self, ws, message):
+        self.last_message_at = time.time()
+        if message == 'PONG':
+            self.pongs += 1 # Heartbeat reply: proof of life, nothing to process
+            return
+        self.on_message(self, message)
+
+    def heartbeat(self):
+        ws = self._ws
+        if ws is None or not self.connected:
+            return
+        try:
+            ws.send('PING')
+        except Exception:
+            pass # The stall check reconnects a dead socket
+
+    def idle(self, now=None):
+        """Seconds since the last frame on the current connection (0 if not connected)."""
+        if not self.connected:
+            return 0.0
+        return (now or time.time()) - max(self.last_message_at, self.connected_at)
+
+    def check_stall(self, timeout=STALL_TIMEOUT, now=None):
+        """Force a reconnect if the connection has been silent for `timeout` s. Returns True if it did."""
+        if self.idle(now) <= timeout:
+            return False
+        self.stalls += 1
+        print(f"[!] Shard {self.index} silent for {self.idle(now):.0f}s, reconnecting...")
+        self.reconnect()
+        return True
+
+    def _send(self, asset_ids, operation):
+        """Send one frame. Returns False if the socket failed (it is reconnected, which re-sends every asset)."""
+        ws = self._ws
+        if ws is None:
+            return False
+        if self.frames_sent:
+            time.sleep(FRAME_INTERVAL)
+        try:
+            ws.send(subscribe_frame(asset_ids, operation))
+        except Exception as e:
+            print(f"[!] Shard {self.index} send failed ({e}), reconnecting...")
+            self.reconnect()
+            return False
+        self.frames_sent += 1
+        return True
+
+    def subscribe(self, asset_ids):
+        """Add assets; sent now if connected, otherwise on connect. Returns the new ids."""
+        with self._lock:
+            new = [a for a in asset_ids if a not in self.assets]
+            self.assets.update(new)
+            send = self.connected
+        if send:
+            for chunk in batches(new):
+                if not self._send(chunk, 'subscribe'):
+                    break
+        return new
+
+    def unsubscribe(self, asset_ids):
+        with self._lock:
+            gone = [a for a in asset_ids if a in self.assets]
+            self.assets.difference_update(gone)
+            send = self.connected
+        if send:
+            for chunk in batches(gone):
+                if not self._send(chunk, 'unsubscribe'):
+                    break
+        return gone
+
+    def stats(self):
+        return {
+            'assets': len(self.assets),
+            'connected': self.connected,
+            'connects': self.connects,
+            'frames_sent': self.frames_sent,
+            'last_message_at': self.last_message_at,
+            'idle_s': self.idle(),
+            'pongs': self.pongs,
+            'stalls': self.stalls
+        }
+
+
+class ShardedSubscriber:
+    """
+    Spreads asset subscriptions over `shards` WebSocket connections.
+    New assets go to the least-loaded shard; each shard reconnects on its own.
+    A health thread sends heartbeats and reconnects shards that go silent
+    (half-open sockets raise no error on their own).
+    """
+    def __init__(self, url, shards=4, on_message=None, on_connect=None, app_factory=None):
+        self.shards = [
+            WsShard(i, url, on_message or (lambda shard, message: None), on_connect, app_factory)
+            for i in range(max(1, int(shards)))
+        ]
+        self.owner = {} # asset id -> shard
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        for shard in self.shards:
+            shard.start()
+        self._stopping.clear()
+        threading.Thread(target=self._watch, name="ws-health", daemon=True).start()
+
+    def stop(self):
+        self._stopping.set()
+        for shard in self.shards:
+            shard.stop()
+
+    def _watch(self):
+        while not self._stopping.wait(HEARTBEAT_INTERVAL):
+            self.check_health()
+
+    def check_health(self, now=None):
+        """One heartbeat round: PING every shard, reconnect stalled ones. Returns the stalled shard indexes."""
+        stalled = []
+        for shard in self.shards:
+            if shard.check_stall(now=now):
+                stalled.append(shard.index)
+            else:
+                shard.heartbeat()
+        return stalled
+
+    def subscribe(self, asset_ids):
+        """Assign unseen assets to shards (least loaded first) and subscribe them."""
+        plan = {}
+        with self._lock:
+            load = {shard: len(shard.assets) for shard in self.shards}
+            for asset in asset_ids:
+                if asset in self.owner:
+                    continue
+                shard = min(self.shards, key=load.get)
+                self.owner[asset] = shard
+                load[shard] += 1
+                plan.setdefault(shard, []).append(asset)
+        for shard, assets in plan.items():
+            shard.subscribe(assets)
+        return sum(len(a) for a in plan.values())
+
+    def unsubscribe(self, asset_ids):
+        plan = {}
+        with self._lock:
+            for asset in asset_ids:
+                shard = self.owner.pop(asset, None)
+                if shard is not None:
+                    plan.setdefault(shard, []).append(asset)
+        for shard, assets in plan.items():
+            shard.unsubscribe(assets)
+        return sum(len(a) for a in plan.values())
+
+    def assets(self):
+        with self._lock:
+            return set(self.owner)
+
+    def stats(self):
+        return [shard.stats() for shard in self.shards]